@@ -1,9 +1,15 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+import os
 import json
+import asyncio
 import logging
-from typing import Dict
-from vosk import Model, KaldiRecognizer, SetLogLevel
+from dataclasses import dataclass
+from typing import Dict, Optional
+from vosk import KaldiRecognizer, SetLogLevel
+from services.model_registry import get_registry
+from services.vad import VoiceActivityDetector
+from services.flow_control import OVERFLOW_POLICIES, AudioRing, OutboundQueue
 
 # Configure logging
 logging.basicConfig(
@@ -23,67 +29,159 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize speech recognizer
-try:
-    SetLogLevel(-1)  # Reduce Vosk logging
-    model = Model("vosk-model-small-en-us-0.15")
-    logger.info("Speech recognizer initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize speech recognizer: {e}")
-    raise
+SetLogLevel(-1)  # Reduce Vosk logging
+# Shared model registry: models are loaded once, recognizers come from a warm pool
+registry = get_registry()
+# Audio a connection may have waiting for the decoder
+MAX_QUEUED_SECONDS = float(os.getenv("DECODER_MAX_QUEUED_SECONDS", "5"))
+# What a connection does with audio beyond that (see flow_control), as in main.py
+OVERFLOW_POLICY = os.getenv("AUDIO_OVERFLOW_POLICY", "signal")
+if OVERFLOW_POLICY not in OVERFLOW_POLICIES:
+    raise ValueError(f"Unknown audio overflow policy: {OVERFLOW_POLICY}")
+
+@app.on_event("startup")
+async def startup():
+    try:
+        await registry.prewarm(words=True)
+        logger.info("Speech recognizer initialized successfully")
+    except Exception as e:
+        logger.error(f"Failed to initialize speech recognizer: {e}")
+        raise
+
+@app.on_event("shutdown")
+async def shutdown():
+    registry.shutdown()
+
+@dataclass
+class Connection:
+    model_path: str
+    recognizer: KaldiRecognizer
+    vad: VoiceActivityDetector
+    audio: AudioRing
+    outbound: OutboundQueue
+    worker: Optional[asyncio.Task] = None
+    # Samples received so far, for the audio_end of each message
+    received_samples: int = 0
 
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: Dict[WebSocket, KaldiRecognizer] = {}
+        self.active_connections: Dict[WebSocket, Connection] = {}
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket, language: Optional[str] = None):
+        # Raises ValueError for a language without a model
+        model_path = registry.model_path(language)
         await websocket.accept()
-        # Initialize recognizer with correct sample rate
-        recognizer = KaldiRecognizer(model, 16000)
-        recognizer.SetWords(True)  # Enable word timing
-        self.active_connections[websocket] = recognizer
+        # Pooled recognizers are already reset and have word timing enabled
+        recognizer = await asyncio.to_thread(registry.acquire, model_path, True)
+        outbound = OutboundQueue(websocket)
+
+        async def signal_flow(paused: bool):
+            # Under the signal policy: ask the client to hold its audio
+            outbound.put_nowait({"type": "flow", "paused": paused}, key="flow")
+
+        connection = Connection(
+            model_path,
+            recognizer,
+            VoiceActivityDetector(registry.sample_rate),
+            AudioRing(int(MAX_QUEUED_SECONDS * registry.sample_rate * 2), OVERFLOW_POLICY, signal_flow),
+            outbound
+        )
+        connection.worker = asyncio.create_task(self.decode_loop(connection))
+        self.active_connections[websocket] = connection
         logger.info(f"New WebSocket connection established. Active connections: {len(self.active_connections)}")
 
-    def disconnect(self, websocket: WebSocket):
+    async def disconnect(self, websocket: WebSocket):
         if websocket in self.active_connections:
-            del self.active_connections[websocket]
+            connection = self.active_connections.pop(websocket)
+            await connection.audio.close()
+            await connection.worker
+            await connection.outbound.close()
+            # The decode loop has stopped, so nothing else touches the recognizer
+            registry.release(connection.model_path, connection.recognizer, words=True)
+            logger.info(f"VAD skipped {connection.vad.skipped_ratio:.0%} of the session audio")
+            if connection.audio.dropped_chunks:
+                logger.info(
+                    f"Dropped {connection.audio.dropped_bytes / 2 / registry.sample_rate:.1f}s "
+                    f"of audio the decoder could not keep up with"
+                )
         logger.info(f"WebSocket disconnected. Active connections: {len(self.active_connections)}")
 
     async def process_audio(self, websocket: WebSocket, audio_data: bytes):
-        recognizer = self.active_connections[websocket]
-        if recognizer.AcceptWaveform(audio_data):
-            result = json.loads(recognizer.Result())
+        connection = self.active_connections[websocket]
+        connection.received_samples += len(audio_data) // 2
+        await connection.audio.put((audio_data, connection.received_samples), len(audio_data))
+
+    async def decode_loop(self, connection: Connection):
+        while True:
+            item = await connection.audio.get()
+            if item is None:
+                return
+            audio_data, end_sample = item
+            try:
+                message = await asyncio.to_thread(self.decode, connection, audio_data)
+            except Exception as e:
+                logger.error(f"Error decoding audio: {e}")
+                continue
+            if message is not None:
+                # Seconds of session audio the text accounts for
+                message["audio_end"] = round(end_sample / registry.sample_rate, 3)
+                # A newer partial replaces one the client hasn't been sent yet
+                await connection.outbound.put(
+                    message, key=None if message["is_final"] else "partial"
+                )
+
+    def decode(self, connection: Connection, audio_data: bytes) -> Optional[Dict]:
+        """Runs on a worker thread; returns the message to send, if any"""
+        recognizer = connection.recognizer
+        # Silence never reaches the recognizer; a long pause ends the utterance
+        gated = connection.vad.process(audio_data)
+        if gated.audio and recognizer.AcceptWaveform(gated.audio):
+            final = recognizer.Result()
+        elif gated.endpoint:
+            final = recognizer.FinalResult()
+        elif gated.audio:
+            final = None
+        else:
+            return None
+        if final is not None:
+            result = json.loads(final)
             text = result.get("text", "").strip()
             if text:  # Only send non-empty results
-                await websocket.send_json({
+                return {
                     "status": "success",
                     "text": text,
                     "is_final": True
-                })
+                }
         else:
             result = json.loads(recognizer.PartialResult())
             text = result.get("partial", "").strip()
             if text and len(text.split()) > 1:  # Only send if we have at least two words
-                await websocket.send_json({
+                return {
                     "status": "success",
                     "text": text,
                     "is_final": False
-                })
+                }
+        return None
 
 manager = ConnectionManager()
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+    try:
+        await manager.connect(websocket, websocket.query_params.get("language"))
+    except ValueError as e:
+        logger.warning(str(e))
+        await websocket.close(code=1008)
+        return
     try:
         while True:
             audio_data = await websocket.receive_bytes()
             await manager.process_audio(websocket, audio_data)
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
+        await manager.disconnect(websocket)
     except Exception as e:
         logger.error(f"Error in WebSocket connection: {e}")
-        manager.disconnect(websocket)
+        await manager.disconnect(websocket)
         await websocket.close()
 
 @app.get("/")
@@ -0,0 +1,63 @@
+import sys
+import json
+import uuid
+import asyncio
+import argparse
+import logging
+from dataclasses import asdict
+from services.batch_transcriber import BatchJob, BatchTranscriber, open_wav
+from services.storage_service import StorageService
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def transcribe_files(args):
+    storage = None if args.no_store else StorageService()
+    transcriber = BatchTranscriber(
+        storage,
+        workers=args.workers,
+        chunk_seconds=args.chunk_seconds,
+        model_path=args.model
+    )
+    failed = False
+    try:
+        for path in args.files:
+            if args.json:
+                with open_wav(path) as wav:
+                    audio_seconds = wav.getnframes() / wav.getframerate()
+                utterances = await transcriber.transcribe(path)
+                print(json.dumps({
+                    "file": path,
+                    "audio_seconds": audio_seconds,
+                    "utterances": [asdict(utterance) for utterance in utterances]
+                }))
+                continue
+            job = await transcriber.run_job(path, BatchJob(id=str(uuid.uuid4()), filename=path))
+            if job.status != "done":
+                failed = True
+                continue
+            speed = job.audio_seconds / job.elapsed_seconds if job.elapsed_seconds else 0
+            logger.info(
+                f"{path}: {job.audio_seconds:.0f}s of audio in {job.elapsed_seconds:.1f}s "
+                f"({speed:.1f}x real time), session {job.session_id}"
+            )
+    finally:
+        transcriber.shutdown()
+        if storage is not None:
+            await storage.close()
+    return failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transcribe WAV files offline")
+    parser.add_argument("files", nargs="+", help="mono 16-bit PCM WAV files")
+    parser.add_argument("--workers", type=int, help="decoder processes (default: BATCH_WORKERS or CPU count)")
+    parser.add_argument("--chunk-seconds", type=float, help="target piece length (default: BATCH_CHUNK_SECONDS or 30)")
+    parser.add_argument("--model", help="Vosk model directory (default: the VOSK_MODELS default language)")
+    parser.add_argument("--json", action="store_true", help="print utterances with word timings instead of storing")
+    parser.add_argument("--no-store", action="store_true", help="don't save sessions to the database")
+    args = parser.parse_args()
+    if args.json:
+        args.no_store = True
+    sys.exit(1 if asyncio.run(transcribe_files(args)) else 0)
@@ -0,0 +1,74 @@
+"""CPU cost of converting client audio formats to 16 kHz mono int16.
+
+Feeds --seconds of a speech-like signal (a few harmonics plus noise) through
+AudioConverter in chunks of --chunk-samples sample frames, the size the audio
+worklet posts, for the formats browsers and common devices produce. Reports CPU
+time per second of audio (and the share of one core that a session costs),
+plus wire bytes per audio-second. The 16 kHz s16le mono row is the
+pass-through baseline.
+
+Run from the backend directory:
+    python -m benchmarks.bench_audio_convert --seconds 300
+"""
+import argparse
+import os
+import time
+import numpy as np
+from services.audio_convert import AudioConverter, AudioFormat
+
+FORMATS = (
+    AudioFormat(16000, 1, "s16le"),
+    AudioFormat(16000, 1, "f32le"),
+    AudioFormat(48000, 1, "f32le"),
+    AudioFormat(48000, 2, "f32le"),
+    AudioFormat(44100, 1, "f32le"),
+    AudioFormat(44100, 2, "s16le"),
+)
+
+
+def make_chunks(audio_format: AudioFormat, seconds: float, chunk_samples: int):
+    rate = audio_format.sample_rate
+    t = np.arange(int(seconds * rate)) / rate
+    rng = np.random.default_rng(0)
+    signal = sum(0.1 / k * np.sin(2 * np.pi * 220 * k * t) for k in range(1, 6))
+    signal = signal + 0.01 * rng.standard_normal(len(t))
+    frames = np.repeat(signal[:, None], audio_format.channels, axis=1)
+    if audio_format.encoding == "f32le":
+        pcm = frames.astype("<f4").tobytes()
+    else:
+        pcm = (frames * 32767).astype("<i2").tobytes()
+    chunk_bytes = chunk_samples * audio_format.frame_bytes
+    return [pcm[i:i + chunk_bytes] for i in range(0, len(pcm), chunk_bytes)]
+
+
+def measure(audio_format: AudioFormat, chunks, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        converter = AudioConverter(audio_format)
+        start = time.process_time()
+        for chunk in chunks:
+            converter.convert(memoryview(chunk))
+        best = min(best, time.process_time() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=300, help="audio duration per format")
+    parser.add_argument("--chunk-samples", type=int, default=2048)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{args.seconds:.0f}s of audio per format, {args.chunk_samples}-sample chunks, pid {os.getpid()}")
+    print(f"{'format':<24}{'CPU us/audio-s':>16}{'% of a core':>13}{'wire bytes/audio-s':>20}")
+    for audio_format in FORMATS:
+        chunks = make_chunks(audio_format, args.seconds, args.chunk_samples)
+        cpu = measure(audio_format, chunks, args.repeat)
+        name = f"{audio_format.sample_rate} {audio_format.encoding} x{audio_format.channels}"
+        per_second = cpu / args.seconds
+        wire = audio_format.sample_rate * audio_format.frame_bytes
+        print(f"{name:<24}{per_second * 1e6:>16.1f}{per_second * 100:>13.3f}{wire:>20}")
+
+
+if __name__ == "__main__":
+    main()
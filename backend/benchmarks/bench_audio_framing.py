@@ -0,0 +1,83 @@
+"""Server-side CPU cost of the two /ws audio framings.
+
+Compares the legacy JSON + base64 text frames (json.loads, b64decode and the
+numpy round trip main.py used to do) with binary PCM frames, per second of
+16 kHz audio. Only the receive side is measured; client encoding is excluded.
+
+Run from the backend directory:
+    python -m benchmarks.bench_audio_framing --seconds 600
+"""
+import argparse
+import base64
+import json
+import os
+import time
+import numpy as np
+from services.audio_protocol import encode_frame, parse_frame, parse_json_frame
+
+SAMPLE_RATE = 16000
+CHUNK_SAMPLES = 2048  # what the audio worklet posts per message
+
+
+def make_frames(seconds: float):
+    samples = int(seconds * SAMPLE_RATE)
+    pcm = np.random.randint(-3000, 3000, size=samples, dtype=np.int16).tobytes()
+    chunk_bytes = CHUNK_SAMPLES * 2
+    chunks = [pcm[i:i + chunk_bytes] for i in range(0, len(pcm), chunk_bytes)]
+    json_frames = [
+        json.dumps({"type": "audio", "data": base64.b64encode(c).decode("ascii")})
+        for c in chunks
+    ]
+    binary_frames = [encode_frame(c, seq) for seq, c in enumerate(chunks)]
+    return json_frames, binary_frames
+
+
+def legacy_path(frames):
+    for message in frames:
+        data = json.loads(message)
+        audio = base64.b64decode(data["data"])
+        np.frombuffer(audio, dtype=np.int16).tobytes()
+
+
+def json_path(frames):
+    for message in frames:
+        parse_json_frame(message)
+
+
+def binary_path(frames):
+    for frame in frames:
+        parse_frame(frame)
+
+
+def measure(fn, frames, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.process_time()
+        fn(frames)
+        best = min(best, time.process_time() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=600, help="audio duration to replay")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    json_frames, binary_frames = make_frames(args.seconds)
+    wire_json = sum(len(f) for f in json_frames)
+    wire_binary = sum(len(f) for f in binary_frames)
+
+    print(f"{args.seconds:.0f}s of audio, {len(binary_frames)} frames, pid {os.getpid()}")
+    print(f"{'path':<28}{'CPU us/audio-s':>16}{'wire bytes/audio-s':>22}")
+    for name, fn, frames, wire in (
+        ("json+base64+numpy (legacy)", legacy_path, json_frames, wire_json),
+        ("json+base64", json_path, json_frames, wire_json),
+        ("binary pcm", binary_path, binary_frames, wire_binary),
+    ):
+        cpu = measure(fn, frames, args.repeat)
+        print(f"{name:<28}{cpu / args.seconds * 1e6:>16.1f}{wire / args.seconds:>22.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Offline transcription throughput in audio seconds per wall second.
+
+Builds a --minutes long recording by repeating --wav (mono 16-bit PCM) and
+runs BatchTranscriber over it with each --workers count. Worker start-up
+and model loading happen before the clock starts, so the numbers are
+steady-state decode throughput; the single-process rows are the baseline
+the pool should scale from.
+
+Run from the backend directory:
+    python -m benchmarks.bench_batch --wav speech.wav --minutes 30 --workers 1 2 4 8
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import wave
+from services.batch_transcriber import BatchTranscriber, open_wav, transcribe_chunk
+
+
+def build_recording(source: str, minutes: float, path: str) -> float:
+    with open_wav(source) as wav:
+        rate = wav.getframerate()
+        pcm = wav.readframes(wav.getnframes())
+    repeats = max(1, int(minutes * 60 * rate * 2 // len(pcm)))
+    with wave.open(path, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(rate)
+        for _ in range(repeats):
+            out.writeframes(pcm)
+    return repeats * len(pcm) / 2 / rate
+
+
+async def run(path: str, workers: int, chunk_seconds: float, model: str) -> float:
+    transcriber = BatchTranscriber(workers=workers, chunk_seconds=chunk_seconds, model_path=model)
+    loop = asyncio.get_running_loop()
+    # Start every worker (and load its model) before timing
+    await asyncio.gather(*(
+        loop.run_in_executor(transcriber.pool, transcribe_chunk, path, (0, 1600))
+        for _ in range(workers)
+    ))
+    start = time.perf_counter()
+    await transcriber.transcribe(path)
+    elapsed = time.perf_counter() - start
+    transcriber.shutdown()
+    return elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--wav", required=True)
+    parser.add_argument("--minutes", type=float, default=30)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--chunk-seconds", type=float, default=30)
+    parser.add_argument("--model", help="Vosk model directory (default: the registry default)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "recording.wav")
+        seconds = build_recording(args.wav, args.minutes, path)
+        print(f"{seconds / 60:.1f} minute recording, {os.cpu_count()} CPUs")
+        print(f"{'workers':>8}{'wall s':>10}{'audio s/s':>12}{'speedup':>10}")
+        baseline = None
+        for workers in sorted(set(args.workers)):
+            elapsed = await run(path, workers, args.chunk_seconds, args.model)
+            baseline = baseline or elapsed
+            print(f"{workers:>8}{elapsed:>10.1f}{seconds / elapsed:>12.1f}{baseline / elapsed:>10.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
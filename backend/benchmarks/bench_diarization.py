@@ -0,0 +1,231 @@
+"""Throughput of the speaker diarization stage, and what it costs the decoder.
+
+Synthesizes --sessions conversations of --utterances utterances each, from
+2-4 of a pool of synthetic voices (pulse trains at different pitches through
+vowel formants scaled by vocal tract length; crude, but with the cues a
+speaker embedding keys on), and:
+
+1. embeds them directly at several batch sizes: utterances/s and seconds of
+   audio per second;
+2. pushes them through SpeakerDiarizer as the finals of live sessions
+   would arrive, --speedup times faster than real time, and reports label
+   latency, skipped utterances and how well the labels match the true
+   speakers (purity: the share of labeled utterances whose label's
+   majority speaker is their own);
+3. runs a stand-in decoder thread (hashing, which like Vosk releases the
+   GIL) that must finish --decode-ms of work every 100 ms, alone and while
+   the diarizer is saturated, and reports how late its chunks finish. The
+   diarizer threads run at nice DIARIZATION_NICE; --nice 0 shows the
+   difference.
+
+The embedder is the one the server would use: an x-vector model when
+DIARIZATION_MODEL is set (torch and transformers installed), the spectral
+fallback otherwise.
+
+Run from the backend directory:
+    python -m benchmarks.bench_diarization --sessions 8 --utterances 40
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import statistics
+import threading
+import time
+from collections import Counter
+import numpy as np
+from services.model_registry import SAMPLE_RATE
+from services.speaker_diarization import SpeakerDiarizer
+
+# (pitch Hz, vocal tract scale): lower voices have longer tracts
+VOICES = [(95, 0.95), (110, 1.0), (125, 1.05), (135, 0.98), (150, 1.1), (190, 1.12), (210, 1.18), (230, 1.22)]
+# F1-F3 of a few vowels, adult male
+VOWELS = [
+    (730, 1090, 2440), (270, 2290, 3010), (530, 1840, 2480), (570, 840, 2410),
+    (300, 870, 2240), (660, 1720, 2410), (440, 1020, 2240)
+]
+
+
+def synthesize(rng: np.random.Generator, pitch: float, tract: float, seconds: float) -> np.ndarray:
+    """Overlap-added 120 ms vowels at a jittered pitch, as float32 in [-0.5, 0.5]"""
+    hop = int(0.12 * SAMPLE_RATE)
+    freqs = np.fft.rfftfreq(2 * hop, 1 / SAMPLE_RATE)
+    window = np.hanning(2 * hop)
+    out = np.zeros(int(seconds * SAMPLE_RATE) + 2 * hop, dtype=np.float32)
+    for start in range(0, int(seconds * SAMPLE_RATE), hop):
+        f0 = pitch * (1 + 0.08 * rng.standard_normal())
+        phase = np.arange(2 * hop) * f0 / SAMPLE_RATE
+        source = ((phase % 1) < 0.05) + 0.02 * rng.standard_normal(2 * hop)
+        envelope = sum(
+            1 / (1 + ((freqs - formant / tract) / bandwidth) ** 2)
+            for formant, bandwidth in zip(VOWELS[rng.integers(len(VOWELS))], (80, 100, 140))
+        ) / (1 + freqs / 4000)
+        out[start:start + 2 * hop] += np.fft.irfft(np.fft.rfft(source * window) * envelope)
+    out = out[:int(seconds * SAMPLE_RATE)]
+    return out / (np.abs(out).max() + 1e-9) * (0.3 + 0.2 * rng.random())
+
+
+def make_sessions(count: int, utterances: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    sessions = []
+    for _ in range(count):
+        speakers = rng.choice(len(VOICES), rng.integers(2, 5), replace=False)
+        truth = rng.choice(speakers, utterances)
+        audio = [synthesize(rng, *VOICES[speaker], rng.uniform(1.5, 6)) for speaker in truth]
+        sessions.append((list(truth), audio))
+    return sessions
+
+
+def purity(labels, truth) -> float:
+    """Share of utterances whose label's majority speaker is their own"""
+    by_label = {}
+    for label, speaker in zip(labels, truth):
+        by_label.setdefault(label, []).append(speaker)
+    return sum(Counter(speakers).most_common(1)[0][1] for speakers in by_label.values()) / len(truth)
+
+
+def bench_batches(diarizer: SpeakerDiarizer, utterances, audio_seconds: float, batch_sizes):
+    print(f"{'batch':>6}{'utterances/s':>15}{'audio s/s':>12}")
+    for size in batch_sizes:
+        started = time.perf_counter()
+        for i in range(0, len(utterances), size):
+            diarizer.embed(utterances[i:i + size])
+        elapsed = time.perf_counter() - started
+        print(f"{size:>6}{len(utterances) / elapsed:>15.1f}{audio_seconds / elapsed:>12.1f}")
+
+
+async def bench_pipeline(diarizer: SpeakerDiarizer, sessions, speedup: float):
+    labels = [dict() for _ in sessions]
+    submitted = {}
+    latencies = []
+
+    def recorder(index):
+        async def on_label(seq, speaker, _embedding):
+            labels[index][seq] = speaker
+            latencies.append(time.perf_counter() - submitted[index, seq])
+        return on_label
+
+    # Each session's finals come in as its audio would, speedup times faster
+    finals = sorted(
+        (sum(len(samples) for samples in audio[:seq + 1]) / SAMPLE_RATE / speedup, index, seq)
+        for index, (_, audio) in enumerate(sessions)
+        for seq in range(len(audio))
+    )
+    live = [diarizer.open_session(f"bench-{i}", recorder(i)) for i in range(len(sessions))]
+    started = time.perf_counter()
+    for at, index, seq in finals:
+        await asyncio.sleep(max(0.0, started + at - time.perf_counter()))
+        submitted[index, seq] = time.perf_counter()
+        diarizer.submit(live[index], seq, (sessions[index][1][seq] * 32767).astype("<i2").tobytes())
+    while diarizer.pending:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    for session in live:
+        diarizer.close_session(session)
+
+    total = len(finals)
+    labeled = sum(map(len, labels))
+    audio_seconds = sum(len(samples) for _, audio in sessions for samples in audio) / SAMPLE_RATE
+    print(f"{len(sessions)} sessions at {speedup:g}x real time (as many as {len(sessions) * speedup:g} live ones): "
+          f"{labeled}/{total} labeled, {total - labeled} skipped, in {elapsed:.1f}s for {audio_seconds:.0f}s of audio")
+    if latencies:
+        latencies.sort()
+        print(f"label latency p50 {latencies[len(latencies) // 2] * 1000:.0f} ms, "
+              f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.0f} ms")
+    scores = []
+    for (truth, _), session_labels in zip(sessions, labels):
+        seqs = [seq for seq, label in session_labels.items() if label is not None]
+        if seqs:
+            scores.append(purity([session_labels[seq] for seq in seqs], [truth[seq] for seq in seqs]))
+    found = [len(set(filter(None, session_labels.values()))) for session_labels in labels]
+    actual = [len(set(truth)) for truth, _ in sessions]
+    print(f"label purity {statistics.mean(scores):.2f}; speakers found vs. actual per session: "
+          f"{list(zip(found, actual))}")
+
+
+def decoder_lateness(decode_ms: float, seconds: float, load=None):
+    """Lateness (ms) of 100 ms chunks that each need decode_ms of GIL-free CPU work"""
+    block = os.urandom(1 << 20)
+    started = time.perf_counter()
+    per_block = 0.0
+    # Calibrate: how long one hash of the block takes
+    for _ in range(5):
+        begin = time.perf_counter()
+        hashlib.sha256(block).digest()
+        per_block = time.perf_counter() - begin
+    rounds = max(1, round(decode_ms / 1000 / per_block))
+    lateness = []
+
+    def run():
+        deadline = time.perf_counter()
+        while time.perf_counter() - started < seconds:
+            deadline += 0.1
+            for _ in range(rounds):
+                hashlib.sha256(block).digest()
+            lateness.append(max(0.0, time.perf_counter() - deadline) * 1000)
+            time.sleep(max(0.0, deadline - time.perf_counter()))
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    if load is not None:
+        load(lambda: thread.is_alive())
+    thread.join()
+    lateness.sort()
+    return lateness[len(lateness) // 2], lateness[int(len(lateness) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--utterances", type=int, default=40, help="Per session")
+    parser.add_argument("--speedup", type=float, default=20, help="Pace of the sessions' finals vs. real time")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--decode-ms", type=float, default=40, help="Decoder work per 100 ms chunk")
+    parser.add_argument("--seconds", type=float, default=10, help="Length of each decoder run")
+    parser.add_argument("--nice", type=int, default=None, help="Diarizer thread niceness (default: DIARIZATION_NICE)")
+    args = parser.parse_args()
+
+    sessions = make_sessions(args.sessions, args.utterances)
+    utterances = [samples for _, audio in sessions for samples in audio]
+    audio_seconds = sum(len(samples) for samples in utterances) / SAMPLE_RATE
+    diarizer = SpeakerDiarizer(enabled=True, workers=args.workers, nice=args.nice)
+    print(f"{len(utterances)} utterances, {audio_seconds:.0f}s of audio, "
+          f"{diarizer.embedder_name} embeddings, {os.cpu_count()} CPUs")
+
+    # Also settles the spectral embedder's background before the pipeline run
+    bench_batches(diarizer, utterances, audio_seconds, args.batch_sizes)
+
+    async def pipeline():
+        await bench_pipeline(diarizer, sessions, args.speedup)
+        await diarizer.close()
+
+    asyncio.run(pipeline())
+
+    embedded_meanwhile = []
+
+    def saturate(alive):
+        # Keep the diarizer's pool busy with batches until the decoder is done
+        async def feed():
+            loaded = SpeakerDiarizer(enabled=True, workers=args.workers, nice=args.nice)
+            session = loaded.open_session("load", lambda *_: asyncio.sleep(0))
+            pcm = [(samples * 32767).astype("<i2").tobytes() for samples in utterances]
+            seq = 0
+            while alive():
+                while loaded.pending < loaded.max_pending:
+                    loaded.submit(session, seq, pcm[seq % len(pcm)])
+                    seq += 1
+                await asyncio.sleep(0.01)
+            embedded_meanwhile.append(loaded.embedded)
+            await loaded.close()
+        asyncio.run(feed())
+
+    idle = decoder_lateness(args.decode_ms, args.seconds)
+    loaded = decoder_lateness(args.decode_ms, args.seconds, saturate)
+    print(f"decoder chunk lateness p50/p99 (ms): alone {idle[0]:.1f}/{idle[1]:.1f}, "
+          f"with diarization {loaded[0]:.1f}/{loaded[1]:.1f} "
+          f"(meanwhile {embedded_meanwhile[0] / args.seconds:.0f} utterances/s embedded at nice {diarizer.nice})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Streaming transcript export over a large segment table.
+
+Fills a scratch database with --rows synthetic segments (1M by default; a
+minute or two, most of it the FTS triggers), with timings and, on every
+tenth segment, insights. Then exports the whole history per format through
+StorageService.iter_segments and TranscriptExporter, the path behind
+GET /export and /sessions/{id}/export, and reports rows/s, output size and
+how much the process's private memory grew (RSS less shared pages: the
+database is memory-mapped, and mapped pages are page cache, not heap). For
+comparison the materializing approach (fetchall, JSON-decode the insights
+into lists, build every row as a dict, then encode the lot) runs last,
+since freed heap isn't always given back.
+
+Run from the backend directory:
+    python -m benchmarks.bench_export --rows 1000000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import psutil
+from services.storage_service import StorageService
+from services.transcript_export import TranscriptExporter
+from benchmarks.bench_incremental_insights import VOCABULARY
+
+SEGMENTS_PER_SESSION = 1000
+
+
+def populate(db_path: str, rows: int, seed: int = 13):
+    rng = random.Random(seed)
+    insights = json.dumps(["The team agreed to ship the beta next week"])
+    questions = json.dumps(["Who owns the migration?"])
+    conn = sqlite3.connect(db_path)
+    with conn:
+        for start in range(0, rows, SEGMENTS_PER_SESSION):
+            session_id = f"bench-{start // SEGMENTS_PER_SESSION}"
+            conn.execute("INSERT INTO sessions (id) VALUES (?)", (session_id,))
+            conn.executemany(
+                """
+                INSERT INTO segments
+                (session_id, seq, text_offset, start_time, end_time, text, ai_insights, ai_questions)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    (
+                        session_id, seq, 0, seq * 4.0, seq * 4.0 + 3.5,
+                        " ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(6, 24))),
+                        insights if seq % 10 == 0 else None,
+                        questions if seq % 10 == 0 else None
+                    )
+                    for seq in range(min(SEGMENTS_PER_SESSION, rows - start))
+                )
+            )
+    conn.close()
+
+
+def private_memory(process: psutil.Process) -> int:
+    info = process.memory_info()
+    return info.rss - info.shared
+
+
+async def stream_export(storage: StorageService, export_format: str, process: psutil.Process):
+    exporter = TranscriptExporter(export_format)
+    baseline = peak = private_memory(process)
+    size = 0
+    async for chunk in exporter.stream(storage.iter_segments()):
+        size += len(chunk)
+        peak = max(peak, private_memory(process))
+    return size, peak - baseline
+
+
+async def materialized_export(storage: StorageService, process: psutil.Process):
+    baseline = private_memory(process)
+    async with storage._reader() as db:
+        cursor = await db.execute(
+            """
+            SELECT session_id, seq, start_time, end_time, text, ai_insights, ai_questions
+            FROM segments ORDER BY session_id, seq
+            """
+        )
+        rows = await cursor.fetchall()
+    records = [
+        {
+            "session_id": session_id, "seq": seq, "start_time": start, "end_time": end, "text": text,
+            "ai_insights": json.loads(insights) if insights else [],
+            "ai_questions": json.loads(questions) if questions else []
+        }
+        for session_id, seq, start, end, text, insights, questions in rows
+    ]
+    body = json.dumps(records).encode()
+    return len(body), private_memory(process) - baseline
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--formats", nargs="+", default=["ndjson", "txt", "srt", "vtt"])
+    parser.add_argument("--skip-materialized", action="store_true")
+    args = parser.parse_args()
+
+    process = psutil.Process()
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = StorageService(os.path.join(tmp, "export"))
+        storage.migrate()
+        start = time.perf_counter()
+        populate(storage.db_path, args.rows)
+        print(f"inserted {args.rows} segments in {time.perf_counter() - start:.1f}s")
+        await storage.start()
+
+        print(f"{'export':<16}{'seconds':>10}{'rows/s':>12}{'output MB':>12}{'memory growth MB':>18}")
+        runs = [(name, lambda name=name: stream_export(storage, name, process)) for name in args.formats]
+        if not args.skip_materialized:
+            runs.append(("materialized", lambda: materialized_export(storage, process)))
+        for name, run in runs:
+            start = time.perf_counter()
+            size, growth = await run()
+            elapsed = time.perf_counter() - start
+            print(f"{name:<16}{elapsed:>10.1f}{args.rows / elapsed:>12.0f}"
+                  f"{size / 1e6:>12.1f}{growth / 1e6:>18.1f}")
+        await storage.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,134 @@
+"""Time to first partial result for new sessions.
+
+Opens --sessions sessions one after another and, for each, measures the
+time from "connection accepted" until the recognizer produces its first
+non-empty partial for --wav (16 kHz mono int16, should start with speech):
+
+  fresh    a new KaldiRecognizer per session (the previous behaviour)
+  pooled   ModelRegistry.acquire() from a pre-warmed pool, released after
+
+Audio is fed in --chunk-ms chunks without real-time pacing, so the decode
+work is the same in both rows and the difference is session setup. The
+one-off model load is reported separately.
+
+With --url the same is measured end to end against a running server
+(ws://localhost:8000/ws), from connect() to the first "partial" message;
+run it once per server version to compare.
+
+Run from the backend directory:
+    python -m benchmarks.bench_first_partial --wav speech.wav --sessions 50
+"""
+import argparse
+import asyncio
+import base64
+import json
+import statistics
+import time
+import wave
+from vosk import KaldiRecognizer, SetLogLevel
+from services.audio_protocol import PROTOCOL_VERSION, encode_frame
+from services.model_registry import SAMPLE_RATE, ModelRegistry
+
+
+def read_pcm(path: str) -> bytes:
+    with wave.open(path, "rb") as wav:
+        if (wav.getframerate(), wav.getnchannels(), wav.getsampwidth()) != (SAMPLE_RATE, 1, 2):
+            raise SystemExit(f"{path} must be 16 kHz mono 16-bit PCM")
+        return wav.readframes(wav.getnframes())
+
+
+def chunks(pcm: bytes, chunk_ms: int):
+    size = SAMPLE_RATE * 2 * chunk_ms // 1000
+    for start in range(0, len(pcm), size):
+        yield pcm[start:start + size]
+
+
+def first_partial(recognizer: KaldiRecognizer, pcm: bytes, chunk_ms: int) -> bool:
+    for chunk in chunks(pcm, chunk_ms):
+        if recognizer.AcceptWaveform(chunk):
+            return True
+        if json.loads(recognizer.PartialResult()).get("partial"):
+            return True
+    return False
+
+
+def run_local(registry: ModelRegistry, path: str, pcm: bytes, args):
+    model = registry.get_model(path)
+    results = {"fresh": [], "pooled": []}
+    for _ in range(args.sessions):
+        start = time.perf_counter()
+        recognizer = KaldiRecognizer(model, SAMPLE_RATE)
+        first_partial(recognizer, pcm, args.chunk_ms)
+        results["fresh"].append(time.perf_counter() - start)
+
+    registry.warm()
+    for _ in range(args.sessions):
+        start = time.perf_counter()
+        recognizer = registry.acquire(path)
+        first_partial(recognizer, pcm, args.chunk_ms)
+        results["pooled"].append(time.perf_counter() - start)
+        registry.release(path, recognizer)
+    return results
+
+
+async def run_remote(url: str, pcm: bytes, args) -> list:
+    import websockets
+    latencies = []
+    for _ in range(args.sessions):
+        start = time.perf_counter()
+        async with websockets.connect(url) as ws:
+            await ws.send(json.dumps({"type": "config", "binary": True, "protocol_version": PROTOCOL_VERSION}))
+            binary = json.loads(await ws.recv()).get("binary")
+            sender = asyncio.create_task(send_audio(ws, pcm, args.chunk_ms, binary))
+            try:
+                async for message in ws:
+                    if isinstance(message, str) and json.loads(message).get("type") in ("partial", "update"):
+                        break
+            finally:
+                sender.cancel()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def send_audio(ws, pcm: bytes, chunk_ms: int, binary: bool):
+    for seq, chunk in enumerate(chunks(pcm, chunk_ms)):
+        if binary:
+            await ws.send(encode_frame(chunk, seq))
+        else:
+            await ws.send(json.dumps({"type": "audio", "data": base64.b64encode(chunk).decode()}))
+
+
+def report(name: str, latencies: list):
+    latencies = sorted(latencies)
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+    print(f"{name:<10}{statistics.median(latencies) * 1000:>12.1f}{p95 * 1000:>12.1f}"
+          f"{latencies[-1] * 1000:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--wav", required=True)
+    parser.add_argument("--model", help="model path (default: the registry's default language)")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--chunk-ms", type=int, default=100)
+    parser.add_argument("--url", help="measure end to end against a running server instead")
+    args = parser.parse_args()
+
+    pcm = read_pcm(args.wav)
+    print(f"{'mode':<10}{'median ms':>12}{'p95 ms':>12}{'max ms':>12}")
+    if args.url:
+        report("server", asyncio.run(run_remote(args.url, pcm, args)))
+        return
+
+    SetLogLevel(-1)
+    registry = ModelRegistry({"en-us": args.model} if args.model else None, pool_size=4)
+    path = registry.model_path()
+    results = run_local(registry, path, pcm, args)
+    for name, latencies in results.items():
+        report(name, latencies)
+    print(f"\nmodel load (once per process): {registry.load_seconds[path] * 1000:.0f} ms")
+    registry.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Prompt size and latency of full-transcript vs. incremental insights.
+
+Replays a synthetic meeting (150 words per minute, one final segment every
+few seconds) and builds the prompt each mode would send for every segment:
+
+  full        the previous behaviour: the growing transcript, trimmed to the
+              last 500 words, on every update
+  incremental only the unsent segment plus the rolling summary, with a full
+              window analysis every min_analysis_interval
+
+Token counts use the ~4 characters per token estimate. With --url pointing
+at benchmarks.stub_llm_server (ideally started with
+--prefill-ms-per-1k-tokens so latency depends on prompt size), the first
+--requests segments of each mode are also sent and timed.
+
+Run from the backend directory:
+    python -m benchmarks.bench_incremental_insights --minutes 60
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from services.insights_service import AnalysisState, InsightsService
+from services.llm_provider import FakeProvider, LLMClient
+
+WORDS_PER_MINUTE = 150
+VOCABULARY = (
+    "we need to ship the beta release next sprint and check latency budget "
+    "for the transcription service so that customers get faster insights "
+    "the team agreed owner rollout plan database migration review metrics "
+    "dashboard budget hiring roadmap quarter priorities risk follow up"
+).split()
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def synthetic_segments(minutes: float, seed: int = 7):
+    """Yield (seconds since start, segment text)"""
+    rng = random.Random(seed)
+    elapsed = 0.0
+    while elapsed < minutes * 60:
+        words = rng.randint(6, 24)
+        elapsed += words / WORDS_PER_MINUTE * 60
+        yield elapsed, " ".join(rng.choice(VOCABULARY) for _ in range(words))
+
+
+def build_prompts(service: InsightsService, minutes: float):
+    interval = service.min_analysis_interval.total_seconds()
+    # A summary as long as the prompt asks the model to keep it
+    summary = " ".join(VOCABULARY[:60])
+    full, incremental = [], []
+    transcript = []
+    last_full = {"full": 0.0, "incremental": 0.0}
+    state = AnalysisState()
+
+    for elapsed, segment in synthetic_segments(minutes):
+        transcript.append(segment)
+        state.add_segment(segment)
+
+        is_full = elapsed - last_full["full"] > interval
+        if is_full:
+            last_full["full"] = elapsed
+        text = " ".join(" ".join(transcript).split()[-500:])
+        full.append((is_full, text, None))
+
+        is_full = elapsed - last_full["incremental"] > interval
+        if is_full:
+            last_full["incremental"] = elapsed
+        text = " ".join(state.window) if is_full else " ".join(state.pending)
+        state.pending.clear()
+        incremental.append((is_full, text, summary))
+
+    return full, incremental
+
+
+def prompt_tokens(service: InsightsService, prompts) -> int:
+    return sum(
+        estimate_tokens(service._generate_prompt(text, is_full, summary))
+        for is_full, text, summary in prompts
+    )
+
+
+async def time_requests(service: InsightsService, prompts, count: int):
+    latencies = []
+    for is_full, text, summary in prompts[:count]:
+        state = AnalysisState(summary=summary or "")
+        # Steer the mode the same way the replay decided it
+        state.last_full_analysis = datetime.now() - (
+            service.min_analysis_interval + timedelta(seconds=1) if is_full else timedelta(0)
+        )
+        start = time.perf_counter()
+        async for _ in service._stream(text, is_full, state, summary=summary):
+            pass
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--minutes", type=float, default=60)
+    parser.add_argument("--url", help="chat completions URL of a stub server to time requests against")
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.url:
+        os.environ["GROQ_API_URL"] = args.url
+        service = InsightsService()
+    else:
+        # Only prompts are built; nothing is sent
+        service = InsightsService(llm=LLMClient(FakeProvider()))
+    full, incremental = build_prompts(service, args.minutes)
+
+    print(f"{args.minutes:.0f} minute meeting, {len(full)} segments")
+    print(f"{'mode':<14}{'prompt tokens':>16}{'tokens/update':>16}")
+    for name, prompts in (("full", full), ("incremental", incremental)):
+        tokens = prompt_tokens(service, prompts)
+        print(f"{name:<14}{tokens:>16}{tokens / len(prompts):>16.0f}")
+
+    if args.url:
+        print(f"\nlatency over the first {args.requests} updates")
+        print(f"{'mode':<14}{'mean ms':>10}{'p95 ms':>10}")
+        for name, prompts in (("full", full), ("incremental", incremental)):
+            latencies = sorted(await time_requests(service, prompts, args.requests))
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            print(f"{name:<14}{statistics.mean(latencies) * 1000:>10.1f}{p95 * 1000:>10.1f}")
+        await service.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,465 @@
+"""Load test: many concurrent /ws sessions replaying recorded audio.
+
+For each count in --sessions, opens that many WebSocket sessions (starts
+spread over --ramp-seconds), each streaming WAV audio from --wavs (16 kHz
+mono 16-bit; files are used round-robin and looped to --duration) at
+--speed times real time, and records per level:
+
+  latency    end to end, from sending a chunk to receiving the first
+             message whose audio_end covers it; partials and finals apart
+  dropped    audio the client held back while the server asked it to pause
+             (flow messages) and audio the server dropped (from /ws/stats)
+  server     CPU seconds per wall second and RSS growth, per session, of
+             the server process (--pid, or the one --spawn started)
+  client     CPU used by this harness, to tell when it is the bottleneck
+
+A level is sustainable when no session failed, nothing was dropped and
+the p95 latencies stay within --max-partial-latency/--max-final-latency;
+the ramp stops at the first level that isn't. The highest sustainable
+count is reported as max_sustainable_sessions.
+
+--protocol main speaks the main.py protocol (binary frames, deltas);
+--protocol app sends raw PCM frames to app.py. --spawn main|app starts
+that server with uvicorn and a local stub LLM (benchmarks.stub_llm_server)
+as its Groq endpoint, so nothing external is called.
+
+The JSON result (stdout, or --output) carries the commit and settings; pass
+two of them to --compare to see what changed between commits. Run from
+the backend directory:
+    python -m benchmarks.bench_load --spawn main --wavs recordings/ --sessions 1 2 4 8 16 32 --output load.json
+    python -m benchmarks.bench_load --url ws://localhost:8000/ws --pid 4242 --wavs speech.wav --sessions 10
+    python -m benchmarks.bench_load --compare before.json after.json
+"""
+import argparse
+import asyncio
+import bisect
+import glob
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+import httpx
+import psutil
+import websockets
+from services.audio_protocol import PROTOCOL_VERSION, encode_frame
+from services.model_registry import SAMPLE_RATE
+from benchmarks.bench_first_partial import read_pcm
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+@dataclass
+class SessionResult:
+    session_id: Optional[str] = None
+    audio_seconds: float = 0.0
+    frames_sent: int = 0
+    frames_held: int = 0
+    messages: int = 0
+    partial_latencies: List[float] = field(default_factory=list)
+    final_latencies: List[float] = field(default_factory=list)
+    error: Optional[str] = None
+
+
+def load_wavs(paths: List[str]) -> List[bytes]:
+    files = []
+    for path in paths:
+        files += sorted(glob.glob(os.path.join(path, "*.wav"))) if os.path.isdir(path) else [path]
+    if not files:
+        raise SystemExit("no WAV files given")
+    return [read_pcm(path) for path in files]
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"count": 0, **{f"p{p}": None for p in PERCENTILES}, "max": None}
+    values = sorted(values)
+    summary = {"count": len(values)}
+    for p in PERCENTILES:
+        summary[f"p{p}"] = round(values[min(len(values) - 1, int(len(values) * p / 100))], 4)
+    summary["max"] = round(values[-1], 4)
+    return summary
+
+
+async def run_session(url: str, pcm: bytes, args, delay: float) -> SessionResult:
+    result = SessionResult()
+    await asyncio.sleep(delay)
+    chunk_bytes = SAMPLE_RATE * 2 * args.chunk_ms // 1000
+    chunk_seconds = args.chunk_ms / 1000
+    total_chunks = int(args.duration / chunk_seconds) if args.duration else len(pcm) // chunk_bytes
+    # Audio end (seconds of audio the server has received) and send time of
+    # every chunk sent, for matching audio_end in results to a send time
+    sent_ends: List[float] = []
+    sent_at: List[float] = []
+    paused = False
+    try:
+        # No keepalive pings: under load they would time out the client,
+        # and the server has its own
+        async with websockets.connect(url, ping_interval=None, max_size=None) as ws:
+            if args.protocol == "main":
+                await ws.send(json.dumps({
+                    "type": "config", "binary": True, "protocol_version": PROTOCOL_VERSION,
+                    "deltas": True
+                }))
+
+            async def receive():
+                nonlocal paused
+                async for raw in ws:
+                    received = time.perf_counter()
+                    message = json.loads(raw)
+                    kind = message.get("type")
+                    if kind == "config":
+                        result.session_id = message.get("session_id")
+                        continue
+                    if kind == "flow":
+                        paused = bool(message.get("paused"))
+                        continue
+                    audio_end = message.get("audio_end")
+                    if audio_end is None:
+                        continue
+                    result.messages += 1
+                    final = message.get("final", message.get("is_final", kind == "update"))
+                    # The first chunk the message covers all of
+                    index = bisect.bisect_left(sent_ends, audio_end - 1e-6)
+                    if index < len(sent_at):
+                        latency = received - sent_at[index]
+                        (result.final_latencies if final else result.partial_latencies).append(latency)
+
+            receiver = asyncio.create_task(receive())
+            started = time.perf_counter()
+            position = 0.0
+            for i in range(total_chunks):
+                if args.speed:
+                    wait = started + i * chunk_seconds / args.speed - time.perf_counter()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                if paused:
+                    # What the web client does: live audio is dropped, not queued
+                    result.frames_held += 1
+                    continue
+                offset = (i * chunk_bytes) % max(chunk_bytes, len(pcm) - len(pcm) % chunk_bytes)
+                chunk = pcm[offset:offset + chunk_bytes]
+                frame = encode_frame(chunk, i) if args.protocol == "main" else chunk
+                position += len(chunk) / 2 / SAMPLE_RATE
+                sent_ends.append(position)
+                sent_at.append(time.perf_counter())
+                await ws.send(frame)
+                result.frames_sent += 1
+            result.audio_seconds = position
+            # Results for the tail of the audio
+            await asyncio.sleep(args.drain_seconds)
+            receiver.cancel()
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+    return result
+
+
+async def poll_server_drops(stats_url: str, drops: Dict[str, float], stop: asyncio.Event):
+    """Latest dropped audio per session from /ws/stats (main.py only)"""
+    async with httpx.AsyncClient(timeout=5) as http:
+        while not stop.is_set():
+            try:
+                response = await http.get(stats_url)
+                if response.status_code == 200:
+                    for session_id, stats in response.json().items():
+                        drops[session_id] = stats["inbound"]["dropped_seconds"]
+            except httpx.HTTPError:
+                pass
+            try:
+                await asyncio.wait_for(stop.wait(), 0.5)
+            except asyncio.TimeoutError:
+                pass
+
+
+def tree(process: psutil.Process) -> List[psutil.Process]:
+    """The server and its child processes (cluster.py workers)"""
+    try:
+        return [process] + process.children(recursive=True)
+    except psutil.Error:
+        return [process]
+
+
+def total(process: psutil.Process, measure) -> float:
+    value = 0
+    for member in tree(process):
+        try:
+            value += measure(member)
+        except psutil.Error:
+            pass
+    return value
+
+
+async def sample_rss(process: Optional[psutil.Process], peak: List[int], stop: asyncio.Event):
+    while process is not None and not stop.is_set():
+        peak[0] = max(peak[0], total(process, lambda member: member.memory_info().rss))
+        try:
+            await asyncio.wait_for(stop.wait(), 0.25)
+        except asyncio.TimeoutError:
+            pass
+
+
+def cpu_seconds(process: Optional[psutil.Process]) -> float:
+    if process is None:
+        return 0.0
+    return total(process, lambda member: sum(member.cpu_times()[:2]))
+
+
+async def run_level(count: int, wavs: List[bytes], server: Optional[psutil.Process], args) -> Dict:
+    client = psutil.Process()
+    # Behind cluster.py each worker reports only its own sessions
+    stats_urls = getattr(args, "stats_urls", None) or [
+        args.url.replace("ws://", "http://").replace("wss://", "https://") + "/stats"
+    ]
+    baseline_rss = total(server, lambda member: member.memory_info().rss) if server else 0
+    peak_rss = [baseline_rss]
+    drops: Dict[str, float] = {}
+    stop = asyncio.Event()
+    watchers = [asyncio.create_task(sample_rss(server, peak_rss, stop))]
+    if args.protocol == "main":
+        watchers.extend(
+            asyncio.create_task(poll_server_drops(stats_url, drops, stop)) for stats_url in stats_urls
+        )
+    server_cpu, client_cpu = cpu_seconds(server), cpu_seconds(client)
+    started = time.perf_counter()
+
+    results = await asyncio.gather(*(
+        run_session(args.url, wavs[i % len(wavs)], args, args.ramp_seconds * i / count)
+        for i in range(count)
+    ))
+
+    wall = time.perf_counter() - started
+    server_cpu, client_cpu = cpu_seconds(server) - server_cpu, cpu_seconds(client) - client_cpu
+    stop.set()
+    await asyncio.gather(*watchers)
+
+    partial = percentiles([value for r in results for value in r.partial_latencies])
+    final = percentiles([value for r in results for value in r.final_latencies])
+    frame_seconds = args.chunk_ms / 1000
+    level = {
+        "sessions": count,
+        "wall_seconds": round(wall, 2),
+        "audio_seconds": round(sum(r.audio_seconds for r in results), 1),
+        "errors": sum(r.error is not None for r in results),
+        "messages": sum(r.messages for r in results),
+        "partial_latency": partial,
+        "final_latency": final,
+        "frames_sent": sum(r.frames_sent for r in results),
+        "frames_held_by_client": sum(r.frames_held for r in results),
+        "held_seconds": round(sum(r.frames_held for r in results) * frame_seconds, 2),
+        "server_dropped_seconds": round(sum(
+            drops.get(r.session_id, 0.0) for r in results if r.session_id
+        ), 2) if args.protocol == "main" else None,
+        "server_cpu_per_session": round(server_cpu / wall / count, 4) if server else None,
+        "server_rss_mb_per_session": round((peak_rss[0] - baseline_rss) / count / 2**20, 2) if server else None,
+        "server_rss_mb": round(peak_rss[0] / 2**20, 1) if server else None,
+        "client_cpu": round(client_cpu / wall, 3),
+        "first_error": next((r.error for r in results if r.error), None)
+    }
+    level["sustainable"] = (
+        level["errors"] == 0
+        and level["held_seconds"] == 0
+        and not level["server_dropped_seconds"]
+        and (partial["p95"] is None or partial["p95"] <= args.max_partial_latency)
+        and (final["p95"] is None or final["p95"] <= args.max_final_latency)
+    )
+    return level
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, process: subprocess.Popen, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"server exited with code {process.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.25)
+    raise SystemExit(f"server didn't listen on port {port} within {timeout:.0f}s")
+
+
+@contextmanager
+def spawned_server(kind: str, llm_latency: float, workers: int = 0) -> Iterator[tuple]:
+    """Start kind:app with uvicorn, pointed at a stub LLM; yields (url, pid).
+
+    With workers, starts that many behind cluster.py instead (kind may then
+    be any module:app); the pid is cluster.py's, the workers its children.
+    """
+    stub_port, port = free_port(), free_port()
+    app = kind if ":" in kind else f"{kind}:app"
+    stub = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.stub_llm_server",
+        "--port", str(stub_port), "--latency", str(llm_latency)
+    ])
+    env = dict(os.environ, GROQ_API_URL=f"http://127.0.0.1:{stub_port}/v1/chat/completions")
+    if workers:
+        server = subprocess.Popen([
+            sys.executable, "cluster.py", "--workers", str(workers), "--app", app,
+            "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"
+        ], env=env)
+    else:
+        server = subprocess.Popen([
+            sys.executable, "-m", "uvicorn", app,
+            "--port", str(port), "--log-level", "warning"
+        ], env=env)
+    try:
+        wait_for_port(stub_port, stub, 30)
+        # Startup includes loading the model; cluster workers are on the next ports
+        for worker_port in [port] + [port + 1 + index for index in range(workers)]:
+            wait_for_port(worker_port, server, 300)
+        yield f"ws://127.0.0.1:{port}/ws", server.pid
+    finally:
+        for process in (server, stub):
+            process.terminate()
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_level(level: Dict):
+    def ms(value: Optional[float]) -> str:
+        return "-" if value is None else f"{value * 1000:.0f}"
+
+    def number(value: Optional[float], spec: str) -> str:
+        return "-" if value is None else format(value, spec)
+
+    print(
+        f"{level['sessions']:>8}{ms(level['partial_latency']['p50']):>9}{ms(level['partial_latency']['p95']):>9}"
+        f"{ms(level['final_latency']['p50']):>9}{ms(level['final_latency']['p95']):>9}"
+        f"{level['held_seconds']:>8.1f}{number(level['server_dropped_seconds'], '.1f'):>9}"
+        f"{number(level['server_cpu_per_session'], '.3f'):>9}{number(level['server_rss_mb_per_session'], '.1f'):>9}"
+        f"{level['client_cpu']:>8.2f}{level['errors']:>7}  {'yes' if level['sustainable'] else 'no'}",
+        file=sys.stderr
+    )
+
+
+async def run(args, url: str, pid: Optional[int]) -> Dict:
+    args.url = url
+    wavs = load_wavs(args.wavs)
+    server = psutil.Process(pid) if pid else None
+    print(
+        f"{'sessions':>8}{'p50 ms':>9}{'p95 ms':>9}{'fin p50':>9}{'fin p95':>9}{'held s':>8}"
+        f"{'drop s':>9}{'cpu/s':>9}{'MB/s':>9}{'client':>8}{'errors':>7}  ok",
+        file=sys.stderr
+    )
+    levels = []
+    for count in args.sessions:
+        level = await run_level(count, wavs, server, args)
+        levels.append(level)
+        print_level(level)
+        if not level["sustainable"] and not args.keep_going:
+            break
+        # Let the server release the sessions before the next level
+        await asyncio.sleep(args.settle_seconds)
+    sustainable = [level["sessions"] for level in levels if level["sustainable"]]
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "cpu_count": os.cpu_count(),
+        "settings": {
+            key: value for key, value in vars(args).items()
+            if key not in ("compare", "output", "url", "pid", "stats_urls")
+        },
+        "levels": levels,
+        "max_sustainable_sessions": max(sustainable) if sustainable else 0
+    }
+
+
+def compare(before_path: str, after_path: str):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"{before.get('commit')} -> {after.get('commit')}: max sustainable sessions "
+          f"{before['max_sustainable_sessions']} -> {after['max_sustainable_sessions']}")
+    print(f"{'sessions':>8}{'metric':>28}{'before':>10}{'after':>10}{'change':>9}")
+    old_levels = {level["sessions"]: level for level in before["levels"]}
+    metrics = [
+        ("partial p95 ms", lambda l: l["partial_latency"]["p95"], 1000),
+        ("final p95 ms", lambda l: l["final_latency"]["p95"], 1000),
+        ("server cpu per session", lambda l: l["server_cpu_per_session"], 1),
+        ("server MB per session", lambda l: l["server_rss_mb_per_session"], 1)
+    ]
+    for level in after["levels"]:
+        old = old_levels.get(level["sessions"])
+        if old is None:
+            continue
+        for name, get, scale in metrics:
+            a, b = get(old), get(level)
+            if a is None or b is None:
+                continue
+            change = f"{(b - a) / a:+.0%}" if a else "-"
+            print(f"{level['sessions']:>8}{name:>28}{a * scale:>10.3f}{b * scale:>10.3f}{change:>9}")
+
+
+def build_parser(description: str = __doc__) -> argparse.ArgumentParser:
+    """Options of the load ramp, shared with bench_workers"""
+    parser = argparse.ArgumentParser(description=description.splitlines()[0])
+    parser.add_argument("--wavs", nargs="+", help="WAV files or directories of them")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--protocol", choices=("main", "app"), default="main")
+    parser.add_argument("--spawn", choices=("main", "app"), help="start this server (and a stub LLM)")
+    parser.add_argument("--url", default="ws://localhost:8000/ws", help="server to test without --spawn")
+    parser.add_argument("--pid", type=int, help="server process id for CPU/RSS without --spawn")
+    parser.add_argument("--speed", type=float, default=1.0, help="times real time; 0 sends as fast as possible")
+    parser.add_argument("--duration", type=float, default=60, help="seconds of audio per session (0: one pass)")
+    parser.add_argument("--chunk-ms", type=int, default=100)
+    parser.add_argument("--ramp-seconds", type=float, default=2.0)
+    parser.add_argument("--drain-seconds", type=float, default=2.0)
+    parser.add_argument("--settle-seconds", type=float, default=2.0)
+    parser.add_argument("--max-partial-latency", type=float, default=1.0)
+    parser.add_argument("--max-final-latency", type=float, default=2.0)
+    parser.add_argument("--keep-going", action="store_true", help="don't stop at the first unsustainable level")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="stub LLM delay with --spawn")
+    parser.add_argument("--output", help="write the JSON result here instead of stdout")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    return parser
+
+
+def main():
+    parser = build_parser()
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if not args.wavs:
+        parser.error("--wavs is required")
+    if args.spawn:
+        args.protocol = args.spawn
+        with spawned_server(args.spawn, args.llm_latency) as (url, pid):
+            result = asyncio.run(run(args, url, pid))
+    else:
+        result = asyncio.run(run(args, args.url, args.pid))
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
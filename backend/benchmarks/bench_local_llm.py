@@ -0,0 +1,126 @@
+"""Insights latency and throughput: the local CPU model vs. the remote API.
+
+Replays the incremental insight requests of a synthetic meeting (the
+prompts bench_incremental_insights builds) from --sessions concurrent
+sessions, each sending its next update as soon as the previous answer is
+in, through InsightsService's streaming path (the one live sessions use)
+with the answer cache off. Per provider and session count it reports:
+
+  p50/p95 ms   request to final InsightResponse
+  answers/s    across all sessions
+  usable       share of answers with at least one insight or question
+  CPU ms       this process's CPU time per answer (the remote path's is
+               HTTP and JSON; the local model's is the inference)
+  batch        mean requests per generate() call (local only)
+
+Providers:
+
+  remote      the OpenAI-compatible provider at --api-url (default
+              GROQ_API_URL, or Groq with GROQ_API_KEY); point it at
+              benchmarks.stub_llm_server for a network-free baseline
+  local       LocalProvider on LOCAL_LLM_MODEL, int8
+  local-fp32  the same model unquantized
+
+The local rows need torch and transformers and a model directory, e.g.
+    huggingface-cli download Qwen/Qwen2.5-0.5B-Instruct --local-dir models/qwen2.5-0.5b-instruct
+
+Run from the backend directory:
+    LOCAL_LLM_MODEL=models/qwen2.5-0.5b-instruct python -m benchmarks.bench_local_llm --sessions 1 4 8
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from datetime import datetime, timedelta
+from services.insight_cache import InsightCache
+from services.insights_service import AnalysisState, InsightsService
+from services.llm_provider import (
+    DEFAULT_API_URL, DEFAULT_MODEL, FakeProvider, LLMClient, OpenAICompatibleProvider
+)
+from benchmarks.bench_incremental_insights import build_prompts
+
+
+def make_provider(name: str, args):
+    if name == "remote":
+        return OpenAICompatibleProvider(
+            api_url=args.api_url,
+            api_key=os.getenv("GROQ_API_KEY"),
+            model=os.getenv("LLM_MODEL", DEFAULT_MODEL),
+            timeout=args.timeout,
+            max_connections=max(args.sessions)
+        )
+    from services.local_llm import LocalProvider
+    return LocalProvider(quantize=name == "local", max_batch=args.max_batch)
+
+
+async def session(service: InsightsService, prompts, latencies, usable):
+    for is_full, text, summary in prompts:
+        state = AnalysisState(summary=summary)
+        # Steer the mode the same way the replay decided it
+        state.last_full_analysis = datetime.now() - (
+            service.min_analysis_interval + timedelta(seconds=1) if is_full else timedelta(0)
+        )
+        started = time.perf_counter()
+        answer = None
+        async for answer in service._stream(text, is_full, state, summary=summary):
+            pass
+        latencies.append(time.perf_counter() - started)
+        usable.append(bool(answer and (answer.insights or answer.questions)))
+
+
+async def run(name: str, args, prompts):
+    provider = make_provider(name, args)
+    client = LLMClient(provider, max_concurrency=max(args.sessions), max_retries=0)
+    started = time.perf_counter()
+    await client.start()
+    if name != "remote":
+        print(f"{name}: {provider.model} loaded in {time.perf_counter() - started:.1f}s")
+    service = InsightsService(cache=InsightCache(max_entries=0), llm=client)
+    service.timeout = args.timeout
+
+    for sessions in args.sessions:
+        latencies, usable = [], []
+        generated, batches = getattr(provider, "generated", 0), getattr(provider, "batches", 0)
+        cpu, started = time.process_time(), time.perf_counter()
+        # Each session starts at its own point of the meeting
+        await asyncio.gather(*(
+            session(service, prompts[i * args.requests:(i + 1) * args.requests], latencies, usable)
+            for i in range(sessions)
+        ))
+        elapsed, cpu = time.perf_counter() - started, time.process_time() - cpu
+        latencies.sort()
+        batch = "-"
+        if hasattr(provider, "batches") and provider.batches > batches:
+            batch = f"{(provider.generated - generated) / (provider.batches - batches):.1f}"
+        print(f"{name:<12}{sessions:>9}{latencies[len(latencies) // 2] * 1000:>10.0f}"
+              f"{latencies[int(len(latencies) * 0.95)] * 1000:>10.0f}{len(latencies) / elapsed:>11.2f}"
+              f"{statistics.mean(usable):>8.0%}{cpu / len(latencies) * 1000:>8.0f}{batch:>7}")
+    await client.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--providers", nargs="+", default=["remote", "local"],
+                        choices=["remote", "local", "local-fp32"])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--requests", type=int, default=8, help="Updates per session")
+    parser.add_argument("--api-url", default=os.getenv("GROQ_API_URL", DEFAULT_API_URL))
+    parser.add_argument("--max-batch", type=int, default=None, help="Local batch limit (default: LOCAL_LLM_MAX_BATCH)")
+    parser.add_argument("--timeout", type=float, default=120, help="Per request; the server's is INSIGHTS_TIMEOUT_SECONDS")
+    args = parser.parse_args()
+
+    # The meeting's incremental updates, skipping the first ones (no summary yet)
+    # (only built here, so the service's client is never called)
+    service = InsightsService(cache=InsightCache(max_entries=0), llm=LLMClient(FakeProvider()))
+    _, prompts = build_prompts(service, 60)
+    prompts = prompts[20:20 + max(args.sessions) * args.requests]
+    print(f"{os.cpu_count()} CPUs, {args.requests} updates per session")
+    print(f"{'provider':<12}{'sessions':>9}{'p50 ms':>10}{'p95 ms':>10}{'answers/s':>11}"
+          f"{'usable':>8}{'CPU ms':>8}{'batch':>7}")
+    for name in args.providers:
+        await run(name, args, prompts)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,90 @@
+"""Transcript bytes sent per minute: full-text partials vs. deltas.
+
+Replays a synthetic meeting through the /ws result path at one decoder
+result per --frame-ms of audio. Within each segment the partial grows by a
+word every few frames and often repeats unchanged, as Vosk partials do,
+and the segment ends with a final result.
+
+  full     the previous behaviour: every non-empty partial is sent as
+           current_text + " " + partial, every final as the whole text
+  deltas   TranscriptStream with deltas negotiated: unchanged partials
+           dropped, partials rate limited to --interval-ms, tails only
+
+Sizes are the JSON text frames as send_json would write them.
+
+Run from the backend directory:
+    python -m benchmarks.bench_partial_deltas --minutes 60
+"""
+import argparse
+import json
+import random
+from services.transcript_stream import TranscriptStream
+from benchmarks.bench_incremental_insights import synthetic_segments
+
+
+def results(minutes: float, frame_seconds: float, seed: int = 3):
+    """Yield (time, is_final, text) decoder results"""
+    rng = random.Random(seed)
+    now = 0.0
+    for end, segment in synthetic_segments(minutes):
+        words = segment.split()
+        frames = max(1, int((end - now) / frame_seconds))
+        for frame in range(frames):
+            shown = words[:max(1, len(words) * (frame + 1) // frames)]
+            # Vosk sometimes revises the last word of a partial
+            if rng.random() < 0.1 and len(shown) > 1:
+                shown = shown[:-1] + [shown[-1][::-1]]
+            yield now + frame * frame_seconds, False, " ".join(shown)
+        now = end
+        yield now, True, segment
+
+
+def size(message: dict) -> int:
+    return len(json.dumps(message).encode())
+
+
+def replay(minutes: float, frame_seconds: float, interval: float):
+    per_minute = {"full": [0] * (int(minutes) + 1), "deltas": [0] * (int(minutes) + 1)}
+    counts = {"full": 0, "deltas": 0}
+    stream = TranscriptStream(interval, deltas=True)
+    current_text = ""
+    for now, is_final, text in results(minutes, frame_seconds):
+        minute = min(int(now // 60), int(minutes))
+        if is_final:
+            current_text = (current_text + " " + text).strip()
+            full = {"type": "update", "text": current_text}
+            delta = stream.message() if stream.commit(text) else None
+        else:
+            full = {"type": "partial", "text": current_text + " " + text}
+            message = stream.message() if stream.flush(now) else None
+            if message:
+                per_minute["deltas"][minute] += size(message)
+                counts["deltas"] += 1
+            delta = stream.message() if stream.update_partial(text, now) else None
+        per_minute["full"][minute] += size(full)
+        counts["full"] += 1
+        if delta:
+            per_minute["deltas"][minute] += size(delta)
+            counts["deltas"] += 1
+    return per_minute, counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--minutes", type=float, default=60)
+    parser.add_argument("--frame-ms", type=int, default=100)
+    parser.add_argument("--interval-ms", type=int, default=200)
+    args = parser.parse_args()
+
+    per_minute, counts = replay(args.minutes, args.frame_ms / 1000, args.interval_ms / 1000)
+    minutes = int(args.minutes)
+    print(f"{args.minutes:.0f} minute session, a decoder result every {args.frame_ms} ms")
+    print(f"{'mode':<8}{'messages':>10}{'total KB':>12}{'KB/min first':>14}{'KB/min last':>13}")
+    for mode in ("full", "deltas"):
+        total = sum(per_minute[mode])
+        print(f"{mode:<8}{counts[mode]:>10}{total / 1024:>12.0f}"
+              f"{per_minute[mode][0] / 1024:>14.1f}{per_minute[mode][minutes - 1] / 1024:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
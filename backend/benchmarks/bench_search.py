@@ -0,0 +1,102 @@
+"""Transcript search latency on a large segment table.
+
+Fills a scratch database with --rows synthetic segments (1M by default,
+which takes a minute or two including the FTS index) and times, per query:
+
+  like     the previous `text LIKE '%query%' ... LIMIT 100 OFFSET n` scan
+  fts      StorageService.search_transcriptions (FTS5, bm25, snippets)
+
+for the first page and for page --deep-page (OFFSET vs. keyset cursor).
+
+Run from the backend directory:
+    python -m benchmarks.bench_search --rows 1000000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from services.storage_service import StorageService
+from benchmarks.bench_incremental_insights import VOCABULARY
+
+QUERIES = ["latency", "\"beta release\"", "rollo*", "database migration review"]
+PAGE = 100
+SEGMENTS_PER_SESSION = 1000
+
+
+def populate(db_path: str, rows: int, seed: int = 11):
+    rng = random.Random(seed)
+    vocabulary = VOCABULARY + [f"term{i}" for i in range(5000)]
+    conn = sqlite3.connect(db_path)
+    with conn:
+        for start in range(0, rows, SEGMENTS_PER_SESSION):
+            session_id = f"bench-{start // SEGMENTS_PER_SESSION}"
+            conn.execute("INSERT INTO sessions (id) VALUES (?)", (session_id,))
+            conn.executemany(
+                "INSERT INTO segments (session_id, seq, text_offset, text) VALUES (?, ?, ?, ?)",
+                (
+                    (session_id, seq, 0, " ".join(rng.choice(vocabulary) for _ in range(rng.randint(6, 24))))
+                    for seq in range(min(SEGMENTS_PER_SESSION, rows - start))
+                )
+            )
+    conn.close()
+
+
+def like_search(db_path: str, query: str, offset: int) -> float:
+    # The old search had no ranking; strip FTS syntax for a fair substring match
+    needle = query.strip('"').rstrip("*")
+    conn = sqlite3.connect(db_path)
+    start = time.perf_counter()
+    conn.execute(
+        """
+        SELECT * FROM segments WHERE text LIKE ?
+        ORDER BY created_at DESC LIMIT ? OFFSET ?
+        """,
+        (f"%{needle}%", PAGE, offset)
+    ).fetchall()
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return elapsed
+
+
+async def fts_search(storage: StorageService, query: str, pages: int) -> float:
+    cursor = None
+    start = time.perf_counter()
+    for _ in range(pages):
+        page = await storage.search_transcriptions(query, PAGE, cursor)
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    return time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--deep-page", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = StorageService(os.path.join(tmp, "search"))
+        storage.migrate()
+        start = time.perf_counter()
+        populate(storage.db_path, args.rows)
+        print(f"inserted {args.rows} segments (with FTS triggers) in {time.perf_counter() - start:.1f}s")
+
+        print(f"{'query':<30}{'like p1 ms':>12}{'fts p1 ms':>12}"
+              f"{f'like p{args.deep_page} ms':>14}{f'fts p1-{args.deep_page} ms':>16}")
+        for query in QUERIES:
+            like_first = like_search(storage.db_path, query, 0)
+            fts_first = await fts_search(storage, query, 1)
+            like_deep = like_search(storage.db_path, query, PAGE * (args.deep_page - 1))
+            # Keyset pages can't be jumped to; this walks every page up to the deep one
+            fts_deep = await fts_search(storage, query, args.deep_page)
+            print(f"{query:<30}{like_first * 1000:>12.1f}{fts_first * 1000:>12.1f}"
+                  f"{like_deep * 1000:>14.1f}{fts_deep * 1000:>16.1f}")
+        await storage.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,153 @@
+"""Server queues under load from deliberately slow WebSocket clients.
+
+Connects --fast clients that read every message as it arrives and --slow
+clients that read one message every --slow-read-ms (their socket buffers
+fill, so the server's sends back up), all streaming --wav (16 kHz mono
+int16) in real time with binary frames and deltas (--full-text: legacy
+full-text updates, which grow with the transcript and back up sooner).
+The slow clients also
+ignore flow messages and keep sending, so the inbound overflow policy is
+exercised as well as the outbound queue.
+
+While they run, GET /ws/stats is polled every --poll-ms and the maximum
+inbound/outbound depth and lag are reported per client kind, along with
+dropped audio and coalesced messages. For the fast clients the receive
+gap (longest time without a message) shows whether slow ones affect them.
+"closed" counts clients the server hung up on (uvicorn's keepalive closes
+a connection whose pings go unanswered for --ws-ping-timeout).
+
+Start the server first (with GROQ_API_URL pointing at
+benchmarks.stub_llm_server), then from the backend directory:
+    python -m benchmarks.bench_slow_clients --wav speech.wav --fast 4 --slow 4
+"""
+import argparse
+import asyncio
+import json
+import socket
+import time
+from typing import Dict, List
+from urllib.parse import urlparse
+import httpx
+import websockets
+from services.audio_protocol import PROTOCOL_VERSION, encode_frame
+from benchmarks.bench_first_partial import chunks, read_pcm
+
+
+def small_socket(url: str) -> socket.socket:
+    """A connected socket with a tiny receive buffer, so the server feels a slow reader quickly"""
+    parsed = urlparse(url)
+    sock = socket.socket()
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    sock.connect((parsed.hostname, parsed.port or 80))
+    sock.setblocking(False)
+    return sock
+
+
+async def client(url: str, pcm: bytes, args, slow: bool, sessions: Dict[str, str], result: Dict):
+    # A tiny client-side queue and socket buffer so a slow reader really stops reading
+    options = {"max_queue": 1, "sock": small_socket(url)} if slow else {}
+    # No keepalive: a client that isn't reading would time out its own pings
+    async with websockets.connect(url, ping_interval=None, **options) as ws:
+        await ws.send(json.dumps({
+            "type": "config", "binary": True, "protocol_version": PROTOCOL_VERSION,
+            "deltas": not args.full_text
+        }))
+        config = json.loads(await ws.recv())
+        sessions[config["session_id"]] = "slow" if slow else "fast"
+        result.update(messages=0, flow=0, max_gap=0.0, closed=False)
+
+        async def send():
+            for sequence, chunk in enumerate(chunks(pcm, args.chunk_ms)):
+                await ws.send(encode_frame(chunk, sequence))
+                await asyncio.sleep(args.chunk_ms / 1000)
+
+        async def receive():
+            last = time.perf_counter()
+            async for raw in ws:
+                now = time.perf_counter()
+                result["max_gap"] = max(result["max_gap"], now - last)
+                last = now
+                result["messages"] += 1
+                if json.loads(raw).get("type") == "flow":
+                    result["flow"] += 1
+                if slow:
+                    await asyncio.sleep(args.slow_read_ms / 1000)
+
+        receiver = asyncio.create_task(receive())
+        try:
+            await send()
+            # Let the server drain before hanging up
+            await asyncio.sleep(1)
+        except websockets.ConnectionClosed:
+            # e.g. the server's keepalive gave up on a client that stopped reading
+            result["closed"] = True
+        receiver.cancel()
+
+
+async def poll_stats(stats_url: str, sessions: Dict[str, str], peaks: Dict, interval: float):
+    async with httpx.AsyncClient() as http:
+        while True:
+            for session_id, stats in (await http.get(stats_url)).json().items():
+                kind = sessions.get(session_id)
+                # Sessions whose client left linger without an outbound queue
+                if kind is None or stats["outbound"] is None:
+                    continue
+                peak = peaks[kind]
+                inbound, outbound = stats["inbound"], stats["outbound"]
+                peak["inbound s"] = max(peak["inbound s"], inbound["queued_seconds"])
+                peak["inbound lag"] = max(peak["inbound lag"], inbound["lag_seconds"])
+                peak["outbound"] = max(peak["outbound"], outbound["depth"])
+                peak["outbound lag"] = max(peak["outbound lag"], outbound["max_send_lag_seconds"])
+                # Cumulative per session; keep the latest value
+                peak["_dropped"][session_id] = inbound["dropped_seconds"]
+                peak["_coalesced"][session_id] = outbound["coalesced"]
+            await asyncio.sleep(interval)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--wav", required=True)
+    parser.add_argument("--url", default="ws://localhost:8000/ws")
+    parser.add_argument("--fast", type=int, default=4)
+    parser.add_argument("--slow", type=int, default=4)
+    parser.add_argument("--slow-read-ms", type=int, default=2000)
+    parser.add_argument("--chunk-ms", type=int, default=100)
+    parser.add_argument("--poll-ms", type=int, default=200)
+    parser.add_argument("--full-text", action="store_true", help="don't negotiate deltas")
+    args = parser.parse_args()
+
+    pcm = read_pcm(args.wav)
+    stats_url = args.url.replace("ws://", "http://").replace("wss://", "https://") + "/stats"
+    sessions: Dict[str, str] = {}
+    peaks = {
+        kind: {
+            "inbound s": 0.0, "inbound lag": 0.0, "outbound": 0, "outbound lag": 0.0,
+            "_dropped": {}, "_coalesced": {}
+        }
+        for kind in ("fast", "slow")
+    }
+    kinds = [False] * args.fast + [True] * args.slow
+    results: List[Dict] = [{} for _ in kinds]
+    poller = asyncio.create_task(poll_stats(stats_url, sessions, peaks, args.poll_ms / 1000))
+    await asyncio.gather(*(
+        client(args.url, pcm, args, slow, sessions, result) for slow, result in zip(kinds, results)
+    ))
+    poller.cancel()
+
+    print(f"{len(pcm) / 32000:.1f}s of audio per client, slow clients read every {args.slow_read_ms} ms")
+    print(f"{'clients':<8}{'n':>4}{'in max s':>10}{'in lag s':>10}{'dropped s':>11}"
+          f"{'out max':>9}{'out lag s':>11}{'coalesced':>11}{'msgs':>7}{'flow':>6}{'max gap s':>11}{'closed':>8}")
+    for kind, slow in (("fast", False), ("slow", True)):
+        rows = [result for result, is_slow in zip(results, kinds) if is_slow == slow and result]
+        if not rows:
+            continue
+        peak = peaks[kind]
+        print(f"{kind:<8}{len(rows):>4}{peak['inbound s']:>10.2f}{peak['inbound lag']:>10.2f}"
+              f"{sum(peak['_dropped'].values()):>11.1f}{peak['outbound']:>9}{peak['outbound lag']:>11.2f}"
+              f"{sum(peak['_coalesced'].values()):>11}{sum(r['messages'] for r in rows):>7}"
+              f"{sum(r['flow'] for r in rows):>6}{max(r['max_gap'] for r in rows):>11.2f}"
+              f"{sum(r['closed'] for r in rows):>8}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
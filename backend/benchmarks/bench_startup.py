@@ -0,0 +1,103 @@
+"""Startup time: Vosk model load plus database initialisation.
+
+Times, on scratch databases:
+
+  fresh       StorageService.start() on an empty directory (all migrations)
+  legacy      upgrading --legacy-rows rows of the old cumulative
+              `transcriptions` table in place
+  warm        StorageService.start() on an up-to-date database with --rows
+              segments (use --rows 20000000 or so for a multi-GB file);
+              this is what every restart pays
+  model       Model(--model), if the model directory exists
+
+and the first page of GET /sessions on the large database, which relies on
+the started_at index.
+
+Run from the backend directory:
+    python -m benchmarks.bench_startup --rows 1000000 --model vosk-model-small-en-us
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from services.storage_service import StorageService
+from benchmarks.bench_search import populate
+from benchmarks.bench_storage import LEGACY_SCHEMA
+
+
+async def time_start(base_dir: str) -> float:
+    storage = StorageService(base_dir)
+    start = time.perf_counter()
+    await storage.start()
+    elapsed = time.perf_counter() - start
+    await storage.close()
+    return elapsed
+
+
+def build_legacy(db_path: str, rows: int):
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute(LEGACY_SCHEMA)
+        text = ""
+        for i in range(rows):
+            # New meeting every 50 updates, otherwise the transcript grows
+            text = f"segment {i}" if i % 50 == 0 else f"{text} segment {i}"
+            conn.execute(
+                "INSERT INTO transcriptions (transcription_text) VALUES (?)", (text,)
+            )
+    conn.close()
+
+
+def report(name: str, seconds: list):
+    print(f"{name:<10}{statistics.median(seconds) * 1000:>12.1f}{max(seconds) * 1000:>12.1f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--legacy-rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--model", default="vosk-model-small-en-us")
+    args = parser.parse_args()
+
+    print(f"{'step':<10}{'median ms':>12}{'max ms':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        report("fresh", [
+            await time_start(os.path.join(tmp, f"fresh-{i}")) for i in range(args.repeat)
+        ])
+
+        legacy_dir = os.path.join(tmp, "legacy")
+        storage = StorageService(legacy_dir)
+        build_legacy(str(storage.db_path), args.legacy_rows)
+        report("legacy", [await time_start(legacy_dir)])
+
+        large_dir = os.path.join(tmp, "large")
+        storage = StorageService(large_dir)
+        storage.migrate()
+        populate(storage.db_path, args.rows)
+        size_mb = os.path.getsize(storage.db_path) / 1024 ** 2
+        report("warm", [await time_start(large_dir) for _ in range(args.repeat)])
+
+        await storage.start()
+        start = time.perf_counter()
+        await storage.get_sessions(limit=100)
+        list_ms = (time.perf_counter() - start) * 1000
+        await storage.close()
+
+    if os.path.isdir(args.model):
+        from vosk import Model
+        start = time.perf_counter()
+        Model(args.model)
+        report("model", [time.perf_counter() - start])
+    else:
+        print(f"model     skipped ({args.model} not found)")
+
+    print(f"\nlarge database: {args.rows} segments, {size_mb:.0f} MB; "
+          f"first /sessions page in {list_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
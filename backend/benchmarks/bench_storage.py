@@ -0,0 +1,104 @@
+"""Storage size and insert latency for one simulated meeting.
+
+Compares the old schema (one `transcriptions` row per final result holding
+the whole transcript so far) with the session/segment schema, where each
+final result appends only its own text.
+
+Run from the backend directory:
+    python -m benchmarks.bench_storage --minutes 60
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+import uuid
+import aiosqlite
+from services.storage_service import StorageService
+from benchmarks.bench_incremental_insights import synthetic_segments
+
+LEGACY_SCHEMA = """
+    CREATE TABLE transcriptions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        transcription_text TEXT NOT NULL,
+        ai_insights TEXT,
+        ai_questions TEXT
+    )
+"""
+INSIGHTS = ["Team agreed to ship the beta next sprint"]
+QUESTIONS = ["Who owns the rollout checklist?"]
+
+
+async def run_legacy(db_path: str, segments) -> list:
+    async with aiosqlite.connect(db_path) as db:
+        await db.execute(LEGACY_SCHEMA)
+        await db.commit()
+    latencies = []
+    current_text = ""
+    for _, text in segments:
+        current_text = (current_text + " " + text).strip()
+        start = time.perf_counter()
+        async with aiosqlite.connect(db_path) as db:
+            await db.execute(
+                """
+                INSERT INTO transcriptions (transcription_text, ai_insights, ai_questions)
+                VALUES (?, ?, ?)
+                """,
+                (current_text, json.dumps(INSIGHTS), json.dumps(QUESTIONS))
+            )
+            await db.commit()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def run_segments(base_dir: str, segments) -> list:
+    storage = StorageService(base_dir)
+    session_id = str(uuid.uuid4())
+    await storage.create_session(session_id)
+    latencies = []
+    previous_end = 0.0
+    for end_time, text in segments:
+        start = time.perf_counter()
+        await storage.append_segment(
+            session_id, text, previous_end, end_time, INSIGHTS, QUESTIONS
+        )
+        latencies.append(time.perf_counter() - start)
+        previous_end = end_time
+    await storage.end_session(session_id)
+    # Closing checkpoints the WAL back into the database file
+    await storage.close()
+    return latencies
+
+
+def report(name: str, db_path: str, latencies: list):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    size_kb = os.path.getsize(db_path) / 1024
+    print(
+        f"{name:<12}{size_kb:>12.0f}{statistics.mean(latencies) * 1000:>12.2f}"
+        f"{p95 * 1000:>12.2f}{latencies[-1] * 1000:>12.2f}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--minutes", type=float, default=60)
+    args = parser.parse_args()
+
+    segments = list(synthetic_segments(args.minutes))
+    print(f"{args.minutes:.0f} minute session, {len(segments)} final results")
+    print(f"{'schema':<12}{'size KB':>12}{'mean ms':>12}{'p95 ms':>12}{'max ms':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_db = os.path.join(tmp, "legacy.db")
+        report("legacy", legacy_db, await run_legacy(legacy_db, segments))
+
+        segment_dir = os.path.join(tmp, "segments")
+        latencies = await run_segments(segment_dir, segments)
+        report("segments", os.path.join(segment_dir, "transcriptions.db"), latencies)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
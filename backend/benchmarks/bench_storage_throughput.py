@@ -0,0 +1,105 @@
+"""Segment insert throughput with 1, 10 and 100 concurrent writers.
+
+Every writer is a session appending --rows segments as fast as it can.
+"per-call" reproduces the previous StorageService behaviour (a fresh
+connection and a commit per insert, rollback journal); the other rows use
+the long-lived WAL connection with group commits in each durability mode.
+
+Run from the backend directory:
+    python -m benchmarks.bench_storage_throughput --writers 1 10 100
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+import aiosqlite
+from services.storage_service import DURABILITY_MODES, StorageService
+
+SEGMENT = "we need to ship the beta release next sprint and check the latency budget"
+
+
+async def per_call_writer(db_path: str, session_id: str, rows: int, latencies: list) -> int:
+    errors = 0
+    for seq in range(rows):
+        start = time.perf_counter()
+        try:
+            async with aiosqlite.connect(db_path) as db:
+                await db.execute(
+                    "INSERT INTO segments (session_id, seq, text_offset, text) VALUES (?, ?, ?, ?)",
+                    (session_id, seq, 0, SEGMENT)
+                )
+                await db.commit()
+        except sqlite3.OperationalError:
+            # "database is locked" once writers queue past the busy timeout
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+    return errors
+
+
+async def service_writer(storage: StorageService, session_id: str, rows: int, latencies: list) -> int:
+    await storage.create_session(session_id)
+    for _ in range(rows):
+        start = time.perf_counter()
+        await storage.append_segment(session_id, SEGMENT)
+        latencies.append(time.perf_counter() - start)
+        # Yield like a real session would between final results
+        await asyncio.sleep(0)
+    return 0
+
+
+async def run(mode: str, writers: int, rows: int, tmp: str):
+    base_dir = os.path.join(tmp, f"{mode}-{writers}")
+    latencies = []
+    if mode == "per-call":
+        storage = StorageService(base_dir)
+        db_path = storage.db_path
+        storage.migrate()
+        # The old code ran with SQLite's default rollback journal
+        async with aiosqlite.connect(db_path) as db:
+            await db.execute("PRAGMA journal_mode=DELETE")
+        start = time.perf_counter()
+        errors = await asyncio.gather(*(
+            per_call_writer(db_path, f"s{i}", rows, latencies) for i in range(writers)
+        ))
+        elapsed = time.perf_counter() - start
+    else:
+        storage = StorageService(base_dir, durability=mode)
+        await storage.start()
+        start = time.perf_counter()
+        errors = await asyncio.gather(*(
+            service_writer(storage, f"s{i}", rows, latencies) for i in range(writers)
+        ))
+        # Rows only count once they are committed
+        await storage.flush()
+        elapsed = time.perf_counter() - start
+        await storage.close()
+
+    latencies.sort()
+    failed = sum(errors)
+    stored = writers * rows - failed
+    print(
+        f"{mode:<10}{writers:>8}{stored / elapsed:>12.0f}"
+        f"{statistics.mean(latencies) * 1000:>12.3f}"
+        f"{latencies[int(len(latencies) * 0.95) - 1] * 1000:>12.3f}{failed:>8}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--rows", type=int, default=200, help="segments per writer")
+    parser.add_argument("--modes", nargs="+", default=["per-call", *DURABILITY_MODES])
+    args = parser.parse_args()
+
+    print(f"{'mode':<10}{'writers':>8}{'rows/s':>12}{'mean ms':>12}{'p95 ms':>12}{'failed':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for writers in args.writers:
+            for mode in args.modes:
+                await run(mode, writers, args.rows, tmp)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,107 @@
+"""Decoder CPU and word error rate with and without the VAD gate.
+
+Decodes every WAV in --wavs (16 kHz mono 16-bit) twice in --chunk-ms
+chunks, the way a /ws session feeds them:
+
+  ungated  every chunk goes to AcceptWaveform (the previous behaviour)
+  vad      chunks pass through VoiceActivityDetector first; a long pause
+           finalizes the utterance with FinalResult()
+
+and reports CPU seconds (process time, VAD included), the share of audio
+the VAD skipped and the WER of each run. References are read from a .txt
+file next to each WAV; without one, the ungated transcript is the
+reference, so the vad WER is the change the gate causes.
+
+Run from the backend directory:
+    python -m benchmarks.bench_vad --wavs recordings/ --model vosk-model-small-en-us
+"""
+import argparse
+import glob
+import json
+import os
+import time
+from typing import Optional
+from vosk import KaldiRecognizer, Model, SetLogLevel
+from services.model_registry import SAMPLE_RATE
+from services.vad import VoiceActivityDetector
+from benchmarks.bench_first_partial import chunks, read_pcm
+
+
+def word_errors(reference: list, hypothesis: list) -> int:
+    """Word-level Levenshtein distance"""
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hypothesis, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word)
+            ))
+        previous = current
+    return previous[-1]
+
+
+def decode(model: Model, pcm: bytes, chunk_ms: int, vad: Optional[VoiceActivityDetector] = None):
+    recognizer = KaldiRecognizer(model, SAMPLE_RATE)
+    words = []
+    start = time.process_time()
+    for chunk in chunks(pcm, chunk_ms):
+        endpoint = False
+        if vad is not None:
+            gated = vad.process(chunk)
+            chunk, endpoint = gated.audio, gated.endpoint
+        if chunk and recognizer.AcceptWaveform(chunk):
+            words += json.loads(recognizer.Result()).get("text", "").split()
+        elif endpoint:
+            words += json.loads(recognizer.FinalResult()).get("text", "").split()
+    words += json.loads(recognizer.FinalResult()).get("text", "").split()
+    return words, time.process_time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--wavs", required=True, help="directory of 16 kHz mono WAV files")
+    parser.add_argument("--model", default="vosk-model-small-en-us")
+    parser.add_argument("--chunk-ms", type=int, default=100)
+    args = parser.parse_args()
+
+    SetLogLevel(-1)
+    model = Model(args.model)
+    totals = {"seconds": 0.0, "skipped": 0.0, "cpu": [0.0, 0.0], "errors": [0, 0], "words": 0}
+    print(f"{'file':<28}{'audio s':>9}{'skipped':>9}{'cpu s':>8}{'vad cpu s':>11}{'wer':>7}{'vad wer':>9}")
+    for path in sorted(glob.glob(os.path.join(args.wavs, "*.wav"))):
+        pcm = read_pcm(path)
+        seconds = len(pcm) / 2 / SAMPLE_RATE
+        ungated, ungated_cpu = decode(model, pcm, args.chunk_ms)
+        vad = VoiceActivityDetector(SAMPLE_RATE)
+        gated, gated_cpu = decode(model, pcm, args.chunk_ms, vad)
+
+        reference_path = os.path.splitext(path)[0] + ".txt"
+        if os.path.exists(reference_path):
+            with open(reference_path) as f:
+                reference = f.read().lower().split()
+        else:
+            reference = ungated
+        errors = (word_errors(reference, ungated), word_errors(reference, gated))
+        count = max(1, len(reference))
+
+        totals["seconds"] += seconds
+        totals["skipped"] += vad.skipped_ratio * seconds
+        totals["cpu"][0] += ungated_cpu
+        totals["cpu"][1] += gated_cpu
+        totals["errors"][0] += errors[0]
+        totals["errors"][1] += errors[1]
+        totals["words"] += count
+        print(f"{os.path.basename(path)[:27]:<28}{seconds:>9.1f}{vad.skipped_ratio:>9.0%}"
+              f"{ungated_cpu:>8.2f}{gated_cpu:>11.2f}{errors[0] / count:>7.1%}{errors[1] / count:>9.1%}")
+
+    if not totals["words"]:
+        raise SystemExit(f"no WAV files in {args.wavs}")
+    print(f"{'total':<28}{totals['seconds']:>9.1f}{totals['skipped'] / totals['seconds']:>9.0%}"
+          f"{totals['cpu'][0]:>8.2f}{totals['cpu'][1]:>11.2f}"
+          f"{totals['errors'][0] / totals['words']:>7.1%}{totals['errors'][1] / totals['words']:>9.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Memory and query cost of per-session word timings.
+
+Simulates --hours of speech at --words-per-second (conversational English is
+about 2.5) in segments of --segment-words, and holds the timings three ways:
+WordTimeline (parallel arrays), a list of per-word dicts as the recognizer
+returns them, and the packed per-segment blobs that go to storage. Memory is
+measured with tracemalloc and reported per hour of audio. Then --queries
+random two-minute ranges are answered by bisecting the timeline and by
+scanning the list of dicts; locating a range is logarithmic, building the
+~300 words of the answer is the same for both.
+
+Run from the backend directory:
+    python -m benchmarks.bench_word_timeline --hours 4
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from services.word_timeline import WordTimeline, pack_words
+
+# A small lexicon; the vocabulary is shared, so its size barely matters
+LEXICON = [f"word{i}" for i in range(5000)]
+
+
+def make_segments(hours: float, words_per_second: float, segment_words: int):
+    rng = random.Random(0)
+    gap = 1 / words_per_second
+    t = 0.0
+    segment = []
+    for _ in range(int(hours * 3600 * words_per_second)):
+        segment.append((rng.choice(LEXICON), t, t + gap * 0.8, rng.random()))
+        t += gap
+        if len(segment) == segment_words:
+            yield segment
+            segment = []
+    if segment:
+        yield segment
+
+
+def measure(build):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return result, used
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hours", type=float, default=4)
+    parser.add_argument("--words-per-second", type=float, default=2.5)
+    parser.add_argument("--segment-words", type=int, default=12)
+    parser.add_argument("--queries", type=int, default=1000)
+    args = parser.parse_args()
+
+    segments = list(make_segments(args.hours, args.words_per_second, args.segment_words))
+    words = sum(len(segment) for segment in segments)
+
+    def timeline_build():
+        timeline = WordTimeline(max_words=words + 1)
+        for seq, segment in enumerate(segments):
+            timeline.append(seq, segment)
+        return timeline
+
+    def dicts_build():
+        return [
+            {"word": word, "start": start, "end": end, "conf": conf, "segment": seq}
+            for seq, segment in enumerate(segments)
+            for word, start, end, conf in segment
+        ]
+
+    def blobs_build():
+        return [pack_words(segment) for segment in segments]
+
+    # Warm the shared vocabulary so it isn't counted against the timeline
+    timeline_build()
+    timeline, timeline_bytes = measure(timeline_build)
+    dicts, dicts_bytes = measure(dicts_build)
+    blobs, _ = measure(blobs_build)
+    blob_bytes = sum(len(blob) for blob in blobs)
+
+    print(f"{args.hours:g} h, {words} words in {len(segments)} segments")
+    print(f"{'representation':<22}{'bytes/word':>12}{'kB/hour':>12}")
+    for name, used in (
+        ("WordTimeline", timeline_bytes),
+        ("list of dicts", dicts_bytes),
+        ("stored blobs", blob_bytes),
+    ):
+        print(f"{name:<22}{used / words:>12.1f}{used / args.hours / 1024:>12.1f}")
+
+    rng = random.Random(1)
+    total = args.hours * 3600
+    ranges = [(start, start + 120) for start in (rng.uniform(0, total - 120) for _ in range(args.queries))]
+    started = time.perf_counter()
+    for start, end in ranges:
+        timeline.span(start, end)
+    locate_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    bisected = [timeline.range(start, end) for start, end in ranges]
+    bisect_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    scanned = [[w for w in dicts if w["end"] > start and w["start"] < end] for start, end in ranges[:50]]
+    scan_seconds = (time.perf_counter() - started) / 50 * args.queries
+    # float32 times may move a boundary word in or out
+    assert all(abs(len(a) - len(b)) <= 2 for a, b in zip(bisected, scanned))
+    print(f"two-minute range query: bisect {bisect_seconds / args.queries * 1e6:.0f} us "
+          f"({locate_seconds / args.queries * 1e6:.1f} us to locate, the rest builds the words), "
+          f"scan {scan_seconds / args.queries * 1e6:.0f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Scaling across worker processes: the bench_load ramp at 1..N workers.
+
+For each count in --workers, starts cluster.py with that many uvicorn
+workers behind the session affinity proxy (and a stub LLM), runs the
+bench_load session ramp against the proxy and reports the highest
+sustainable session count, the latency at that level and the server CPU
+(all worker processes) per session. Dropped audio is collected from every
+worker's /ws/stats.
+
+Each worker decodes on its own cores (DECODER_WORKERS defaults to the core
+count divided by the workers), so the sustainable count should grow with
+workers up to the number of cores; beyond that, or on a single core, the
+extra processes only add memory and scheduling overhead. The JSON result
+records cpu_count so runs from different machines aren't compared blindly.
+
+--app picks what the workers run (default main:app). Run from the backend
+directory:
+    python -m benchmarks.bench_workers --wavs recordings/ --workers 1 2 4 --sessions 4 8 16 32 64
+"""
+import asyncio
+import copy
+import json
+import os
+import sys
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+from benchmarks.bench_load import build_parser, git_commit, run, spawned_server
+
+
+def main():
+    parser = build_parser(__doc__)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--app", default="main:app")
+    args = parser.parse_args()
+    if not args.wavs:
+        parser.error("--wavs is required")
+    args.protocol = "main"
+
+    results = []
+    for workers in args.workers:
+        print(f"--- {workers} worker{'s' if workers > 1 else ''}", file=sys.stderr)
+        with spawned_server(args.app, args.llm_latency, workers=workers) as (url, pid):
+            level_args = copy.copy(args)
+            port = urlparse(url).port
+            level_args.stats_urls = [
+                f"http://127.0.0.1:{port + 1 + index}/ws/stats" for index in range(workers)
+            ]
+            result = asyncio.run(run(level_args, url, pid))
+        sustainable = [level for level in result["levels"] if level["sustainable"]]
+        best = sustainable[-1] if sustainable else None
+        results.append({
+            "workers": workers,
+            "max_sustainable_sessions": result["max_sustainable_sessions"],
+            "partial_p95_at_max": best["partial_latency"]["p95"] if best else None,
+            "server_cpu_per_session_at_max": best["server_cpu_per_session"] if best else None,
+            "levels": result["levels"]
+        })
+
+    print(f"\n{'workers':>8}{'sessions':>10}{'p95 ms':>9}{'cpu/s':>9}", file=sys.stderr)
+    for row in results:
+        p95 = row["partial_p95_at_max"]
+        cpu = row["server_cpu_per_session_at_max"]
+        print(
+            f"{row['workers']:>8}{row['max_sustainable_sessions']:>10}"
+            f"{p95 * 1000 if p95 is not None else float('nan'):>9.0f}"
+            f"{cpu if cpu is not None else float('nan'):>9.3f}",
+            file=sys.stderr
+        )
+
+    output = json.dumps({
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "cpu_count": os.cpu_count(),
+        "settings": {
+            key: value for key, value in vars(args).items() if key not in ("compare", "output", "url", "pid")
+        },
+        "results": results
+    }, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
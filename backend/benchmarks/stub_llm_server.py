@@ -0,0 +1,120 @@
+"""Local stand-in for the OpenAI-compatible /chat/completions endpoint.
+
+Answers every request with a canned insights JSON document after a
+configurable delay, either as a single response or as a server-sent event
+stream when the request sets "stream": true. The delay can grow with the
+prompt size (--prefill-ms-per-1k-tokens) to mimic prompt processing cost.
+
+Run from the backend directory and point the service at it:
+    python -m benchmarks.stub_llm_server --port 8001 --latency 0.3
+    GROQ_API_URL=http://127.0.0.1:8001/v1/chat/completions python main.py
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+app = FastAPI()
+app.state.latency = 0.0
+app.state.chunk_size = 12
+app.state.prefill_ms_per_1k = 0.0
+app.state.requests = 0
+app.state.prompt_tokens = 0
+
+CANNED_CONTENT = json.dumps({
+    "insights": [
+        "Team agreed to ship the beta next sprint",
+        "Latency budget for transcription is 300ms"
+    ],
+    "questions": ["Who owns the rollout checklist?"],
+    "summary": "Team is planning the beta release and its latency budget."
+})
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough BPE-style estimate (~4 characters per token)"""
+    return max(1, len(text) // 4)
+
+
+def _prompt_tokens(body: dict) -> int:
+    return sum(estimate_tokens(m.get("content", "")) for m in body.get("messages", []))
+
+
+def _delay(prompt_tokens: int) -> float:
+    return app.state.latency + prompt_tokens / 1000 * app.state.prefill_ms_per_1k / 1000
+
+
+def _completion(content: str, model: str, prompt_tokens: int) -> dict:
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop"
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": estimate_tokens(content),
+            "total_tokens": prompt_tokens + estimate_tokens(content)
+        }
+    }
+
+
+async def _event_stream(content: str, model: str, delay: float):
+    # Time to first token is the configured latency; the rest trickles out
+    await asyncio.sleep(delay)
+    size = app.state.chunk_size
+    for i in range(0, len(content), size):
+        chunk = {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion.chunk",
+            "model": model,
+            "choices": [{"index": 0, "delta": {"content": content[i:i + size]}}]
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+        await asyncio.sleep(0.005)
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/v1/chat/completions")
+@app.post("/openai/v1/chat/completions")
+@app.post("/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    prompt_tokens = _prompt_tokens(body)
+    app.state.requests += 1
+    app.state.prompt_tokens += prompt_tokens
+    model = body.get("model", "stub")
+    if body.get("stream"):
+        return StreamingResponse(
+            _event_stream(CANNED_CONTENT, model, _delay(prompt_tokens)),
+            media_type="text/event-stream"
+        )
+    await asyncio.sleep(_delay(prompt_tokens))
+    return _completion(CANNED_CONTENT, model, prompt_tokens)
+
+
+@app.get("/stats")
+async def stats():
+    return {"requests": app.state.requests, "prompt_tokens": app.state.prompt_tokens}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds before the first byte")
+    parser.add_argument("--prefill-ms-per-1k-tokens", type=float, default=0.0,
+                        help="extra delay per 1000 prompt tokens")
+    args = parser.parse_args()
+    app.state.latency = args.latency
+    app.state.prefill_ms_per_1k = args.prefill_ms_per_1k_tokens
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,91 @@
+"""Run several uvicorn worker processes behind the session affinity proxy.
+
+Each worker is its own process (event loop, decoder pool, models) on
+--port + 1 ... --port + N, all sharing the SQLite database in WAL mode;
+services/affinity_proxy.py listens on --port and keeps each session on
+one worker. A worker that exits is restarted, and meanwhile its sessions
+reconnect to the next worker in their ranking, which resumes them from
+the database.
+
+Run from the backend directory:
+    python cluster.py --workers 4 --port 8000
+"""
+import os
+import sys
+import signal
+import asyncio
+import logging
+import argparse
+import subprocess
+from typing import List
+from services.affinity_proxy import AffinityProxy
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def worker_env(index: int, workers: int) -> dict:
+    env = dict(os.environ, WORKER_ID=f"worker-{index}")
+    # Split the cores between the workers' decoder pools unless configured
+    env.setdefault("DECODER_WORKERS", str(max(1, (os.cpu_count() or 1) // workers)))
+    # Share cached insight answers between workers
+    env.setdefault("INSIGHTS_CACHE_PATH", os.path.join("transcriptions", "insight_cache.db"))
+    return env
+
+
+def start_worker(index: int, args) -> subprocess.Popen:
+    return subprocess.Popen([
+        sys.executable, "-m", "uvicorn", args.app,
+        "--host", "127.0.0.1",
+        "--port", str(args.port + 1 + index),
+        "--log-level", args.log_level
+    ], env=worker_env(index, args.workers))
+
+
+async def supervise(processes: List[subprocess.Popen], args):
+    """Restart workers that exit"""
+    while True:
+        await asyncio.sleep(1)
+        for index, process in enumerate(processes):
+            if process.poll() is not None:
+                logger.warning(f"Worker {index} exited with code {process.returncode}, restarting")
+                processes[index] = start_worker(index, args)
+
+
+async def run(args):
+    processes = [start_worker(index, args) for index in range(args.workers)]
+    proxy = AffinityProxy([("127.0.0.1", args.port + 1 + index) for index in range(args.workers)])
+    loop = asyncio.get_running_loop()
+    stopped = asyncio.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stopped.set)
+    tasks = [
+        asyncio.create_task(proxy.serve(args.host, args.port)),
+        asyncio.create_task(supervise(processes, args))
+    ]
+    try:
+        await stopped.wait()
+    finally:
+        for task in tasks:
+            task.cancel()
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=int(os.getenv("CLUSTER_WORKERS", os.cpu_count() or 1)))
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--app", default="main:app", help="ASGI app each worker runs")
+    parser.add_argument("--log-level", default="info")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
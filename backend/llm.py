@@ -1,18 +1,16 @@
-import os
-from openai import AsyncOpenAI
 from dotenv import load_dotenv
+from services.llm_provider import ChatRequest, LLMClient, get_llm_client
 
 load_dotenv()
 
 class LLMProcessor:
-    def __init__(self):
-        self.client = AsyncOpenAI(
-            api_key=os.getenv("OPENAI_API_KEY")
-        )
+    def __init__(self, llm: LLMClient = None):
+        # The same client (provider, limits and retries) as the insights service
+        self.llm = llm or get_llm_client()
 
     async def process(self, text: str, instruction: str = None) -> str:
         """
-        Process text using OpenAI's GPT model
+        Process text using the configured LLM provider
         """
         try:
             # Create system message based on instruction or use default
@@ -21,17 +19,16 @@ class LLMProcessor:
                 else "You are a helpful assistant that processes transcribed text."
             )
             
-            response = await self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
+            response = await self.llm.complete(ChatRequest(
                 messages=[
                     {"role": "system", "content": system_message},
                     {"role": "user", "content": text}
                 ],
                 temperature=0.7,
                 max_tokens=150
-            )
+            ))
             
-            return response.choices[0].message.content.strip()
+            return response.strip()
             
         except Exception as e:
             raise Exception(f"Error in LLM processing: {str(e)}")
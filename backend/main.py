@@ -1,23 +1,43 @@
-from fastapi import FastAPI, WebSocket
+from fastapi import FastAPI, WebSocket, HTTPException, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 import json
-import base64
-import numpy as np
-from vosk import Model, KaldiRecognizer
-from services.insights_service import InsightsService
+import asyncio
+from services.insights_service import AnalysisState, InsightsService, InsightResponse
+from services.insight_scheduler import InsightScheduler, SchedulerMetrics
 from services.storage_service import StorageService
+from services.decoder_pool import DecoderPool, DecoderSession
+from services.model_registry import ModelRegistry, get_registry
+from services.batch_transcriber import BatchTranscriber, open_wav
+from services.transcript_stream import TranscriptStream
+from services.flow_control import OutboundQueue
+from services.llm_provider import get_llm_client
+from services.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, registry as metrics
+from services.audio_protocol import PROTOCOL_VERSION, FrameError, parse_frame, parse_json_frame
+from services.audio_convert import AudioConverter, AudioFormat
+from services.word_timeline import WordTimeline, parse_time
+from services.transcript_export import SUBTITLE_FORMATS, TranscriptExporter
+from services.speaker_diarization import DiarizationSession, SpeakerDiarizer, pack_embedding
 import logging
 from fastapi.websockets import WebSocketDisconnect
+import os
+import re
 import uuid
-from datetime import datetime
+import time
+import wave
+import tempfile
+from typing import Dict, Optional, Tuple
+from dotenv import load_dotenv
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Settings in .env (GROQ_API_KEY, ...) apply to the services created below
+load_dotenv()
+
 app = FastAPI()
-insights_service = InsightsService()
-storage_service = StorageService()
+insight_metrics = SchedulerMetrics()
 
 app.add_middleware(
     CORSMiddleware,
@@ -27,89 +47,496 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-try:
-    model = Model("vosk-model-small-en-us")
-    logger.info("Vosk model loaded successfully")
-except Exception as e:
-    logger.error(f"Error loading Vosk model: {e}")
-    raise
+# The services are created by startup(), not on import: the batch pool's
+# spawned processes import this module too (as __mp_main__ under
+# `python main.py`) and must not build a second server
+insights_service: Optional[InsightsService] = None
+storage_service: Optional[StorageService] = None
+model_registry: Optional[ModelRegistry] = None
+diarizer: Optional[SpeakerDiarizer] = None
+decoder_pool: Optional[DecoderPool] = None
+batch_transcriber: Optional[BatchTranscriber] = None
+# Live /ws sessions, attached to a connection or waiting for a reconnect
+sessions: Dict[str, "LiveSession"] = {}
+# How long a session whose connection dropped waits for its client to come
+# back to this worker; keep it below SESSION_HANDOFF_SECONDS, after which
+# another worker may take the session over
+SESSION_LINGER_SECONDS = float(os.getenv("SESSION_LINGER_SECONDS", "5"))
+# Consecutive failed messages before a connection is given up on
+MAX_CONSECUTIVE_ERRORS = 5
+# Session ids a client (or the affinity proxy) may pass as ?session_id=
+SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# Gauges read at scrape time; the histograms live next to the code they time
+metrics.gauge("ws_active_sessions", "Open /ws sessions").set_function(
+    lambda: sum(live.outbound is not None for live in sessions.values())
+)
+metrics.gauge(
+    "ws_lingering_sessions", "Sessions whose connection dropped, kept for a reconnect"
+).set_function(lambda: sum(live.outbound is None for live in sessions.values()))
+metrics.gauge(
+    "ws_inbound_queued_seconds", "Audio waiting for the decoder, summed over sessions"
+).set_function(lambda: sum(
+    live.decoder.queued_bytes / 2 / live.decoder.sample_rate for live in sessions.values()
+))
+metrics.gauge(
+    "ws_outbound_queued_messages", "Messages waiting to be sent, summed over sessions"
+).set_function(lambda: sum(
+    len(live.outbound) for live in sessions.values() if live.outbound is not None
+))
+metrics.gauge(
+    "ws_paused_sessions", "Sessions told to pause their audio (AUDIO_OVERFLOW_POLICY=signal)"
+).set_function(lambda: sum(live.decoder.stats()["paused"] for live in sessions.values()))
+metrics.gauge(
+    "transcript_word_timeline_bytes", "Memory held by word timings, summed over sessions"
+).set_function(lambda: sum(live.words.nbytes for live in sessions.values()))
+metrics.gauge(
+    "diarization_pending_utterances", "Final segments waiting for a speaker label"
+).set_function(lambda: diarizer.pending)
+metrics.gauge(
+    "storage_write_queue_depth", "Writes waiting for the next group commit"
+).set_function(lambda: storage_service.write_queue_depth)
+metrics.counter(
+    "insights_scheduler_events_total", "Insight requests submitted, LLM calls made, coalesced and failed",
+    ["event"]
+).set_function(insight_metrics.dict)
+metrics.counter(
+    "insights_cache_events_total", "Insight cache hits (memory, disk, similar prompt), misses and evictions",
+    ["event"]
+).set_function(lambda: insights_service.cache.stats.dict())
+
+def create_services():
+    global insights_service, storage_service, model_registry, diarizer, decoder_pool, batch_transcriber
+    insights_service = InsightsService()
+    storage_service = StorageService()
+    # Models come from VOSK_MODELS and are loaded on first use; worker count and
+    # per-session queue limit come from DECODER_WORKERS and DECODER_MAX_QUEUED_SECONDS
+    model_registry = get_registry()
+    # Speaker labels for final segments, off the decoding path (DIARIZATION_ENABLED=1)
+    diarizer = SpeakerDiarizer()
+    # With diarization on, finals carry their utterance's audio
+    decoder_pool = DecoderPool(
+        model_registry, utterance_seconds=diarizer.max_seconds if diarizer.enabled else 0.0
+    )
+    # Offline jobs decode in their own process pool (BATCH_WORKERS), started on first use
+    batch_transcriber = BatchTranscriber(storage_service)
+
+@app.on_event("startup")
+async def startup():
+    create_services()
+    # Load the default model and fill its recognizer pool so the first
+    # connection doesn't pay for either
+    model_load_started = time.perf_counter()
+    try:
+        await model_registry.prewarm(words=decoder_pool.words)
+    except Exception as e:
+        logger.error(f"Error loading Vosk model: {e}")
+        raise
+    model_load_seconds = time.perf_counter() - model_load_started
+    # A local LLM is loaded now too (other providers have nothing to load)
+    await get_llm_client().start()
+    # Opening storage also applies any pending schema migrations
+    await storage_service.start()
+    logger.info(
+        f"Startup: model load {model_load_seconds:.2f}s, "
+        f"database {storage_service.startup_seconds:.2f}s"
+    )
+
+@app.on_event("shutdown")
+async def shutdown():
+    for live in list(sessions.values()):
+        await end_live_session(live)
+    await diarizer.close()
+    decoder_pool.shutdown()
+    model_registry.shutdown()
+    batch_transcriber.shutdown()
+    await insights_service.close()
+    await get_llm_client().close()
+    await storage_service.close()
+
+class LiveSession:
+    """A /ws session's server-side state.
+
+    It outlives its connection by SESSION_LINGER_SECONDS, so a client that
+    reconnects to this worker gets the same recognizer, transcript and
+    insight state back without reading anything from storage. outbound is
+    None while no connection is attached; changes made meanwhile wait in
+    the stream for the reconnect's snapshot.
+    """
+
+    def __init__(self, session_id: str, stream: TranscriptStream, words: WordTimeline):
+        self.session_id = session_id
+        self.stream = stream
+        # Word timings for time-range queries while the session is live
+        self.words = words
+        self.outbound: Optional[OutboundQueue] = None
+        self.decoder: Optional[DecoderSession] = None
+        self.scheduler: Optional[InsightScheduler] = None
+        self.results_task: Optional[asyncio.Task] = None
+        self.expiry: Optional[asyncio.Task] = None
+        self.diarization: Optional[DiarizationSession] = None
+        # Speaker labels (by segment seq) the client hasn't been sent yet
+        self.speakers: Dict[int, str] = {}
+
+    async def signal_flow(self, paused: bool):
+        # Under the signal policy: ask the client to hold its audio
+        if self.outbound is not None:
+            self.outbound.put_nowait({"type": "flow", "paused": paused}, key="flow")
+
+    async def send_transcript(self):
+        if self.outbound is not None:
+            await self.outbound.put(self.stream.message, key="transcript")
+
+    async def send_insights(self, insights: InsightResponse, is_final: bool, segment_seq: Optional[int]):
+        if is_final and segment_seq is not None:
+            await storage_service.set_segment_insights(
+                self.session_id,
+                segment_seq,
+                ai_insights=insights.insights,
+                ai_questions=insights.questions
+            )
+            # For a worker that resumes the session later
+            await storage_service.save_insight_state(
+                self.session_id,
+                self.scheduler.state.summary,
+                self.scheduler.state.last_full_analysis.timestamp()
+            )
+        if self.outbound is not None:
+            await self.outbound.put({
+                "type": "insights",
+                "insights": insights.dict(),
+                "final": is_final
+            }, key="insights")
+
+    async def label_segment(self, segment_seq: int, speaker: Optional[str], embedding):
+        # The embedding is kept for a worker that resumes the session later
+        await storage_service.set_segment_speaker(
+            self.session_id, segment_seq, speaker, pack_embedding(embedding)
+        )
+        if speaker is not None:
+            self.speakers[segment_seq] = speaker
+            self.send_speakers()
+
+    def send_speakers(self):
+        # Labels pile up under one key behind a slow client and go out together;
+        # never waits, so the diarizer doesn't either
+        if self.outbound is not None and self.speakers:
+            self.outbound.put_nowait(self._speakers_message, key="speakers")
+
+    def _speakers_message(self) -> Optional[Dict]:
+        speakers, self.speakers = self.speakers, {}
+        if not speakers:
+            return None
+        return {"type": "speakers", "speakers": {str(seq): label for seq, label in speakers.items()}}
+
+async def forward_results(live: LiveSession):
+    """Send decoder results to the client as they come out of the pool.
+
+    Transcript changes are queued under one key: behind a slow client they
+    coalesce, and stream.message() builds a single delta when it is sent.
+    """
+    decoder, stream = live.decoder, live.stream
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            # Wake up for a held partial even if the decoder has nothing new
+            delay = stream.flush_delay(loop.time())
+            try:
+                result = await asyncio.wait_for(decoder.results.get(), delay)
+            except asyncio.TimeoutError:
+                if stream.flush(loop.time()):
+                    await live.send_transcript()
+                continue
+
+            if result.is_final:
+                text = result.text
+                if not text:
+                    continue
+                logger.info(f"Transcribed text: {text}")
+
+                # Only the new segment is stored; the full transcript is
+                # rebuilt from segments on read
+                segment_seq = await storage_service.append_segment(
+                    decoder.session_id,
+                    text,
+                    start_time=result.start_time,
+                    end_time=result.end_time,
+                    words=result.words
+                )
+                live.words.append(segment_seq, result.words)
+                if live.diarization is not None:
+                    # Labeled later, on the diarizer's own threads
+                    diarizer.submit(live.diarization, segment_seq, result.audio)
+
+                # Insights are generated in the background from the new
+                # segments, so the transcript goes out without waiting
+                live.scheduler.submit(text, segment_seq)
+                changed = stream.commit(text, result.end_time)
+            else:
+                changed = stream.update_partial(result.text, loop.time(), result.end_time)
+            if changed:
+                await live.send_transcript()
+        except Exception as e:
+            logger.error(f"Error forwarding results: {e}")
+
+async def send_snapshot(live: LiveSession, from_segment: int = 0):
+    """Queue a snapshot for a client that has the first from_segment segments"""
+    stream, outbound = live.stream, live.outbound
+    from_segment = max(0, min(from_segment, stream.segment_count))
+    # Nothing more is spilled until the snapshot is built
+    stream.pin()
+    stored = None
+    if from_segment < stream.spilled:
+        try:
+            stored = await storage_service.get_transcript_range(
+                live.session_id, from_segment, stream.spilled
+            )
+        except Exception:
+            stream.unpin()
+            raise
+    await outbound.put(lambda: stream.snapshot(from_segment, stored))
+
+async def open_live_session(
+    websocket: WebSocket,
+    session_id: str,
+    resume: bool,
+    outbound: OutboundQueue
+) -> Tuple[Optional[LiveSession], bool]:
+    """Start a session, or take over a stored one; (None, False) if it can't be opened"""
+    # Full-text updates until the client negotiates deltas in its config message
+    stream = TranscriptStream()
+    resumed = None
+    if resume:
+        # Waits for another worker that still has the session to let it go
+        resumed = await storage_service.claim_session(session_id, tail=stream.max_segments)
+    # A resumed session's earlier words are answered from storage
+    live = LiveSession(
+        session_id, stream, WordTimeline(since=(resumed["audio_end"] or 0.0) if resumed else 0.0)
+    )
+    live.outbound = outbound
+    # Model selected per session with ?language=de (default from VOSK_DEFAULT_LANGUAGE)
+    language = websocket.query_params.get("language")
+    try:
+        live.decoder = await decoder_pool.open_session(
+            session_id,
+            language,
+            on_flow=live.signal_flow,
+            # Timestamps continue where the resumed session's audio ended
+            start_time=(resumed["audio_end"] or 0.0) if resumed else 0.0
+        )
+    except ValueError as e:
+        outbound.put_nowait({"type": "error", "message": str(e)})
+        await outbound.close()
+        await websocket.close(code=1008)
+        if resumed is not None:
+            await storage_service.end_session(session_id)
+        return None, False
+
+    state = None
+    if resumed is not None:
+        state = AnalysisState.restore(
+            resumed["segments"],
+            resumed["insight_summary"],
+            resumed["last_full_analysis"]
+        )
+        stream.restore(
+            resumed["segments"],
+            resumed["segment_count"],
+            resumed["base"],
+            resumed["audio_end"]
+        )
+        logger.info(
+            f"Resumed transcription session {session_id} "
+            f"({resumed['segment_count']} segments, last worker {resumed['previous_worker']})"
+        )
+    else:
+        await storage_service.create_session(session_id)
+        logger.info(f"New transcription session started: {session_id}")
+    live.scheduler = InsightScheduler(insights_service, live.send_insights, insight_metrics, state=state)
+    if diarizer.enabled:
+        # A resumed session keeps its speakers, from the stored embeddings
+        history = await storage_service.get_speaker_embeddings(session_id) if resumed is not None else ()
+        live.diarization = diarizer.open_session(
+            session_id, live.label_segment, history,
+            background=resumed["speaker_background"] if resumed is not None else None,
+            on_background=lambda blob: storage_service.save_speaker_background(session_id, blob)
+        )
+    live.results_task = asyncio.create_task(forward_results(live))
+    sessions[session_id] = live
+    return live, resumed is not None
+
+async def reattach(live: LiveSession, outbound: OutboundQueue):
+    """A reconnect to a session still live here: nothing to reload or redecode"""
+    if live.expiry is not None:
+        live.expiry.cancel()
+        live.expiry = None
+    previous, live.outbound = live.outbound, outbound
+    live.stream.drop_pending_snapshots()
+    # Labels that arrived while the client was away
+    live.send_speakers()
+    if previous is not None:
+        # The client came back before its old connection was seen to drop
+        await previous.close(drain_timeout=0)
+        try:
+            await previous.websocket.close(code=1001)
+        except Exception:
+            pass
+    logger.info(f"Reattached transcription session {live.session_id}")
+
+async def detach(live: LiveSession, outbound: OutboundQueue):
+    """The connection went away: keep the session for a reconnect, or end it"""
+    if live.outbound is not outbound:
+        # Already taken over by a newer connection
+        return
+    live.outbound = None
+    if SESSION_LINGER_SECONDS > 0 and sessions.get(live.session_id) is live:
+        live.expiry = asyncio.create_task(expire(live))
+    else:
+        await end_live_session(live)
+
+async def expire(live: LiveSession):
+    await asyncio.sleep(SESSION_LINGER_SECONDS)
+    live.expiry = None
+    await end_live_session(live)
+
+async def end_live_session(live: LiveSession):
+    if sessions.get(live.session_id) is live:
+        del sessions[live.session_id]
+    if live.expiry is not None:
+        live.expiry.cancel()
+        live.expiry = None
+    live.results_task.cancel()
+    if live.diarization is not None:
+        diarizer.close_session(live.diarization)
+    await live.scheduler.close()
+    await decoder_pool.close_session(live.session_id)
+    await storage_service.end_session(live.session_id)
+    logger.info(f"Ended transcription session {live.session_id}")
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
-    current_text = ""
-    recognizer = KaldiRecognizer(model, 16000)
-    
-    logger.info("New transcription session started")
+    # ?session_id= resumes that session: from memory if it is still live on
+    # this worker, otherwise from the shared database wherever it was
+    # started; an unknown id starts a new session under it
+    requested = websocket.query_params.get("session_id")
+    if requested is not None and not SESSION_ID_PATTERN.match(requested):
+        await websocket.close(code=1008, reason="Invalid session_id")
+        return
+    session_id = requested or str(uuid.uuid4())
+    # Everything sent to this client goes through one bounded queue
+    outbound = OutboundQueue(websocket)
+    live = sessions.get(session_id) if requested else None
+    if live is not None:
+        await reattach(live, outbound)
+        resumed = True
+    else:
+        live, resumed = await open_live_session(websocket, session_id, requested is not None, outbound)
+        if live is None:
+            return
+    decoder, stream = live.decoder, live.stream
+    binary_audio = False
+    # 16 kHz mono int16 unless the client negotiates another format
+    converter = AudioConverter()
+    errors = 0
+
+    async def feed(audio):
+        audio = converter.convert(audio)
+        if audio:
+            await decoder.feed(audio)
+
+    def negotiate_format(data: Dict) -> Dict:
+        # Keeps the current format if the requested one is unsupported
+        nonlocal converter
+        try:
+            requested = AudioFormat.from_config(data)
+        except ValueError as e:
+            outbound.put_nowait({"type": "error", "message": str(e)})
+        else:
+            if requested != converter.format:
+                converter = AudioConverter(requested)
+        return converter.format.dict()
     
     try:
         while True:
             try:
-                message = await websocket.receive_text()
-                logger.info("Received message")
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(message.get("code", 1000))
+
+                if message.get("bytes") is not None:
+                    if not binary_audio:
+                        logger.warning("Binary frame received before binary mode was negotiated")
+                        continue
+                    try:
+                        # Raw int16 PCM goes to the decoder as a view into the frame
+                        _sequence, audio_data = parse_frame(message["bytes"])
+                    except FrameError as e:
+                        logger.warning(f"Invalid audio frame: {e}")
+                        continue
+                    await feed(audio_data)
+                    errors = 0
+                    continue
                 
                 try:
-                    data = json.loads(message)
-                    logger.info(f"Message type: {data.get('type')}")
-                    
-                    if data.get('type') != 'audio' or not data.get('data'):
-                        logger.warning("Invalid message format")
+                    data = json.loads(message["text"])
+                    logger.debug(f"Message type: {data.get('type')}")
+
+                    if data.get('type') == 'config':
+                        binary_audio = (
+                            bool(data.get('binary'))
+                            and data.get('protocol_version') == PROTOCOL_VERSION
+                        )
+                        stream.deltas = bool(data.get('deltas'))
+                        audio_format = negotiate_format(data)
+                        await outbound.put({
+                            "type": "config",
+                            "binary": binary_audio,
+                            "protocol_version": PROTOCOL_VERSION,
+                            "session_id": session_id,
+                            "model": decoder.model_path,
+                            "deltas": stream.deltas,
+                            "resumed": resumed,
+                            # The format audio frames are read as
+                            "audio": audio_format
+                        })
+                        if stream.deltas:
+                            # Deltas are relative to this; a resuming client
+                            # only gets the segments it doesn't have
+                            resume_from = int(data.get('resume_from') or 0) if resumed else 0
+                            await send_snapshot(live, resume_from)
+                        elif resumed:
+                            if stream.spilled:
+                                # Full-text updates repeat everything, spilled or not
+                                _offset, spilled = await storage_service.get_transcript_range(
+                                    session_id, 0, stream.spilled
+                                )
+                                stream.unspill(spilled)
+                            await outbound.put({"type": "update", "text": stream.text})
+                        continue
+
+                    if data.get('type') == 'format':
+                        # The client's audio format changed, e.g. a new recording
+                        await outbound.put({"type": "format", "audio": negotiate_format(data)})
+                        continue
+
+                    if data.get('type') == 'resync':
+                        # The client missed a delta; replay from the last
+                        # segment it has, or from the start
+                        await send_snapshot(live, int(data.get('segments') or 0))
                         continue
                     
-                    # Get the audio data
-                    audio_base64 = data['data']
-                    
-                    # Decode base64 data
-                    audio_data = base64.b64decode(audio_base64)
-                    
-                    # Convert to numpy array and ensure it's 16-bit PCM
-                    audio_np = np.frombuffer(audio_data, dtype=np.int16)
+                    # Legacy base64-in-JSON audio frame
+                    try:
+                        audio_data = parse_json_frame(data)
+                    except FrameError as e:
+                        logger.warning(str(e))
+                        continue
                     
-                    if recognizer.AcceptWaveform(audio_np.tobytes()):
-                        result = json.loads(recognizer.Result())
-                        text = result.get("text", "").strip()
-                        logger.info(f"Transcribed text: {text}")
-                        
-                        if text:
-                            current_text += " " + text
-                            current_text = current_text.strip()
-                            
-                            try:
-                                # Generate insights for every transcription update
-                                insights = await insights_service.generate_insights(current_text)
-                                logger.info("Generated insights successfully")
-                                
-                                # Save to database with insights
-                                await storage_service.save_transcription(
-                                    transcription_text=current_text,
-                                    ai_insights=insights.insights,
-                                    ai_questions=insights.questions
-                                )
-                                
-                                # Send to client
-                                await websocket.send_json({
-                                    "type": "update",
-                                    "text": current_text,
-                                    "insights": insights.dict()
-                                })
-                            except Exception as e:
-                                logger.error(f"Error generating insights: {e}")
-                                # Save to database without insights
-                                await storage_service.save_transcription(
-                                    transcription_text=current_text
-                                )
-                                # Send just the transcription
-                                await websocket.send_json({
-                                    "type": "update",
-                                    "text": current_text
-                                })
-                    else:
-                        partial = json.loads(recognizer.PartialResult())
-                        if partial.get("partial", "").strip():
-                            await websocket.send_json({
-                                "type": "partial",
-                                "text": current_text + " " + partial["partial"]
-                            })
+                    # Decoding happens on the pool; a full session queue
+                    # waits or drops per AUDIO_OVERFLOW_POLICY
+                    await feed(audio_data)
+                    errors = 0
                             
                 except json.JSONDecodeError as e:
                     logger.error(f"Error decoding message: {e}")
@@ -120,7 +547,12 @@ async def websocket_endpoint(websocket: WebSocket):
                 break
             except Exception as e:
                 logger.error(f"Error in websocket loop: {e}")
-                await websocket.send_json({
+                errors += 1
+                if errors >= MAX_CONSECUTIVE_ERRORS:
+                    await outbound.close()
+                    await websocket.close(code=1011)
+                    break
+                outbound.put_nowait({
                     "type": "error",
                     "message": str(e)
                 })
@@ -128,20 +560,147 @@ async def websocket_endpoint(websocket: WebSocket):
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
     finally:
+        await outbound.close()
+        await detach(live, outbound)
         logger.info("Closing WebSocket connection")
 
-# Add REST endpoints for retrieving transcriptions
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text format; scrape it or read it with curl"""
+    return Response(metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/ws/stats")
+async def get_ws_stats():
+    """Inbound audio and outbound message queues of every live session"""
+    return {
+        session_id: {
+            "inbound": live.decoder.stats(),
+            # None while the session waits for a reconnect
+            "outbound": live.outbound.stats() if live.outbound is not None else None
+        }
+        for session_id, live in sessions.items()
+    }
+
+@app.get("/insights/stats")
+async def get_insight_stats():
+    return {**insight_metrics.dict(), "cache": insights_service.cache.info()}
+
+@app.get("/models")
+async def get_models():
+    return {
+        "languages": model_registry.models,
+        "default_language": model_registry.default_language,
+        **model_registry.stats()
+    }
+
+# REST endpoints for retrieving sessions and their segments
+@app.get("/sessions")
+async def get_sessions(limit: int = 100, offset: int = 0):
+    return await storage_service.get_sessions(limit, offset)
+
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str):
+    session = await storage_service.get_session(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session
+
+@app.get("/sessions/{session_id}/segments")
+async def get_segments(session_id: str, limit: int = 100, offset: int = 0):
+    return await storage_service.get_segments(session_id, limit, offset)
+
+@app.get("/sessions/{session_id}/words")
+async def get_words(session_id: str, start: str = "0", end: Optional[str] = None):
+    """Words said between start and end (seconds, or m:ss / h:mm:ss of session audio)"""
+    try:
+        start_time = parse_time(start)
+        end_time = parse_time(end) if end is not None else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if end_time is not None and end_time < start_time:
+        raise HTTPException(status_code=400, detail="end is before start")
+    live = sessions.get(session_id)
+    if live is not None and live.words.covers(start_time):
+        # Bisected in memory; older words of a long or resumed session are stored
+        words = live.words.range(start_time, end_time)
+    else:
+        words = await storage_service.get_words(session_id, start_time, end_time)
+    return {"session_id": session_id, "start": start_time, "end": end_time, "words": words}
+
+def export_response(export_format: str, session_id: Optional[str], filename: str) -> StreamingResponse:
+    try:
+        exporter = TranscriptExporter(export_format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Chunked: rendered batch by batch as the storage cursor reads them
+    return StreamingResponse(
+        exporter.stream(storage_service.iter_segments(session_id)),
+        media_type=exporter.media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{export_format}"'}
+    )
+
+@app.get("/sessions/{session_id}/export")
+async def export_session(session_id: str, format: str = "txt"):
+    """A session's transcript as NDJSON segments, SRT/WebVTT subtitles or plain text"""
+    if not await storage_service.session_exists(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return export_response(format, session_id, session_id)
+
+@app.get("/export")
+async def export_all(format: str = "ndjson"):
+    """Every stored segment, session by session, as NDJSON or plain text"""
+    if format in SUBTITLE_FORMATS:
+        raise HTTPException(status_code=400, detail="Subtitles are exported per session")
+    return export_response(format, None, "transcripts")
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    return await storage_service.delete_session(session_id)
+
+# Legacy endpoints, served from sessions
 @app.get("/transcriptions")
 async def get_transcriptions(limit: int = 100, offset: int = 0):
-    return await storage_service.get_transcriptions(limit, offset)
-
-@app.get("/transcriptions/{transcription_id}")
-async def get_transcription(transcription_id: int):
-    return await storage_service.get_transcription(transcription_id)
+    return await storage_service.get_all_transcriptions(limit, offset)
 
+# Declared before /transcriptions/{transcription_id} so "search" isn't taken for an id
 @app.get("/transcriptions/search")
-async def search_transcriptions(query: str, limit: int = 100, offset: int = 0):
-    return await storage_service.search_transcriptions(query, limit, offset)
+async def search_transcriptions(
+    query: str,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    session_id: Optional[str] = None
+):
+    try:
+        return await storage_service.search_transcriptions(query, limit, cursor, session_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/transcriptions/batch", status_code=202)
+async def create_batch_transcription(file: UploadFile = File(...)):
+    """Upload a WAV file for offline transcription; poll the returned job"""
+    fd, path = tempfile.mkstemp(suffix=".wav")
+    try:
+        # Streamed to disk so large recordings never sit in memory
+        with os.fdopen(fd, "wb") as out:
+            while chunk := await file.read(1 << 20):
+                await asyncio.to_thread(out.write, chunk)
+        open_wav(path).close()
+    except (ValueError, wave.Error, EOFError) as e:
+        os.remove(path)
+        raise HTTPException(status_code=400, detail=f"Unsupported audio file: {e}")
+    job = batch_transcriber.submit(path, file.filename, delete_file=True)
+    return job.dict()
+
+@app.get("/transcriptions/batch/{job_id}")
+async def get_batch_transcription(job_id: str):
+    job = batch_transcriber.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.dict()
+
+@app.get("/transcriptions/{transcription_id}")
+async def get_transcription(transcription_id: str):
+    return await storage_service.get_session(transcription_id)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,229 @@
+import re
+import json
+import uuid
+import asyncio
+import hashlib
+import logging
+from itertools import count
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+Backend = Tuple[str, int]
+
+# Largest request head accepted before the request line is parsed
+MAX_HEAD_BYTES = 64 * 1024
+# Per-worker state the proxy collects from every worker instead of routing
+STATS_PATHS = ("/metrics", "/ws/stats", "/insights/stats")
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+_SAMPLE = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})? (.*)$")
+
+
+def worker_name(backend: Backend) -> str:
+    return f"{backend[0]}:{backend[1]}"
+
+
+def merge_metrics(texts: Dict[str, str]) -> str:
+    """One Prometheus exposition from each worker's, every sample labeled worker="host:port"
+
+    Samples of a family are kept together (under its first HELP and TYPE
+    lines), as the text format requires.
+    """
+    families: Dict[str, List[str]] = {}
+    for worker, text in texts.items():
+        family = None
+        for line in text.splitlines():
+            if line.startswith("# "):
+                parts = line.split(" ", 3)
+                if len(parts) >= 3 and parts[1] in ("HELP", "TYPE"):
+                    family = parts[2]
+                    lines = families.setdefault(family, [])
+                    if not any(existing.startswith(f"# {parts[1]} ") for existing in lines):
+                        lines.append(line)
+                continue
+            match = _SAMPLE.match(line)
+            if match is None or family is None:
+                continue
+            name, labels, value = match.groups()
+            labels = f'worker="{worker}"' + (f",{labels}" if labels else "")
+            families[family].append(f"{name}{{{labels}}} {value}")
+    # The HELP and TYPE lines first, whichever worker they came from
+    return "".join(
+        "\n".join(sorted(lines, key=lambda line: not line.startswith("# "))) + "\n"
+        for lines in families.values()
+    )
+
+
+def affinity_key(path: str, query: str) -> Optional[str]:
+    """The session a request belongs to: ?session_id= or /sessions/{id}"""
+    session_id = parse_qs(query).get("session_id")
+    if session_id:
+        return session_id[0]
+    parts = path.strip("/").split("/")
+    if len(parts) >= 2 and parts[0] == "sessions":
+        return parts[1]
+    return None
+
+
+class AffinityProxy:
+    """TCP front end that keeps every session on one worker process.
+
+    Only the request head is parsed: requests for a session (?session_id=
+    or /sessions/{id}) go to the worker ranked first for it by rendezvous
+    hashing, so a reconnect lands where the session already is and only
+    the sessions of a worker that goes away move. A new /ws connection gets
+    a session id here, so it is routed like its later reconnects. Other
+    requests are spread round-robin. After the head the bytes are piped
+    unchanged, WebSocket frames included; further requests on a keep-alive
+    connection stay on the same worker.
+
+    GET /metrics, /ws/stats and /insights/stats describe one worker each,
+    so the proxy answers them itself from every worker's (see stats()).
+    """
+
+    def __init__(self, backends: List[Backend], connect_timeout: float = 1.0, stats_timeout: float = 5.0):
+        self.backends = list(backends)
+        self.connect_timeout = connect_timeout
+        self.stats_timeout = stats_timeout
+        self.connections = 0
+        self.failovers = 0
+        self._next = count()
+
+    def rank(self, key: Optional[str]) -> List[Backend]:
+        """Workers in the order to try for a session (round-robin without one)"""
+        if key is None:
+            start = next(self._next) % len(self.backends)
+            return self.backends[start:] + self.backends[:start]
+        return sorted(
+            self.backends,
+            key=lambda backend: hashlib.blake2b(f"{key}|{backend[0]}:{backend[1]}".encode()).digest(),
+            reverse=True
+        )
+
+    async def _connect(self, key: Optional[str]):
+        for attempt, backend in enumerate(self.rank(key)):
+            try:
+                streams = await asyncio.wait_for(asyncio.open_connection(*backend), self.connect_timeout)
+            except (OSError, asyncio.TimeoutError) as e:
+                logger.warning(f"Worker {backend[0]}:{backend[1]} unreachable: {e}")
+                continue
+            if attempt:
+                # The session resumes from the database on this worker
+                self.failovers += 1
+            return streams
+        return None
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                return
+            request_line, rest = head.split(b"\r\n", 1)
+            try:
+                method, target, version = request_line.decode("latin-1").split(" ")
+            except ValueError:
+                writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+                return
+            url = urlsplit(target)
+            if method == "GET" and url.path in STATS_PATHS:
+                content_type, body = await self.stats(url.path)
+                writer.write(
+                    f"HTTP/1.1 200 OK\r\nContent-Type: {content_type}\r\n"
+                    f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+                )
+                await writer.drain()
+                return
+            key = affinity_key(url.path, url.query)
+            if key is None and url.path == "/ws":
+                key = str(uuid.uuid4())
+                query = f"{url.query}&" if url.query else ""
+                target = urlunsplit(url._replace(query=query + urlencode({"session_id": key})))
+
+            upstream = await self._connect(key)
+            if upstream is None:
+                writer.write(b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\n\r\n")
+                return
+            upstream_reader, upstream_writer = upstream
+            upstream_writer.write(f"{method} {target} {version}\r\n".encode("latin-1") + rest)
+            await asyncio.gather(
+                self._pipe(reader, upstream_writer),
+                self._pipe(upstream_reader, writer)
+            )
+        except Exception as e:
+            logger.error(f"Error proxying connection: {e}")
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def _fetch(self, backend: Backend, path: str) -> Optional[bytes]:
+        """The body of a GET to one worker, or None if it doesn't answer with a 200"""
+        try:
+            async with asyncio.timeout(self.stats_timeout):
+                reader, writer = await asyncio.open_connection(*backend)
+                try:
+                    writer.write(
+                        f"GET {path} HTTP/1.1\r\nHost: {worker_name(backend)}\r\n"
+                        f"Connection: close\r\n\r\n".encode("latin-1")
+                    )
+                    response = await reader.read()
+                finally:
+                    writer.close()
+        except (OSError, asyncio.TimeoutError) as e:
+            logger.warning(f"No {path} from worker {worker_name(backend)}: {e}")
+            return None
+        head, _, body = response.partition(b"\r\n\r\n")
+        status = head.split(b"\r\n", 1)[0]
+        if status.split(b" ")[1:2] != [b"200"]:
+            logger.warning(f"No {path} from worker {worker_name(backend)}: {status!r}")
+            return None
+        return body
+
+    async def stats(self, path: str) -> Tuple[str, bytes]:
+        """Content type and body of a STATS_PATHS request, from all workers.
+
+        /metrics: every worker's samples labeled worker="host:port", plus
+        proxy_worker_up (0 for a worker that didn't answer).
+        /ws/stats: all workers' sessions, each with its "worker".
+        /insights/stats: {"workers": {"host:port": that worker's stats}}.
+        """
+        bodies = await asyncio.gather(*(self._fetch(backend, path) for backend in self.backends))
+        answers = {
+            worker_name(backend): body for backend, body in zip(self.backends, bodies) if body is not None
+        }
+        if path == "/metrics":
+            up = "".join(
+                f'proxy_worker_up{{worker="{worker_name(backend)}"}} {int(body is not None)}\n'
+                for backend, body in zip(self.backends, bodies)
+            )
+            text = merge_metrics({worker: body.decode() for worker, body in answers.items()})
+            text += "# HELP proxy_worker_up Whether the worker answered this scrape\n# TYPE proxy_worker_up gauge\n" + up
+            return METRICS_CONTENT_TYPE, text.encode()
+        if path == "/ws/stats":
+            merged = {}
+            for worker, body in answers.items():
+                for session_id, stats in json.loads(body).items():
+                    merged[session_id] = {**stats, "worker": worker}
+        else:
+            merged = {"workers": {worker: json.loads(body) for worker, body in answers.items()}}
+        return "application/json", json.dumps(merged).encode()
+
+    @staticmethod
+    async def _pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while data := await reader.read(1 << 16):
+                writer.write(data)
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            # Either side hanging up ends the whole connection
+            writer.close()
+
+    async def serve(self, host: str, port: int):
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_HEAD_BYTES)
+        logger.info(f"Affinity proxy on {host}:{port} for {len(self.backends)} workers")
+        async with server:
+            await server.serve_forever()
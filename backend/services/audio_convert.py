@@ -0,0 +1,143 @@
+from dataclasses import dataclass, asdict
+from math import gcd
+from typing import Dict, Optional, Union
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from services.model_registry import SAMPLE_RATE
+
+AudioBuffer = Union[bytes, memoryview]
+
+# Sample encodings a client may send; compressed audio (MediaRecorder's
+# webm/opus) would need a decoder the server doesn't have
+ENCODINGS = {"s16le": np.dtype("<i2"), "f32le": np.dtype("<f4")}
+MIN_SAMPLE_RATE = 8000
+MAX_SAMPLE_RATE = 192000
+MAX_CHANNELS = 8
+# Half-width of the resampling filter, in zero crossings of its sinc
+ZERO_CROSSINGS = 8
+KAISER_BETA = 8.0
+
+
+@dataclass
+class AudioFormat:
+    sample_rate: int = SAMPLE_RATE
+    channels: int = 1
+    encoding: str = "s16le"
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "AudioFormat":
+        """The format a /ws config message asks for; ValueError if unsupported"""
+        audio_format = cls(
+            sample_rate=int(config.get("sample_rate") or SAMPLE_RATE),
+            channels=int(config.get("channels") or 1),
+            encoding=str(config.get("encoding") or "s16le")
+        )
+        if audio_format.encoding not in ENCODINGS:
+            raise ValueError(
+                f"Unsupported audio encoding: {audio_format.encoding} "
+                f"(send raw PCM as {' or '.join(ENCODINGS)})"
+            )
+        if not MIN_SAMPLE_RATE <= audio_format.sample_rate <= MAX_SAMPLE_RATE:
+            raise ValueError(f"Unsupported sample rate: {audio_format.sample_rate}")
+        if not 1 <= audio_format.channels <= MAX_CHANNELS:
+            raise ValueError(f"Unsupported channel count: {audio_format.channels}")
+        return audio_format
+
+    @property
+    def frame_bytes(self) -> int:
+        return ENCODINGS[self.encoding].itemsize * self.channels
+
+    def dict(self):
+        return asdict(self)
+
+
+def design_filter(up: int, down: int, zero_crossings: int = ZERO_CROSSINGS) -> np.ndarray:
+    """Kaiser-windowed sinc low-pass for resampling by up/down, as a polyphase bank.
+
+    Returns an (up, taps) array: row p holds the taps applied to the input
+    samples ending at the current one (oldest first) for an output at
+    phase p. The cutoff sits a little below the lower of the two Nyquist
+    frequencies, and the gain of `up` makes up for the zeros stuffed in
+    between input samples.
+    """
+    factor = max(up, down)
+    taps = 2 * zero_crossings * factor // up + 1
+    length = taps * up
+    cutoff = 0.95 / factor  # of the upsampled Nyquist frequency
+    n = np.arange(length) - (length - 1) / 2
+    prototype = cutoff * np.sinc(cutoff * n) * np.kaiser(length, KAISER_BETA) * up
+    # prototype[p + k * up] multiplies the input k samples back, for phase p
+    bank = prototype.reshape(taps, up).T
+    return np.ascontiguousarray(bank[:, ::-1], dtype=np.float32)
+
+
+class AudioConverter:
+    """Streaming conversion of a client's audio to what the recognizer takes.
+
+    Input in any AudioFormat comes out as 16 kHz mono int16: float32 is
+    scaled and clipped, channels are averaged, and other rates go through
+    a vectorized polyphase FIR resampler (up/down by the reduced ratio, so
+    44.1 kHz is 160/441 and 48 kHz 1/3). Chunks may split a sample frame or
+    land anywhere in the filter's phase; the carried bytes, filter history
+    and phase make the output identical to converting the stream in one
+    piece. 16 kHz mono int16 input is returned as is, so the default
+    format costs nothing. Not thread-safe; one converter per session.
+    """
+
+    def __init__(self, audio_format: Optional[AudioFormat] = None, target_rate: int = SAMPLE_RATE):
+        self.format = audio_format or AudioFormat()
+        self.target_rate = target_rate
+        self.dtype = ENCODINGS[self.format.encoding]
+        divisor = gcd(self.format.sample_rate, target_rate)
+        self.up = target_rate // divisor
+        self.down = self.format.sample_rate // divisor
+        self.passthrough = (
+            self.format.encoding == "s16le" and self.format.channels == 1 and self.up == self.down
+        )
+        self._bank = design_filter(self.up, self.down) if self.up != self.down else None
+        taps = self._bank.shape[1] if self._bank is not None else 1
+        # The last taps - 1 input samples, for outputs near the start of the next chunk
+        self._history = np.zeros(taps - 1, dtype=np.float32)
+        # Upsampled-time position of the next output, relative to the next chunk
+        self._phase = 0
+        # Bytes of an incomplete sample frame at the end of the last chunk
+        self._partial = b""
+
+    def convert(self, audio: AudioBuffer) -> AudioBuffer:
+        """Convert one chunk; a chunk shorter than one output sample returns no bytes"""
+        if self.passthrough:
+            return audio
+        frame_bytes = self.format.frame_bytes
+        if self._partial:
+            audio = self._partial + bytes(audio)
+        whole = len(audio) - len(audio) % frame_bytes
+        self._partial = bytes(audio[whole:])
+        samples = np.frombuffer(audio, dtype=self.dtype, count=whole // self.dtype.itemsize)
+
+        if self.format.channels > 1:
+            samples = samples.reshape(-1, self.format.channels).mean(axis=1, dtype=np.float32)
+        else:
+            samples = samples.astype(np.float32)
+        if self.format.encoding == "s16le":
+            samples /= 32768.0
+        if self._bank is not None:
+            samples = self._resample(samples)
+        return np.clip(samples * 32768.0, -32768, 32767).astype("<i2").tobytes()
+
+    def _resample(self, samples: np.ndarray) -> np.ndarray:
+        up, down = self.up, self.down
+        extended = np.concatenate((self._history, samples))
+        if len(self._history):
+            self._history = extended[-len(self._history):]
+        end = len(samples) * up
+        if self._phase >= end:
+            self._phase -= end
+            return np.empty(0, dtype=np.float32)
+        positions = np.arange(self._phase, end, down)
+        self._phase = int(positions[-1]) + down - end
+        # windows[i] ends at input sample i of this chunk (history before it)
+        windows = sliding_window_view(extended, self._bank.shape[1])
+        if up == 1:
+            # Plain decimation (48 kHz): one phase, and a strided view of the windows
+            return windows[positions[0]::down] @ self._bank[0]
+        return np.einsum("ij,ij->i", windows[positions // up], self._bank[positions % up])
@@ -0,0 +1,49 @@
+import json
+import base64
+import struct
+from typing import Tuple, Union
+
+# Binary audio frames on /ws are a fixed little-endian header followed by
+# raw PCM, 16 kHz mono int16 unless another format was negotiated (see
+# services/audio_convert.py):
+#   version (u8) | frame type (u8) | flags (u16) | sequence (u32) | pcm...
+PROTOCOL_VERSION = 1
+FRAME_AUDIO = 1
+FRAME_HEADER = struct.Struct("<BBHI")
+HEADER_SIZE = FRAME_HEADER.size
+
+
+class FrameError(ValueError):
+    pass
+
+
+def encode_frame(pcm: bytes, sequence: int, flags: int = 0) -> bytes:
+    """Build a binary audio frame (used by clients and benchmarks)"""
+    return FRAME_HEADER.pack(PROTOCOL_VERSION, FRAME_AUDIO, flags, sequence) + pcm
+
+
+def parse_frame(frame: bytes) -> Tuple[int, memoryview]:
+    """Split a binary frame into its sequence number and a PCM view.
+
+    The PCM is returned as a memoryview into the received frame, so no audio
+    bytes are copied before they reach the recognizer.
+    """
+    if len(frame) < HEADER_SIZE:
+        raise FrameError(f"Frame too short: {len(frame)} bytes")
+    version, frame_type, _flags, sequence = FRAME_HEADER.unpack_from(frame)
+    if version != PROTOCOL_VERSION:
+        raise FrameError(f"Unsupported protocol version: {version}")
+    if frame_type != FRAME_AUDIO:
+        raise FrameError(f"Unsupported frame type: {frame_type}")
+    pcm = memoryview(frame)[HEADER_SIZE:]
+    if len(pcm) % 2:
+        raise FrameError("PCM payload is not a whole number of int16 samples")
+    return sequence, pcm
+
+
+def parse_json_frame(message: Union[str, dict]) -> bytes:
+    """Decode the legacy {"type": "audio", "data": <base64>} text frame"""
+    data = json.loads(message) if isinstance(message, str) else message
+    if data.get("type") != "audio" or not data.get("data"):
+        raise FrameError("Invalid message format")
+    return base64.b64decode(data["data"])
@@ -0,0 +1,78 @@
+import json
+import wave
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+from vosk import KaldiRecognizer, SetLogLevel
+from services.model_registry import get_registry
+from services.word_timeline import Word
+
+# Samples read per AcceptWaveform call
+READ_SECONDS = 0.5
+
+# (first sample, end sample) of one piece of the file
+Chunk = Tuple[int, int]
+
+
+@dataclass
+class Utterance:
+    text: str
+    start: float
+    end: float
+    words: List[Word] = field(default_factory=list)
+
+
+def open_wav(path: str) -> wave.Wave_read:
+    """Open a WAV the recognizer can take directly (mono 16-bit PCM)"""
+    wav = wave.open(path, "rb")
+    if wav.getnchannels() != 1 or wav.getsampwidth() != 2 or wav.getcomptype() != "NONE":
+        wav.close()
+        raise ValueError("Audio must be a mono 16-bit PCM WAV file")
+    return wav
+
+
+_worker_model_path: Optional[str] = None
+
+
+def init_worker(model_path: str):
+    """Runs once in each pool process: load the model before the first chunk"""
+    global _worker_model_path
+    SetLogLevel(-1)
+    _worker_model_path = model_path
+    get_registry().get_model(model_path)
+
+
+def _utterance(raw: str, offset: float) -> Optional[Utterance]:
+    result = json.loads(raw)
+    text = result.get("text", "").strip()
+    if not text:
+        return None
+    words = [
+        (word["word"], word["start"] + offset, word["end"] + offset, word.get("conf", 1.0))
+        for word in result.get("result", [])
+    ]
+    start = round(words[0][1], 3) if words else offset
+    end = round(words[-1][2], 3) if words else offset
+    return Utterance(text, start, end, words)
+
+
+def transcribe_chunk(path: str, chunk: Chunk) -> List[Utterance]:
+    """Decode one piece of a WAV file; runs in a pool process"""
+    start, end = chunk
+    with open_wav(path) as wav:
+        rate = wav.getframerate()
+        recognizer = KaldiRecognizer(get_registry().get_model(_worker_model_path), rate)
+        recognizer.SetWords(True)
+        offset = start / rate
+        wav.setpos(start)
+        utterances = []
+        remaining = end - start
+        read = int(READ_SECONDS * rate)
+        while remaining > 0:
+            data = wav.readframes(min(read, remaining))
+            if not data:
+                break
+            remaining -= len(data) // 2
+            if recognizer.AcceptWaveform(data):
+                utterances.append(_utterance(recognizer.Result(), offset))
+        utterances.append(_utterance(recognizer.FinalResult(), offset))
+    return [utterance for utterance in utterances if utterance is not None]
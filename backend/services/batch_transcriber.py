@@ -0,0 +1,184 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional
+import numpy as np
+from services.batch_decoder import Chunk, Utterance, init_worker, open_wav, transcribe_chunk
+from services.model_registry import get_registry
+from services.storage_service import StorageService
+from services.vad import VoiceActivityDetector
+
+logger = logging.getLogger(__name__)
+
+# Samples read per planning block
+PLAN_BLOCK_SECONDS = 10
+
+
+@dataclass
+class BatchJob:
+    id: str
+    filename: str
+    status: str = "queued"  # queued | running | done | failed
+    session_id: Optional[str] = None
+    audio_seconds: float = 0.0
+    chunks_total: int = 0
+    chunks_done: int = 0
+    elapsed_seconds: float = 0.0
+    error: Optional[str] = None
+
+    def dict(self) -> Dict:
+        return asdict(self)
+
+
+def plan_chunks(path: str, target_seconds: float, min_silence_ms: int = 300) -> List[Chunk]:
+    """Split a WAV into pieces of about target_seconds, cutting inside pauses.
+
+    The file is streamed in PLAN_BLOCK_SECONDS blocks and classified with
+    the VAD's frame classifier. Once a piece reaches target_seconds it is
+    cut in the middle of the next pause of at least min_silence_ms; if none
+    comes within another target_seconds it is cut where it stands.
+    """
+    with open_wav(path) as wav:
+        rate = wav.getframerate()
+        total = wav.getnframes()
+        vad = VoiceActivityDetector(rate)
+        frame = vad.frame_samples
+        target = int(target_seconds * rate)
+        min_silence = max(1, min_silence_ms * rate // 1000 // frame)
+        chunks: List[Chunk] = []
+        start = 0
+        silence_start = None
+        position = 0
+        while position < total:
+            block = wav.readframes(int(PLAN_BLOCK_SECONDS * rate))
+            pcm = np.frombuffer(block, dtype=np.int16)
+            count = len(pcm) // frame
+            speech = vad.classify(pcm[:count * frame].reshape(count, frame)) if count else []
+            for i, is_speech in enumerate(speech):
+                sample = position + i * frame
+                if not is_speech:
+                    if silence_start is None:
+                        silence_start = sample
+                    silent_frames = (sample - silence_start) // frame + 1
+                    if sample - start >= target and silent_frames >= min_silence:
+                        cut = (silence_start + sample + frame) // 2
+                        chunks.append((start, cut))
+                        start = cut
+                        silence_start = None
+                    continue
+                silence_start = None
+                if sample - start >= 2 * target:
+                    chunks.append((start, sample))
+                    start = sample
+            position += len(pcm)
+    if start < total:
+        chunks.append((start, total))
+    return chunks
+
+
+class BatchTranscriber:
+    """Offline transcription of WAV files across a process pool.
+
+    Files are planned into pieces split at pauses, the pieces are decoded
+    in parallel (one model per worker process) and the utterances are
+    stitched back in time order, with word timestamps relative to the
+    start of the file, then stored as a session.
+    """
+
+    def __init__(
+        self,
+        storage: Optional[StorageService] = None,
+        workers: Optional[int] = None,
+        chunk_seconds: Optional[float] = None,
+        model_path: Optional[str] = None
+    ):
+        self.storage = storage
+        self.workers = workers or int(os.getenv("BATCH_WORKERS", os.cpu_count() or 1))
+        self.chunk_seconds = chunk_seconds or float(os.getenv("BATCH_CHUNK_SECONDS", "30"))
+        self.model_path = model_path or get_registry().model_path()
+        self.jobs: Dict[str, BatchJob] = {}
+        self._tasks = set()
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        # Created on first use; spawn rather than fork a process with threads.
+        # Workers only import batch_decoder (and the server's main module,
+        # which builds its services on startup, not on import)
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker,
+                initargs=(self.model_path,)
+            )
+            logger.info(f"Batch transcription pool started with {self.workers} workers")
+        return self._pool
+
+    async def transcribe(self, path: str, job: Optional[BatchJob] = None) -> List[Utterance]:
+        """Plan, decode and stitch one file"""
+        loop = asyncio.get_running_loop()
+        chunks = await asyncio.to_thread(plan_chunks, path, self.chunk_seconds)
+        if job is not None:
+            job.chunks_total = len(chunks)
+
+        async def run(chunk: Chunk) -> List[Utterance]:
+            utterances = await loop.run_in_executor(self.pool, transcribe_chunk, path, chunk)
+            if job is not None:
+                job.chunks_done += 1
+            return utterances
+
+        # Pieces come back in plan order, which is time order
+        results = await asyncio.gather(*(run(chunk) for chunk in chunks))
+        return [utterance for utterances in results for utterance in utterances]
+
+    async def run_job(self, path: str, job: BatchJob, delete_file: bool = False) -> BatchJob:
+        """Transcribe a file into a new session, tracking progress on the job"""
+        started = time.perf_counter()
+        job.status = "running"
+        try:
+            with open_wav(path) as wav:
+                job.audio_seconds = wav.getnframes() / wav.getframerate()
+            utterances = await self.transcribe(path, job)
+            if self.storage is not None:
+                job.session_id = job.session_id or f"batch-{job.id}"
+                await self.storage.create_session(job.session_id)
+                for utterance in utterances:
+                    await self.storage.append_segment(
+                        job.session_id,
+                        utterance.text,
+                        start_time=utterance.start,
+                        end_time=utterance.end,
+                        words=utterance.words
+                    )
+                await self.storage.end_session(job.session_id)
+            job.status = "done"
+            return job
+        except Exception as e:
+            logger.error(f"Error in batch job {job.id} ({job.filename}): {e}")
+            job.status = "failed"
+            job.error = str(e)
+            return job
+        finally:
+            job.elapsed_seconds = time.perf_counter() - started
+            if delete_file:
+                os.remove(path)
+
+    def submit(self, path: str, filename: Optional[str] = None, delete_file: bool = False) -> BatchJob:
+        """Start a job in the background and return it for polling"""
+        job = BatchJob(id=str(uuid.uuid4()), filename=filename or os.path.basename(path))
+        self.jobs[job.id] = job
+        task = asyncio.create_task(self.run_job(path, job, delete_file))
+        # Keep a reference so the task isn't garbage collected mid-job
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
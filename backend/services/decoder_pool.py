@@ -0,0 +1,347 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Union
+import vosk
+from vosk import KaldiRecognizer
+from services.flow_control import OVERFLOW_POLICIES, AudioRing, FlowCallback
+from services.model_registry import SAMPLE_RATE, ModelRegistry
+from services.metrics import registry as metrics
+from services.vad import VoiceActivityDetector
+from services.word_timeline import Word
+
+logger = logging.getLogger(__name__)
+
+AudioBuffer = Union[bytes, memoryview]
+
+DECODE_SECONDS = metrics.histogram(
+    "decoder_chunk_seconds", "Time spent in AcceptWaveform per audio chunk"
+)
+RESULT_LATENCY = metrics.histogram(
+    "transcript_result_latency_seconds",
+    "Time from receiving an audio chunk to its decoded result, queueing included",
+    ["kind"]
+)
+
+
+# The zero-copy path calls libvosk through the binding's private cffi
+# handles (vosk 0.3.45, pinned in requirements.txt); a release without
+# them falls back to the public AcceptWaveform and a copy
+_vosk = getattr(vosk, "_c", None)
+_vosk_ffi = getattr(vosk, "_ffi", None)
+ZERO_COPY = (
+    _vosk is not None
+    and _vosk_ffi is not None
+    and hasattr(_vosk, "vosk_recognizer_accept_waveform")
+    and hasattr(_vosk_ffi, "from_buffer")
+)
+if not ZERO_COPY:
+    logger.warning("vosk has no cffi handles to feed audio views; decoding copies each chunk to bytes")
+
+
+def accept_waveform(recognizer: KaldiRecognizer, audio: AudioBuffer) -> bool:
+    """KaldiRecognizer.AcceptWaveform that also takes a memoryview.
+
+    The vosk binding only accepts bytes; views (e.g. the PCM payload of a
+    binary WebSocket frame) are handed to libvosk through ffi.from_buffer
+    instead of being copied into a new bytes object first, when the
+    installed vosk exposes what that needs.
+    """
+    if isinstance(audio, bytes):
+        return recognizer.AcceptWaveform(audio)
+    handle = getattr(recognizer, "_handle", None)
+    if not ZERO_COPY or handle is None:
+        return recognizer.AcceptWaveform(bytes(audio))
+    res = _vosk.vosk_recognizer_accept_waveform(handle, _vosk_ffi.from_buffer(audio), len(audio))
+    if res < 0:
+        raise Exception("Failed to process waveform")
+    return res
+
+
+@dataclass
+class DecodeResult:
+    text: str
+    is_final: bool
+    # Seconds of session audio covered by a final result; end_time is also
+    # set on partials (how much audio they account for)
+    start_time: Optional[float] = None
+    end_time: Optional[float] = None
+    # Finals of a recognizer with word timings, in seconds of session audio
+    words: Optional[List[Word]] = None
+    # Finals: the utterance's audio as the recognizer heard it (int16 PCM),
+    # when the pool keeps it for speaker diarization
+    audio: Optional[bytes] = None
+
+
+class DecoderSession:
+    """Recognizer plus a bounded audio queue for one WebSocket session.
+
+    The event loop only enqueues audio and dequeues results; the actual
+    AcceptWaveform calls run on the pool's executor, one chunk at a time
+    per session so the recognizer never sees audio out of order. With a
+    VAD, silent frames are dropped before they are queued. What happens
+    when the queue is full is the overflow policy of the AudioRing.
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        recognizer: KaldiRecognizer,
+        model_path: str,
+        executor: ThreadPoolExecutor,
+        max_queued_bytes: int,
+        sample_rate: int = SAMPLE_RATE,
+        vad: Optional[VoiceActivityDetector] = None,
+        policy: str = "block",
+        on_flow: Optional[FlowCallback] = None,
+        start_time: float = 0.0,
+        max_utterance_bytes: int = 0
+    ):
+        self.session_id = session_id
+        self.recognizer = recognizer
+        self.model_path = model_path
+        self.max_queued_bytes = max_queued_bytes
+        self.sample_rate = sample_rate
+        self.vad = vad
+        # Session timeline (everything received) vs. what reached the recognizer;
+        # a resumed session continues its timeline at start_time
+        self.received_samples = int(start_time * sample_rate)
+        self.decoded_samples = 0
+        self._utterance_start: Optional[float] = None
+        # Vosk word times count all audio a recognizer was ever fed, across
+        # the sessions it was pooled for; this is that clock, in samples
+        self._recognizer_samples = getattr(recognizer, "fed_samples", 0)
+        # The recognizer clock where the open utterance started
+        self._utterance_clock = 0
+        # The open utterance's audio, up to max_utterance_bytes (0 keeps none)
+        self.max_utterance_bytes = max_utterance_bytes
+        self._utterance_audio = bytearray()
+        self.results: asyncio.Queue = asyncio.Queue()
+        self._executor = executor
+        self._audio = AudioRing(max_queued_bytes, policy, on_flow)
+        self._closed = False
+        self._worker = asyncio.create_task(self._run())
+
+    @property
+    def skipped_ratio(self) -> float:
+        """Share of received audio the VAD kept away from the recognizer"""
+        return self.vad.skipped_ratio if self.vad else 0.0
+
+    @property
+    def queued_bytes(self) -> int:
+        return self._audio.queued_bytes
+
+    def stats(self) -> Dict[str, float]:
+        """Inbound queue depth and lag, in seconds of audio and wall time"""
+        bytes_per_second = self.sample_rate * 2
+        return {
+            "queued_seconds": round(self._audio.queued_bytes / bytes_per_second, 3),
+            "lag_seconds": round(self._audio.oldest_age(), 3),
+            "dropped_seconds": round(self._audio.dropped_bytes / bytes_per_second, 3),
+            "dropped_chunks": self._audio.dropped_chunks,
+            "paused": self._audio.paused,
+            "pause_signals": self._audio.pause_signals,
+            "policy": self._audio.policy
+        }
+
+    async def feed(self, audio: AudioBuffer):
+        """Queue audio for decoding; a full queue waits or drops per the policy"""
+        if self._closed:
+            return
+        self.received_samples += len(audio) // 2
+        endpoint = False
+        if self.vad is not None:
+            gated = self.vad.process(audio)
+            if not gated.audio and not gated.endpoint:
+                return
+            audio, endpoint = gated.audio, gated.endpoint
+        item = (audio, self.received_samples, endpoint, time.perf_counter())
+        await self._audio.put(item, len(audio))
+
+    def _final(self, raw: str, end_sample: int) -> DecodeResult:
+        end_time = end_sample / self.sample_rate
+        start_time = self._utterance_start if self._utterance_start is not None else end_time
+        self._utterance_start = None
+        result = json.loads(raw)
+        words = None
+        if "result" in result:
+            # The recognizer only heard what the VAD let through; within an
+            # utterance that is (nearly) contiguous, so shift by where it started
+            shift = start_time - self._utterance_clock / self.sample_rate
+            words = [
+                (word["word"], word["start"] + shift, word["end"] + shift, word.get("conf", 1.0))
+                for word in result["result"]
+            ]
+        audio = bytes(self._utterance_audio) if self._utterance_audio else None
+        self._utterance_audio.clear()
+        return DecodeResult(
+            text=result.get("text", "").strip(),
+            is_final=True,
+            start_time=start_time,
+            end_time=end_time,
+            words=words,
+            audio=audio
+        )
+
+    def _decode(self, audio: AudioBuffer, end_sample: int, endpoint: bool) -> Optional[DecodeResult]:
+        """Runs on an executor thread"""
+        samples = len(audio) // 2
+        if samples:
+            if self._utterance_start is None:
+                self._utterance_start = (end_sample - samples) / self.sample_rate
+                self._utterance_clock = self._recognizer_samples
+            self.decoded_samples += samples
+            self._recognizer_samples += samples
+            room = self.max_utterance_bytes - len(self._utterance_audio)
+            if room > 0:
+                self._utterance_audio += audio[:room]
+            started = time.perf_counter()
+            accepted = accept_waveform(self.recognizer, audio)
+            DECODE_SECONDS.observe(time.perf_counter() - started)
+            if accepted:
+                return self._final(self.recognizer.Result(), end_sample)
+        # The VAD saw a long pause the recognizer never got to hear
+        if endpoint and self._utterance_start is not None:
+            return self._final(self.recognizer.FinalResult(), end_sample)
+        if not samples:
+            return None
+        partial = json.loads(self.recognizer.PartialResult())
+        return DecodeResult(
+            text=partial.get("partial", "").strip(),
+            is_final=False,
+            end_time=end_sample / self.sample_rate
+        )
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._audio.get()
+            if item is None:
+                break
+            audio, end_sample, endpoint, received_at = item
+            try:
+                result = await loop.run_in_executor(
+                    self._executor, self._decode, audio, end_sample, endpoint
+                )
+                if result is not None:
+                    RESULT_LATENCY.observe(
+                        time.perf_counter() - received_at,
+                        kind="final" if result.is_final else "partial"
+                    )
+                    await self.results.put(result)
+            except Exception as e:
+                logger.error(f"Error decoding audio for session {self.session_id}: {e}")
+
+    async def close(self):
+        """Stop accepting audio, drop what is still queued and stop the worker"""
+        self._closed = True
+        await self._audio.close()
+        await self._worker
+        # For the next session that gets this recognizer from the pool
+        self.recognizer.fed_samples = self._recognizer_samples
+        if self._audio.dropped_chunks:
+            logger.info(
+                f"Session {self.session_id}: dropped "
+                f"{self._audio.dropped_bytes / 2 / self.sample_rate:.1f}s of audio "
+                f"the decoder could not keep up with"
+            )
+        if self.vad is not None:
+            logger.info(
+                f"Session {self.session_id}: VAD skipped {self.skipped_ratio:.0%} of "
+                f"{self.received_samples / self.sample_rate:.0f}s audio"
+            )
+
+
+class DecoderPool:
+    """Thread pool that owns the KaldiRecognizer instances of all live sessions.
+
+    Vosk releases the GIL inside its C calls, so decode throughput scales
+    with the number of worker threads up to the number of cores.
+    """
+
+    def __init__(
+        self,
+        registry: ModelRegistry,
+        workers: Optional[int] = None,
+        max_queued_seconds: Optional[float] = None,
+        sample_rate: int = SAMPLE_RATE,
+        vad: Optional[bool] = None,
+        overflow_policy: Optional[str] = None,
+        words: Optional[bool] = None,
+        utterance_seconds: float = 0.0
+    ):
+        self.registry = registry
+        self.sample_rate = sample_rate
+        self.workers = workers or int(os.getenv("DECODER_WORKERS", os.cpu_count() or 1))
+        self.max_queued_seconds = max_queued_seconds or float(
+            os.getenv("DECODER_MAX_QUEUED_SECONDS", "5")
+        )
+        # Gate silence before decoding (thresholds come from the VAD_* settings)
+        self.vad = vad if vad is not None else os.getenv("VAD_ENABLED", "1") == "1"
+        # Word timings and confidences with each final (WORD_TIMINGS=0 turns them off)
+        self.words = words if words is not None else os.getenv("WORD_TIMINGS", "1") == "1"
+        # Audio of each utterance handed out with its final, for speaker diarization
+        self.utterance_seconds = utterance_seconds
+        # What a session does with audio beyond max_queued_seconds (see flow_control)
+        self.overflow_policy = overflow_policy or os.getenv("AUDIO_OVERFLOW_POLICY", "signal")
+        if self.overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown audio overflow policy: {self.overflow_policy}")
+        self.sessions: Dict[str, DecoderSession] = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers,
+            thread_name_prefix="vosk-decoder"
+        )
+        logger.info(
+            f"Decoder pool started with {self.workers} workers, "
+            f"{self.max_queued_seconds}s max queued audio per session, "
+            f"VAD {'on' if self.vad else 'off'}, overflow policy {self.overflow_policy}"
+        )
+
+    async def open_session(
+        self,
+        session_id: str,
+        language: Optional[str] = None,
+        on_flow: Optional[FlowCallback] = None,
+        start_time: float = 0.0
+    ) -> DecoderSession:
+        """Start decoding a session with a warm recognizer for its language.
+
+        on_flow is called with True/False when the signal policy wants the
+        client to pause or resume; start_time (seconds) is where a resumed
+        session's audio timeline continues. Raises ValueError for a language without
+        a configured model.
+        """
+        model_path = self.registry.model_path(language)
+        # Off the loop: takes a pooled recognizer, but may have to load the
+        # model or build a recognizer when the pool is cold
+        recognizer = await asyncio.to_thread(self.registry.acquire, model_path, self.words)
+        session = DecoderSession(
+            session_id,
+            recognizer,
+            model_path,
+            self._executor,
+            # 16-bit mono PCM
+            max_queued_bytes=int(self.max_queued_seconds * self.sample_rate * 2),
+            sample_rate=self.sample_rate,
+            vad=VoiceActivityDetector(self.sample_rate) if self.vad else None,
+            policy=self.overflow_policy,
+            on_flow=on_flow,
+            start_time=start_time,
+            max_utterance_bytes=int(self.utterance_seconds * self.sample_rate) * 2
+        )
+        self.sessions[session_id] = session
+        return session
+
+    async def close_session(self, session_id: str):
+        session = self.sessions.pop(session_id, None)
+        if session:
+            await session.close()
+            # The worker has stopped, so nothing else touches the recognizer
+            self.registry.release(session.model_path, session.recognizer, self.words)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
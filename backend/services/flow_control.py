@@ -0,0 +1,236 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Optional, Union
+from fastapi import WebSocket
+from fastapi.websockets import WebSocketDisconnect
+
+logger = logging.getLogger(__name__)
+
+# block: stop reading the socket until there is room (TCP pushes back)
+# drop_oldest: keep the newest audio, discard what has waited longest
+# signal: tell the client to pause at the high watermark, drop oldest if it doesn't
+OVERFLOW_POLICIES = ("block", "drop_oldest", "signal")
+
+FlowCallback = Callable[[bool], Awaitable[None]]
+Message = Union[Dict[str, Any], Callable[[], Optional[Dict[str, Any]]]]
+
+
+class AudioRing:
+    """Bounded FIFO of audio chunks for one connection, measured in bytes"""
+
+    def __init__(
+        self,
+        max_bytes: int,
+        policy: str = "block",
+        on_flow: Optional[FlowCallback] = None,
+        high_watermark: float = 0.75,
+        low_watermark: float = 0.25
+    ):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.on_flow = on_flow
+        self.high_bytes = int(max_bytes * high_watermark)
+        self.low_bytes = int(max_bytes * low_watermark)
+        self.queued_bytes = 0
+        self.dropped_bytes = 0
+        self.dropped_chunks = 0
+        self.paused = False
+        self.pause_signals = 0
+        # (item, size in bytes, monotonic enqueue time)
+        self._items: Deque[tuple] = deque()
+        self._changed = asyncio.Condition()
+        self._closed = False
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def oldest_age(self) -> float:
+        """Seconds the oldest queued chunk has been waiting"""
+        return time.monotonic() - self._items[0][2] if self._items else 0.0
+
+    async def put(self, item: Any, size: int):
+        if self._closed:
+            return
+        async with self._changed:
+            if self.policy == "block":
+                # Room for the whole chunk; one larger than the ring gets in
+                # once the ring is empty
+                await self._changed.wait_for(
+                    lambda: self.queued_bytes + size <= self.max_bytes or not self._items or self._closed
+                )
+                if self._closed:
+                    return
+            self._items.append((item, size, time.monotonic()))
+            self.queued_bytes += size
+            # Never drop the chunk that was just added, and never under block
+            while (
+                self.policy != "block"
+                and self.queued_bytes > self.max_bytes
+                and len(self._items) > 1
+            ):
+                _, dropped, _ = self._items.popleft()
+                self.queued_bytes -= dropped
+                self.dropped_bytes += dropped
+                self.dropped_chunks += 1
+            self._changed.notify_all()
+        if self.policy == "signal" and not self.paused and self.queued_bytes >= self.high_bytes:
+            self.paused = True
+            self.pause_signals += 1
+            await self._signal(True)
+
+    async def get(self) -> Optional[Any]:
+        """Next chunk, or None once closed"""
+        async with self._changed:
+            await self._changed.wait_for(lambda: self._items or self._closed)
+            if not self._items:
+                return None
+            item, size, _ = self._items.popleft()
+            self.queued_bytes -= size
+            self._changed.notify_all()
+        if self.paused and self.queued_bytes <= self.low_bytes:
+            self.paused = False
+            await self._signal(False)
+        return item
+
+    async def _signal(self, paused: bool):
+        if self.on_flow is None:
+            return
+        try:
+            await self.on_flow(paused)
+        except Exception as e:
+            logger.error(f"Error signalling flow control: {e}")
+
+    async def close(self) -> List[Any]:
+        """Stop accepting audio; returns what was still queued"""
+        async with self._changed:
+            self._closed = True
+            remaining = [item for item, _, _ in self._items]
+            self._items.clear()
+            self.queued_bytes = 0
+            self._changed.notify_all()
+        return remaining
+
+
+class OutboundQueue:
+    """Per-connection send queue that coalesces superseded messages.
+
+    Messages put with a key replace a queued, unsent message with the same
+    key, so a slow client receives the latest transcript or insights state
+    instead of every intermediate one. A message may be a callable that
+    builds the payload when it is actually sent, so that state-dependent
+    messages (transcript deltas) are computed against what the client
+    really has. Beyond max_messages queued, put() waits.
+    """
+
+    def __init__(self, websocket: WebSocket, max_messages: Optional[int] = None):
+        self.websocket = websocket
+        self.max_messages = max_messages or int(os.getenv("OUTBOUND_MAX_MESSAGES", "64"))
+        self.sent = 0
+        self.coalesced = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.closed = False
+        # [key, message, monotonic enqueue time]
+        self._queue: Deque[list] = deque()
+        self._keyed: Dict[Hashable, list] = {}
+        self._changed = asyncio.Condition()
+        self._task = asyncio.create_task(self._run())
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def oldest_age(self) -> float:
+        return time.monotonic() - self._queue[0][2] if self._queue else 0.0
+
+    async def put(self, message: Message, key: Optional[Hashable] = None):
+        if self.closed:
+            return
+        async with self._changed:
+            if self._coalesce(message, key):
+                return
+            await self._changed.wait_for(
+                lambda: len(self._queue) < self.max_messages or self.closed
+            )
+            if not self.closed:
+                self._append(message, key)
+                self._changed.notify_all()
+
+    def put_nowait(self, message: Message, key: Optional[Hashable] = None):
+        """Queue a small control message regardless of the limit"""
+        if self.closed or self._coalesce(message, key):
+            return
+        self._append(message, key)
+        # notify_all() needs the lock, which this caller doesn't hold
+        asyncio.create_task(self._notify())
+
+    def _coalesce(self, message: Message, key: Optional[Hashable]) -> bool:
+        entry = self._keyed.get(key) if key is not None else None
+        if entry is None:
+            return False
+        entry[1] = message
+        self.coalesced += 1
+        return True
+
+    def _append(self, message: Message, key: Optional[Hashable]):
+        entry = [key, message, time.monotonic()]
+        self._queue.append(entry)
+        if key is not None:
+            self._keyed[key] = entry
+
+    async def _notify(self, closed: bool = False):
+        async with self._changed:
+            if closed:
+                self.closed = True
+            self._changed.notify_all()
+
+    async def _run(self):
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: self._queue or self.closed)
+                if not self._queue:
+                    return
+                key, message, enqueued_at = self._queue.popleft()
+                if key is not None:
+                    self._keyed.pop(key, None)
+                self._changed.notify_all()
+            payload = message() if callable(message) else message
+            if payload is None:
+                continue
+            try:
+                await self.websocket.send_json(payload)
+            except (WebSocketDisconnect, RuntimeError) as e:
+                logger.info(f"Stopped sending to a closed WebSocket: {e}")
+                # Release producers waiting for room
+                await self._notify(closed=True)
+                return
+            except Exception as e:
+                logger.error(f"Error sending WebSocket message: {e}")
+                continue
+            self.sent += 1
+            self.last_lag = time.monotonic() - enqueued_at
+            self.max_lag = max(self.max_lag, self.last_lag)
+
+    async def close(self, drain_timeout: float = 1.0):
+        """Give queued messages a moment to go out, then stop the sender"""
+        async with self._changed:
+            self.closed = True
+            self._changed.notify_all()
+        try:
+            await asyncio.wait_for(self._task, drain_timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "depth": len(self._queue),
+            "lag_seconds": round(self.oldest_age(), 3),
+            "last_send_lag_seconds": round(self.last_lag, 3),
+            "max_send_lag_seconds": round(self.max_lag, 3),
+            "sent": self.sent,
+            "coalesced": self.coalesced
+        }
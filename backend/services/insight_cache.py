@@ -0,0 +1,207 @@
+import os
+import re
+import time
+import hashlib
+import sqlite3
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from difflib import SequenceMatcher
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Dropped before hashing, so updates that only add these hit the cache
+FILLER_WORDS = frozenset({
+    "um", "umm", "uh", "uhh", "uhm", "er", "erm", "ah", "eh", "hmm", "hm", "mm", "mhm", "huh"
+})
+
+_WORD = re.compile(r"[a-z0-9']+")
+
+
+def normalize(text: str) -> List[str]:
+    """Lowercased words without punctuation or filler words"""
+    return [word for word in _WORD.findall(text.lower()) if word not in FILLER_WORDS]
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    disk_hits: int = 0
+    similar_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expired: int = 0
+
+    def dict(self):
+        return asdict(self)
+
+
+class InsightCache:
+    """LLM answers for insight prompts, keyed on the normalized text and mode.
+
+    Entries are the raw model output, so a hit is parsed like a fresh
+    answer (and updates the session's summary the same way). The memory
+    tier is an LRU of max_entries with a TTL; with a path, entries are also
+    kept in a SQLite file that survives restarts and is consulted on a
+    memory miss. A prompt whose words are at least `similarity` alike
+    (difflib ratio over normalized words) to the previous prompt of the same
+    session and mode reuses that answer; 1.0 only reuses exact matches,
+    which after normalization includes filler-only changes.
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        ttl: Optional[float] = None,
+        path: Optional[str] = None,
+        similarity: Optional[float] = None,
+        max_disk_entries: Optional[int] = None
+    ):
+        self.max_entries = max_entries if max_entries is not None else int(
+            os.getenv("INSIGHTS_CACHE_ENTRIES", "1024")
+        )
+        self.ttl = ttl if ttl is not None else float(os.getenv("INSIGHTS_CACHE_TTL_SECONDS", "600"))
+        self.path = path if path is not None else os.getenv("INSIGHTS_CACHE_PATH") or None
+        self.similarity = similarity if similarity is not None else float(
+            os.getenv("INSIGHTS_CACHE_SIMILARITY", "1.0")
+        )
+        self.max_disk_entries = max_disk_entries or int(os.getenv("INSIGHTS_CACHE_DISK_ENTRIES", "10000"))
+        self.stats = CacheStats()
+        # key -> (content, monotonic expiry)
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._disk_writes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @staticmethod
+    def key(mode: str, words: List[str], summary: Optional[str] = None) -> str:
+        """Hash of the prompt mode, the normalized text and (incremental mode) the summary"""
+        parts = [mode, " ".join(words)]
+        if summary is not None:
+            parts.append(" ".join(normalize(summary)))
+        return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()
+
+    async def lookup(
+        self,
+        key: str,
+        words: List[str],
+        previous: Optional[Tuple[List[str], str]] = None
+    ) -> Optional[str]:
+        """Cached content for key, or for a similar previous prompt; None on a miss"""
+        if not self.enabled:
+            return None
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.stats.hits += 1
+                return entry[0]
+            del self._entries[key]
+            self.stats.expired += 1
+        if self.path is not None:
+            content = await asyncio.to_thread(self._disk_get, key)
+            if content is not None:
+                self._remember(key, content)
+                self.stats.disk_hits += 1
+                return content
+        if previous is not None and self.similarity < 1.0 and self._similar(words, previous[0]):
+            self.stats.similar_hits += 1
+            return previous[1]
+        self.stats.misses += 1
+        return None
+
+    def _similar(self, words: List[str], previous: List[str]) -> bool:
+        if not words or not previous:
+            return False
+        matcher = SequenceMatcher(None, previous, words, autojunk=False)
+        # Cheap upper bounds first; ratio() is quadratic in the worst case
+        return (
+            matcher.real_quick_ratio() >= self.similarity
+            and matcher.quick_ratio() >= self.similarity
+            and matcher.ratio() >= self.similarity
+        )
+
+    async def put(self, key: str, content: str):
+        if not self.enabled:
+            return
+        self._remember(key, content)
+        if self.path is not None:
+            await asyncio.to_thread(self._disk_put, key, content)
+
+    def _remember(self, key: str, content: str):
+        self._entries[key] = (content, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS insight_cache (
+                    key TEXT PRIMARY KEY,
+                    content TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_insight_cache_created_at ON insight_cache(created_at)"
+            )
+            self._db.commit()
+        return self._db
+
+    def _disk_get(self, key: str) -> Optional[str]:
+        try:
+            with self._db_lock:
+                row = self._connect().execute(
+                    "SELECT content FROM insight_cache WHERE key = ? AND created_at > ?",
+                    (key, time.time() - self.ttl)
+                ).fetchone()
+            return row[0] if row else None
+        except sqlite3.Error as e:
+            logger.error(f"Error reading insight cache: {e}")
+            return None
+
+    def _disk_put(self, key: str, content: str):
+        try:
+            with self._db_lock:
+                db = self._connect()
+                db.execute(
+                    "INSERT OR REPLACE INTO insight_cache (key, content, created_at) VALUES (?, ?, ?)",
+                    (key, content, time.time())
+                )
+                self._disk_writes += 1
+                # Trim expired and surplus rows now and then, not on every write
+                if self._disk_writes % 100 == 1:
+                    db.execute("DELETE FROM insight_cache WHERE created_at <= ?", (time.time() - self.ttl,))
+                    db.execute("""
+                        DELETE FROM insight_cache WHERE key IN (
+                            SELECT key FROM insight_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?
+                        )
+                    """, (self.max_disk_entries,))
+                db.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error writing insight cache: {e}")
+
+    def info(self):
+        return {
+            **self.stats.dict(),
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "disk": self.path
+        }
+
+    def close(self):
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,136 @@
+import os
+import asyncio
+import logging
+from dataclasses import dataclass, asdict
+from typing import Awaitable, Callable, Optional
+from services.insights_service import AnalysisState, InsightResponse, InsightsService
+
+logger = logging.getLogger(__name__)
+
+# Called with the insights, whether they are final and the sequence number
+# of the last segment they cover
+ResultCallback = Callable[[InsightResponse, bool, Optional[int]], Awaitable[None]]
+
+
+@dataclass
+class SchedulerMetrics:
+    """Counters shared by all sessions' schedulers"""
+    requests: int = 0
+    calls_made: int = 0
+    calls_coalesced: int = 0
+    calls_superseded: int = 0
+    calls_failed: int = 0
+
+    def dict(self):
+        return asdict(self)
+
+
+class InsightScheduler:
+    """Generates insights for one session in the background.
+
+    Final segments are submitted without waiting. Segments that arrive
+    while the scheduler is debouncing or while an LLM call is in flight are
+    coalesced into the next request, so a fast speaker causes one call per
+    debounce window rather than one per utterance. Each call only carries
+    the segments not analysed yet (see InsightsService.stream_session_insights).
+
+    A call still streaming when a new segment arrives is superseded: it is
+    cancelled, which frees its LLM client slot, and its segments go into
+    the next call. After max_superseded cancellations in a row a call runs
+    to the end, so a speaker who never pauses still gets insights.
+    """
+
+    def __init__(
+        self,
+        insights_service: InsightsService,
+        on_result: ResultCallback,
+        metrics: SchedulerMetrics,
+        debounce: Optional[float] = None,
+        state: Optional[AnalysisState] = None,
+        max_superseded: Optional[int] = None
+    ):
+        self.insights_service = insights_service
+        self.on_result = on_result
+        self.metrics = metrics
+        self.debounce = debounce if debounce is not None else float(
+            os.getenv("INSIGHTS_DEBOUNCE_SECONDS", "1.0")
+        )
+        self.max_superseded = max_superseded if max_superseded is not None else int(
+            os.getenv("INSIGHTS_MAX_SUPERSEDED", "2")
+        )
+        # A resumed session passes in its restored state
+        self.state = state or AnalysisState()
+        self._dirty = False
+        self._last_segment_seq: Optional[int] = None
+        # The call in flight, while it is still streaming from the LLM
+        self._streaming: Optional[asyncio.Task] = None
+        self._superseded = 0
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    def submit(self, segment: str, segment_seq: Optional[int] = None):
+        """Queue a new final segment, folding it into any pending request"""
+        self.metrics.requests += 1
+        if self._dirty:
+            self.metrics.calls_coalesced += 1
+        self.state.add_segment(segment)
+        self._last_segment_seq = segment_seq
+        self._dirty = True
+        self._wakeup.set()
+        if self._streaming is not None and self._superseded < self.max_superseded:
+            self._streaming.cancel()
+            self._streaming = None
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            # Let follow-up segments coalesce into this request
+            await asyncio.sleep(self.debounce)
+            self._wakeup.clear()
+            if not self._dirty:
+                continue
+            self._dirty = False
+            segment_seq = self._last_segment_seq
+
+            self.metrics.calls_made += 1
+            call = asyncio.create_task(self._call(segment_seq))
+            self._streaming = call
+            try:
+                # Unlike awaiting the task, doesn't raise when submit() cancels it
+                await asyncio.wait({call})
+            finally:
+                self._streaming = None
+                call.cancel()
+            if call.cancelled():
+                # Its segments are still pending, for the next call
+                self.metrics.calls_superseded += 1
+                self._superseded += 1
+            else:
+                self._superseded = 0
+
+    async def _call(self, segment_seq: Optional[int]):
+        try:
+            insights = None
+            async for update in self.insights_service.stream_session_insights(self.state):
+                # Partials of a request that newer segments already
+                # supersede are not worth a message; its final result still is
+                if insights is not None and not self._dirty:
+                    await self.on_result(insights, False, segment_seq)
+                insights = update
+            # Done with the LLM: the result is stored and sent even if
+            # newer segments arrive meanwhile
+            self._streaming = None
+            if insights is not None:
+                await self.on_result(insights, True, segment_seq)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.metrics.calls_failed += 1
+            logger.error(f"Error generating insights: {e}")
+
+    async def close(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
@@ -1,118 +1,366 @@
 import os
-from typing import Dict, List, Optional
-import requests
+import re
+import time
+from collections import deque
+from typing import AsyncIterator, Deque, List, Optional, Tuple
 from pydantic import BaseModel
 import json
 import asyncio
+import logging
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
+from services.metrics import registry as metrics
+from services.insight_cache import InsightCache, normalize
+from services.llm_provider import ChatRequest, LLMClient, get_llm_client
+
+logger = logging.getLogger(__name__)
+
+LLM_SECONDS = metrics.histogram(
+    "insights_llm_request_seconds",
+    "Duration of an insights LLM request by mode (complete, stream) and outcome (ok, timeout, error)",
+    ["mode", "outcome"]
+)
+LLM_FIRST_PARTIAL = metrics.histogram(
+    "insights_llm_first_partial_seconds",
+    "Time from starting a streamed insights request to its first usable partial"
+)
+
+
+def _outcome(error: Exception) -> str:
+    return "timeout" if isinstance(error, TimeoutError) else "error"
+
 
 class InsightResponse(BaseModel):
     insights: List[str]
     questions: List[str]
 
+CONTEXT_WORDS = 500
+MAX_SUMMARY_CHARS = 600
+
+@dataclass
+class AnalysisState:
+    """Per-session analysis bookkeeping, so sessions don't share one clock.
+
+    For incremental analysis it also holds the rolling summary returned by
+    the model, the segments not yet sent, and the last CONTEXT_WORDS words
+    used for the periodic full analysis.
+    """
+    last_full_analysis: datetime = field(default_factory=datetime.now)
+    summary: str = ""
+    pending: List[str] = field(default_factory=list)
+    window: Deque[str] = field(default_factory=lambda: deque(maxlen=CONTEXT_WORDS))
+    # (prompt mode, normalized words, model output) of the last answer, for
+    # the cache's near-duplicate check
+    last_prompt: Optional[Tuple[str, List[str], str]] = None
+
+    @classmethod
+    def restore(
+        cls,
+        segments: List[str],
+        summary: str = "",
+        last_full_analysis: Optional[float] = None
+    ) -> "AnalysisState":
+        """State of a resumed session, with the window refilled from its stored segments"""
+        state = cls(summary=summary)
+        if last_full_analysis is not None:
+            state.last_full_analysis = datetime.fromtimestamp(last_full_analysis)
+        for text in segments[-CONTEXT_WORDS:]:
+            state.window.extend(text.split())
+        return state
+
+    def add_segment(self, text: str):
+        self.pending.append(text)
+        self.window.extend(text.split())
+
 class InsightsService:
-    def __init__(self):
-        self.api_key = os.getenv("GROQ_API_KEY", "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")
-        self.api_url = "https://api.groq.com/openai/v1/chat/completions"
-        self.context_window = []  # Store recent context
-        self.last_full_analysis = datetime.now()
+    def __init__(self, cache: Optional[InsightCache] = None, llm: Optional[LLMClient] = None):
+        # Limits, retries and hedging live in the shared client (LLM_* settings)
+        self.llm = llm or get_llm_client()
+        self.timeout = float(os.getenv("INSIGHTS_TIMEOUT_SECONDS", "5"))
+        self.default_state = AnalysisState()  # Used by callers without a session
         self.min_analysis_interval = timedelta(seconds=30)  # Minimum time between full analyses
-        
-    def _generate_prompt(self, text: str, is_full_analysis: bool = False) -> str:
+        # Answers to prompts already asked (INSIGHTS_CACHE_* settings)
+        self.cache = cache or InsightCache()
+
+    def _generate_prompt(
+        self,
+        text: str,
+        is_full_analysis: bool = False,
+        summary: Optional[str] = None
+    ) -> str:
+        # In incremental mode the model also maintains the running summary
+        # that stands in for the transcript it is no longer sent
+        if summary is not None:
+            context = f"Meeting summary so far: {summary or 'none yet'}\n"
+            summary_requirement = "\n4. Update the meeting summary with the new information (max 60 words)"
+            summary_field = ',\n    "summary": "updated meeting summary"'
+        else:
+            context = summary_requirement = summary_field = ""
+
         if is_full_analysis:
             return f"""As a real-time meeting assistant, analyze this transcript and provide key insights and follow-up questions. Focus on actionable points and important decisions.
 
 Context: This is a live meeting transcript.
-Transcript: {text}
+{context}Transcript: {text}
 
 Requirements:
 1. Provide 2-3 CONCISE key insights (max 15 words each)
 2. Suggest 2-3 relevant follow-up questions
-3. Focus on the most recent context while maintaining overall meeting coherence
+3. Focus on the most recent context while maintaining overall meeting coherence{summary_requirement}
 
 Format response as JSON:
 {{
     "insights": ["insight1", "insight2", ...],
-    "questions": ["question1", "question2", ...]
+    "questions": ["question1", "question2", ...]{summary_field}
 }}"""
         else:
             return f"""As a real-time meeting assistant, provide quick insights on this new segment of conversation.
 Focus only on new, important information.
 
-New segment: {text}
+{context}New segment: {text}
 
 Requirements:
 1. 1-2 VERY CONCISE insights about new information (max 10 words each)
 2. 1 relevant follow-up question
-3. Ignore redundant or filler content
+3. Ignore redundant or filler content{summary_requirement}
 
 Format response as JSON:
 {{
     "insights": ["insight1", "insight2"],
-    "questions": ["question1"]
+    "questions": ["question1"]{summary_field}
 }}"""
 
-    async def generate_insights(self, text: str) -> InsightResponse:
-        # Skip empty text
-        if not text.strip():
-            return InsightResponse(insights=[], questions=[])
-        
+    def _build_request(
+        self,
+        text: str,
+        is_full_analysis: bool,
+        summary: Optional[str] = None
+    ) -> ChatRequest:
+        # The provider's model (LLM_MODEL, Mixtral by default for better context understanding)
+        return ChatRequest(
+            messages=[
+                {
+                    "role": "system",
+                    "content": "You are a real-time meeting assistant that provides quick, relevant insights and questions. Be concise and focus on actionable information."
+                },
+                {
+                    "role": "user",
+                    "content": self._generate_prompt(text, is_full_analysis, summary)
+                }
+            ],
+            temperature=0.3,  # Lower temperature for more focused responses
+            max_tokens=150 if summary is None else 250,  # Limit response length
+            top_p=0.9
+        )
+
+    def _prepare(self, text: str, state: AnalysisState):
+        """Trim the text to the context window and pick the analysis mode"""
         # Add to context window (keep last 500 words)
         words = text.split()
-        if len(words) > 500:
-            text = " ".join(words[-500:])
-        
+        if len(words) > CONTEXT_WORDS:
+            text = " ".join(words[-CONTEXT_WORDS:])
+
         # Determine if we should do a full analysis
-        time_since_last = datetime.now() - self.last_full_analysis
+        time_since_last = datetime.now() - state.last_full_analysis
         is_full_analysis = time_since_last > self.min_analysis_interval
-        
+        return text, is_full_analysis
+
+    @staticmethod
+    def _mode(is_full_analysis: bool, summary: Optional[str] = None) -> str:
+        mode = "full" if is_full_analysis else "segment"
+        return f"{mode}+summary" if summary is not None else mode
+
+    async def _cached(self, mode: str, key: str, words: List[str], state: AnalysisState) -> Optional[str]:
+        """Model output for an equivalent prompt, if the cache has one"""
+        previous = None
+        if state.last_prompt is not None and state.last_prompt[0] == mode:
+            previous = state.last_prompt[1:]
+        content = await self.cache.lookup(key, words, previous)
+        if content is not None:
+            state.last_prompt = (mode, words, content)
+        return content
+
+    async def _store(self, mode: str, key: str, words: List[str], state: AnalysisState, content: str):
+        try:
+            json.loads(content)
+        except json.JSONDecodeError:
+            # Don't cache answers that can't be used
+            return
+        state.last_prompt = (mode, words, content)
+        await self.cache.put(key, content)
+
+    def _parse_content(
+        self,
+        content: str,
+        is_full_analysis: bool,
+        state: AnalysisState
+    ) -> InsightResponse:
         try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            data = {
-                "model": "mixtral-8x7b-instruct",  # Using Mixtral for better context understanding
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": "You are a real-time meeting assistant that provides quick, relevant insights and questions. Be concise and focus on actionable information."
-                    },
-                    {
-                        "role": "user",
-                        "content": self._generate_prompt(text, is_full_analysis)
-                    }
-                ],
-                "temperature": 0.3,  # Lower temperature for more focused responses
-                "max_tokens": 150,  # Limit response length
-                "top_p": 0.9
-            }
-            
-            async with asyncio.timeout(5.0):  # 5-second timeout
-                response = requests.post(self.api_url, headers=headers, json=data)
-                response.raise_for_status()
-                
-                result = response.json()
-                if "choices" in result and result["choices"]:
-                    try:
-                        content = result["choices"][0]["message"]["content"]
-                        parsed = json.loads(content)
-                        
-                        # Update last analysis time if this was a full analysis
-                        if is_full_analysis:
-                            self.last_full_analysis = datetime.now()
-                        
-                        return InsightResponse(
-                            insights=parsed.get("insights", [])[:3],  # Limit to 3 insights
-                            questions=parsed.get("questions", [])[:3]  # Limit to 3 questions
-                        )
-                    except json.JSONDecodeError:
-                        print("Error parsing LLM response as JSON")
-                        return InsightResponse(insights=[], questions=[])
-                
+            parsed = json.loads(content)
+        except json.JSONDecodeError:
+            # Small local models, and answers cut off at max_tokens, can leave
+            # the document unfinished; the items that did complete are kept
+            partial = _parse_partial(content)
+            if not (partial.insights or partial.questions):
+                logger.error("Error parsing LLM response as JSON")
+            return partial
+
+        # Update last analysis time if this was a full analysis
+        if is_full_analysis:
+            state.last_full_analysis = datetime.now()
+        if parsed.get("summary"):
+            state.summary = str(parsed["summary"])[:MAX_SUMMARY_CHARS]
+
+        return InsightResponse(
+            insights=parsed.get("insights", [])[:3],  # Limit to 3 insights
+            questions=parsed.get("questions", [])[:3]  # Limit to 3 questions
+        )
+
+    async def generate_insights(
+        self,
+        text: str,
+        state: Optional[AnalysisState] = None
+    ) -> InsightResponse:
+        # Skip empty text
+        if not text.strip():
             return InsightResponse(insights=[], questions=[])
-            
+
+        state = state or self.default_state
+        text, is_full_analysis = self._prepare(text, state)
+        mode = self._mode(is_full_analysis)
+        words = normalize(text)
+        key = self.cache.key(mode, words)
+        content = await self._cached(mode, key, words, state)
+        if content is not None:
+            return self._parse_content(content, is_full_analysis, state)
+
+        started = time.perf_counter()
+        try:
+            # The request runs on the event loop, so the timeout (and a
+            # cancellation of the calling task) actually interrupts it
+            async with asyncio.timeout(self.timeout):
+                content = await self.llm.complete(self._build_request(text, is_full_analysis))
+            LLM_SECONDS.observe(time.perf_counter() - started, mode="complete", outcome="ok")
+            if content:
+                await self._store(mode, key, words, state, content)
+                return self._parse_content(content, is_full_analysis, state)
+
+            return InsightResponse(insights=[], questions=[])
+
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
-            print(f"Error generating insights: {e}")
+            LLM_SECONDS.observe(time.perf_counter() - started, mode="complete", outcome=_outcome(e))
+            logger.error(f"Error generating insights: {e}")
             return InsightResponse(insights=[], questions=[])
+
+    async def stream_insights(
+        self,
+        text: str,
+        state: Optional[AnalysisState] = None
+    ) -> AsyncIterator[InsightResponse]:
+        """Stream a completion, yielding insights as soon as list items complete.
+
+        Partial responses are yielded whenever a new insight or question has
+        been fully received; the last response yielded is the complete one.
+        """
+        if not text.strip():
+            yield InsightResponse(insights=[], questions=[])
+            return
+
+        state = state or self.default_state
+        text, is_full_analysis = self._prepare(text, state)
+        async for insights in self._stream(text, is_full_analysis, state):
+            yield insights
+
+    async def stream_session_insights(self, state: AnalysisState) -> AsyncIterator[InsightResponse]:
+        """Incremental analysis: send only the unsent segments plus the summary.
+
+        Every min_analysis_interval the recent context window is sent instead,
+        so the model can correct a summary that drifted.
+        """
+        if not state.pending:
+            return
+
+        time_since_last = datetime.now() - state.last_full_analysis
+        is_full_analysis = time_since_last > self.min_analysis_interval
+        sent = len(state.pending)
+        if is_full_analysis:
+            text = " ".join(state.window)
+        else:
+            text = " ".join(state.pending)
+
+        async for insights in self._stream(text, is_full_analysis, state, summary=state.summary):
+            yield insights
+
+        # Segments are consumed even when the request failed; they are still
+        # part of the window the next full analysis sees
+        del state.pending[:sent]
+
+    async def _stream(
+        self,
+        text: str,
+        is_full_analysis: bool,
+        state: AnalysisState,
+        summary: Optional[str] = None
+    ) -> AsyncIterator[InsightResponse]:
+        mode = self._mode(is_full_analysis, summary)
+        words = normalize(text)
+        key = self.cache.key(mode, words, summary)
+        cached = await self._cached(mode, key, words, state)
+        if cached is not None:
+            yield self._parse_content(cached, is_full_analysis, state)
+            return
+
+        content = ""
+        last_partial = None
+        started = time.perf_counter()
+
+        try:
+            async with asyncio.timeout(self.timeout):
+                deltas = self.llm.stream(self._build_request(text, is_full_analysis, summary=summary))
+                try:
+                    async for delta in deltas:
+                        content += delta
+                        partial = _parse_partial(content)
+                        if partial != last_partial and (partial.insights or partial.questions):
+                            if last_partial is None:
+                                LLM_FIRST_PARTIAL.observe(time.perf_counter() - started)
+                            last_partial = partial
+                            yield partial
+                finally:
+                    # Releases the connection and concurrency slot right away
+                    await deltas.aclose()
+
+            LLM_SECONDS.observe(time.perf_counter() - started, mode="stream", outcome="ok")
+            await self._store(mode, key, words, state, content)
+            yield self._parse_content(content, is_full_analysis, state)
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            LLM_SECONDS.observe(time.perf_counter() - started, mode="stream", outcome=_outcome(e))
+            logger.error(f"Error streaming insights: {e}")
+            yield last_partial or InsightResponse(insights=[], questions=[])
+
+    async def close(self):
+        # The LLM client is shared; main closes it on shutdown
+        self.cache.close()
+
+
+_STRING = r'"(?:[^"\\]|\\.)*"'
+_PARTIAL_LISTS = {
+    key: re.compile(rf'"{key}"\s*:\s*\[((?:\s*{_STRING}\s*,?)*)')
+    for key in ("insights", "questions")
+}
+_PARTIAL_ITEM = re.compile(_STRING)
+
+
+def _parse_partial(content: str) -> InsightResponse:
+    """Pull the completed list items out of a JSON document still being streamed"""
+    lists = {}
+    for key, pattern in _PARTIAL_LISTS.items():
+        match = pattern.search(content)
+        items = _PARTIAL_ITEM.findall(match.group(1)) if match else []
+        lists[key] = [json.loads(item) for item in items][:3]
+    return InsightResponse(**lists)
@@ -0,0 +1,577 @@
+import os
+import json
+import time
+import random
+import asyncio
+import logging
+from dataclasses import dataclass, field, replace
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+import httpx
+from services.metrics import registry as metrics
+
+logger = logging.getLogger(__name__)
+
+ATTEMPTS = metrics.counter(
+    "llm_attempts_total", "LLM provider calls by model and outcome (ok, retried, error)", ["model", "outcome"]
+)
+HEDGES = metrics.counter(
+    "llm_hedges_total", "Requests also sent to the fallback model, by which answered first", ["winner"]
+)
+BATCH_SIZE = metrics.histogram(
+    "llm_batch_size", "Requests per provider batch call", buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+
+DEFAULT_API_URL = "https://api.groq.com/openai/v1/chat/completions"
+DEFAULT_MODEL = "mixtral-8x7b-instruct"
+# Status codes worth another attempt; anything else 4xx is the request's fault
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+
+@dataclass
+class ChatRequest:
+    """One chat completion; model None means the provider's default"""
+    messages: List[Dict[str, str]]
+    model: Optional[str] = None
+    temperature: float = 0.7
+    max_tokens: int = 150
+    top_p: float = 1.0
+
+    def body(self, model: str, stream: bool = False) -> Dict:
+        return {
+            "model": model,
+            "messages": self.messages,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            "top_p": self.top_p,
+            "stream": stream
+        }
+
+
+class LLMError(Exception):
+    """A provider call failed; retryable errors are worth another attempt"""
+
+    def __init__(self, message: str, retryable: bool = False, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+class LLMProvider:
+    """A chat completion backend.
+
+    Providers only talk to their backend; limits, retries and hedging are
+    LLMClient's job. Providers that set supports_batching take several
+    requests in one complete_batch() call.
+    """
+
+    supports_batching = False
+
+    def __init__(self, model: str):
+        self.model = model
+
+    async def start(self):
+        """Load anything the first call would otherwise wait for"""
+
+    async def complete(self, request: ChatRequest) -> str:
+        raise NotImplementedError
+
+    def stream(self, request: ChatRequest) -> AsyncIterator[str]:
+        raise NotImplementedError
+
+    async def complete_batch(self, requests: List[ChatRequest]) -> List[str]:
+        return [await self.complete(request) for request in requests]
+
+    async def close(self):
+        pass
+
+
+class OpenAICompatibleProvider(LLMProvider):
+    """/chat/completions over one shared keep-alive httpx client (Groq, OpenAI, vLLM, ...)"""
+
+    def __init__(
+        self,
+        api_url: str,
+        api_key: Optional[str],
+        model: str,
+        timeout: float,
+        max_connections: int
+    ):
+        super().__init__(model)
+        self.api_url = api_url
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Created on first use inside the event loop"""
+        if self._client is None:
+            headers = {"Content-Type": "application/json"}
+            if self.api_key:
+                headers["Authorization"] = f"Bearer {self.api_key}"
+            self._client = httpx.AsyncClient(
+                headers=headers,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                ),
+                timeout=httpx.Timeout(self.timeout)
+            )
+        return self._client
+
+    @staticmethod
+    def _error(response: httpx.Response) -> LLMError:
+        retry_after = response.headers.get("retry-after")
+        try:
+            retry_after = float(retry_after) if retry_after else None
+        except ValueError:
+            retry_after = None
+        return LLMError(
+            f"HTTP {response.status_code} from LLM provider",
+            retryable=response.status_code in RETRY_STATUSES,
+            retry_after=retry_after
+        )
+
+    async def complete(self, request: ChatRequest) -> str:
+        try:
+            response = await self.client.post(self.api_url, json=request.body(request.model or self.model))
+        except httpx.TransportError as e:
+            raise LLMError(f"{type(e).__name__}: {e}", retryable=True) from e
+        if response.status_code != 200:
+            raise self._error(response)
+        result = response.json()
+        if not result.get("choices"):
+            return ""
+        return result["choices"][0]["message"]["content"]
+
+    async def stream(self, request: ChatRequest) -> AsyncIterator[str]:
+        try:
+            async with self.client.stream(
+                "POST", self.api_url, json=request.body(request.model or self.model, stream=True)
+            ) as response:
+                if response.status_code != 200:
+                    raise self._error(response)
+                async for delta in iter_sse_content(response):
+                    yield delta
+        except httpx.TransportError as e:
+            raise LLMError(f"{type(e).__name__}: {e}", retryable=True) from e
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+FAKE_CONTENT = json.dumps({
+    "insights": ["Team agreed to ship the beta next sprint"],
+    "questions": ["Who owns the rollout checklist?"],
+    "summary": "Team is planning the beta release."
+})
+
+
+class FakeProvider(LLMProvider):
+    """Local stand-in for tests and benchmarks: canned JSON after a delay.
+
+    Streams the answer in chunk_size pieces, fails the given share of calls
+    (retryably) and handles batches in one call.
+    """
+
+    supports_batching = True
+
+    def __init__(
+        self,
+        model: str = "fake",
+        latency: float = 0.05,
+        content: str = FAKE_CONTENT,
+        failure_rate: float = 0.0,
+        chunk_size: int = 12
+    ):
+        super().__init__(model)
+        self.latency = latency
+        self.content = content
+        self.failure_rate = failure_rate
+        self.chunk_size = chunk_size
+        self.calls: List[Tuple[str, int]] = []
+
+    def _maybe_fail(self):
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise LLMError("fake provider failure", retryable=True)
+
+    async def complete(self, request: ChatRequest) -> str:
+        self.calls.append((request.model or self.model, 1))
+        await asyncio.sleep(self.latency)
+        self._maybe_fail()
+        return self.content
+
+    async def stream(self, request: ChatRequest) -> AsyncIterator[str]:
+        self.calls.append((request.model or self.model, 1))
+        await asyncio.sleep(self.latency)
+        self._maybe_fail()
+        for start in range(0, len(self.content), self.chunk_size):
+            yield self.content[start:start + self.chunk_size]
+            await asyncio.sleep(0)
+
+    async def complete_batch(self, requests: List[ChatRequest]) -> List[str]:
+        self.calls.append((requests[0].model or self.model, len(requests)))
+        await asyncio.sleep(self.latency)
+        self._maybe_fail()
+        return [self.content for _ in requests]
+
+
+class UnconfiguredProvider(LLMProvider):
+    """Stand-in for a provider missing its settings: every call fails.
+
+    Lets the rest of the server (transcription, storage) start without
+    them; insights come back empty until they are set.
+    """
+
+    def __init__(self, model: str, reason: str):
+        super().__init__(model)
+        self.reason = reason
+
+    async def complete(self, request: ChatRequest) -> str:
+        raise LLMError(self.reason)
+
+    async def stream(self, request: ChatRequest) -> AsyncIterator[str]:
+        raise LLMError(self.reason)
+        yield
+
+
+class TokenBucket:
+    """Requests per second with bursts up to capacity; rate 0 means unlimited"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, cost: float = 1.0):
+        if self.rate <= 0:
+            return
+        # One waiter at a time keeps the bucket FIFO
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self.tokens >= cost:
+                    self.tokens -= cost
+                    return
+                await asyncio.sleep((cost - self.tokens) / self.rate)
+
+
+@dataclass
+class _Pending:
+    request: ChatRequest
+    future: asyncio.Future = field(repr=False)
+
+
+class LLMClient:
+    """The process-wide way to call the LLM, shared by every caller.
+
+    Every attempt passes a global concurrency limit and a token bucket.
+    Retryable failures (timeouts, connection errors, 429 and 5xx) are
+    retried with exponential backoff and full jitter, honouring
+    Retry-After. With a fallback model, a request that has no answer (or,
+    streaming, no first chunk) after hedge_after seconds is also sent to
+    the fallback model, and whichever answers first is used. If the
+    provider supports batching, complete() calls arriving within
+    batch_window are sent as one batch.
+    """
+
+    def __init__(
+        self,
+        provider: LLMProvider,
+        max_concurrency: Optional[int] = None,
+        rate_limit: Optional[float] = None,
+        rate_burst: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        backoff: Optional[float] = None,
+        fallback_model: Optional[str] = None,
+        hedge_after: Optional[float] = None,
+        batch_window: Optional[float] = None,
+        max_batch: Optional[int] = None
+    ):
+        self.provider = provider
+        self.max_concurrency = max_concurrency or int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+        self.rate_limit = TokenBucket(
+            rate_limit if rate_limit is not None else float(os.getenv("LLM_RATE_LIMIT", "0")),
+            rate_burst if rate_burst is not None else float(os.getenv("LLM_RATE_BURST", "0")) or None
+        )
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("LLM_MAX_RETRIES", "2"))
+        self.backoff = backoff if backoff is not None else float(os.getenv("LLM_RETRY_BACKOFF_SECONDS", "0.25"))
+        self.fallback_model = fallback_model if fallback_model is not None else os.getenv("LLM_FALLBACK_MODEL") or None
+        self.hedge_after = hedge_after if hedge_after is not None else float(
+            os.getenv("LLM_HEDGE_AFTER_SECONDS", "1.5")
+        )
+        self.batch_window = batch_window if batch_window is not None else float(
+            os.getenv("LLM_BATCH_WINDOW_MS", "10")
+        ) / 1000
+        self.max_batch = max_batch or int(os.getenv("LLM_MAX_BATCH", "16"))
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._batch: List[_Pending] = []
+        self._batch_task: Optional[asyncio.Task] = None
+        # Running batch calls, referenced so they aren't garbage collected
+        self._batch_runs: Set[asyncio.Task] = set()
+
+    @property
+    def model(self) -> str:
+        return self.provider.model
+
+    async def _admit(self):
+        await self.rate_limit.acquire()
+        await self._slots.acquire()
+
+    def _delay(self, attempt: int, error: LLMError) -> float:
+        if error.retry_after is not None:
+            return error.retry_after
+        # Full jitter: spreads out clients that failed together
+        return random.uniform(0, self.backoff * 2 ** attempt)
+
+    async def _with_retries(self, call, model: str):
+        attempt = 0
+        while True:
+            await self._admit()
+            try:
+                result = await call()
+                ATTEMPTS.inc(model=model, outcome="ok")
+                return result
+            except LLMError as e:
+                if not e.retryable or attempt >= self.max_retries:
+                    ATTEMPTS.inc(model=model, outcome="error")
+                    raise
+                ATTEMPTS.inc(model=model, outcome="retried")
+                delay = self._delay(attempt, e)
+                logger.warning(f"LLM call to {model} failed ({e}), retrying in {delay:.2f}s")
+            finally:
+                self._slots.release()
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def complete(self, request: ChatRequest) -> str:
+        """The full answer; hedged to the fallback model when slow"""
+        if not self.fallback_model:
+            return await self._complete(request)
+        primary = asyncio.create_task(self._complete(request))
+        tasks = {primary: "primary"}
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self.hedge_after)
+            if done:
+                return primary.result()
+            hedge = asyncio.create_task(self._complete(replace(request, model=self.fallback_model)))
+            tasks[hedge] = "fallback"
+            while tasks:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    winner = tasks.pop(task)
+                    if task.exception() is None:
+                        HEDGES.inc(winner=winner)
+                        return task.result()
+                    if not tasks:
+                        raise task.exception()
+        finally:
+            # Also when the caller is cancelled: nothing else awaits these
+            for task in tasks:
+                task.cancel()
+
+    async def _complete(self, request: ChatRequest) -> str:
+        model = request.model or self.model
+        if self.provider.supports_batching:
+            return await self._enqueue(request)
+        return await self._with_retries(lambda: self.provider.complete(request), model)
+
+    async def _enqueue(self, request: ChatRequest) -> str:
+        future = asyncio.get_running_loop().create_future()
+        self._batch.append(_Pending(request, future))
+        if len(self._batch) >= self.max_batch:
+            self._flush()
+        elif self._batch_task is None:
+            self._batch_task = asyncio.create_task(self._flush_later())
+        return await future
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.batch_window)
+        self._batch_task = None
+        self._flush()
+
+    def _flush(self):
+        if self._batch_task is not None:
+            self._batch_task.cancel()
+            self._batch_task = None
+        pending, self._batch = self._batch, []
+        # One provider call per model
+        by_model: Dict[str, List[_Pending]] = {}
+        for item in pending:
+            by_model.setdefault(item.request.model or self.model, []).append(item)
+        for model, items in by_model.items():
+            task = asyncio.create_task(self._run_batch(model, items))
+            self._batch_runs.add(task)
+            task.add_done_callback(self._batch_runs.discard)
+
+    async def _run_batch(self, model: str, items: List[_Pending]):
+        # Callers that gave up while the batch was collected aren't sent
+        items = [item for item in items if not item.future.done()]
+        if not items:
+            return
+        BATCH_SIZE.observe(len(items))
+        try:
+            results = await self._with_retries(
+                lambda: self.provider.complete_batch([item.request for item in items]), model
+            )
+        except Exception as e:
+            for item in items:
+                if not item.future.done():
+                    item.future.set_exception(e)
+            return
+        for item, result in zip(items, results):
+            if not item.future.done():
+                item.future.set_result(result)
+
+    async def _open_stream(self, request: ChatRequest) -> AsyncIterator[str]:
+        """Provider stream behind the limits, retried until its first chunk"""
+        model = request.model or self.model
+        attempt = 0
+        while True:
+            await self._admit()
+            started = False
+            try:
+                async for delta in self.provider.stream(request):
+                    started = True
+                    yield delta
+                ATTEMPTS.inc(model=model, outcome="ok")
+                return
+            except LLMError as e:
+                # A restarted stream would repeat what the caller already has
+                if started or not e.retryable or attempt >= self.max_retries:
+                    ATTEMPTS.inc(model=model, outcome="error")
+                    raise
+                ATTEMPTS.inc(model=model, outcome="retried")
+                delay = self._delay(attempt, e)
+                logger.warning(f"LLM stream from {model} failed ({e}), retrying in {delay:.2f}s")
+            finally:
+                self._slots.release()
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    async def _first(stream: AsyncIterator[str]) -> Tuple[bool, Optional[str]]:
+        try:
+            return True, await stream.__anext__()
+        except StopAsyncIteration:
+            return False, None
+
+    async def stream(self, request: ChatRequest) -> AsyncIterator[str]:
+        """Content deltas; hedged to the fallback model while no chunk has arrived"""
+        streams = {"primary": self._open_stream(request)}
+        pending = {asyncio.ensure_future(self._first(streams["primary"])): "primary"}
+        winner: Optional[str] = None
+        first: Optional[str] = None
+        try:
+            while winner is None:
+                can_hedge = self.fallback_model is not None and "fallback" not in streams
+                done, _ = await asyncio.wait(
+                    pending,
+                    timeout=self.hedge_after if can_hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                failed = None
+                for task in done:
+                    name = pending.pop(task)
+                    if task.exception() is None:
+                        winner = name
+                        first = task.result()[1]
+                        break
+                    failed = task.exception()
+                if winner is not None:
+                    break
+                if can_hedge:
+                    # Slow (or failed) before its first chunk: try the fallback model
+                    fallback = self._open_stream(replace(request, model=self.fallback_model))
+                    streams["fallback"] = fallback
+                    pending[asyncio.ensure_future(self._first(fallback))] = "fallback"
+                elif not pending:
+                    raise failed
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            for name, stream in streams.items():
+                if name != winner:
+                    await stream.aclose()
+        if len(streams) > 1:
+            HEDGES.inc(winner=winner)
+        if first is None:
+            return
+        try:
+            yield first
+            async for delta in streams[winner]:
+                yield delta
+        finally:
+            # A caller that stops early releases the slot and connection now
+            await streams[winner].aclose()
+
+    async def start(self):
+        await self.provider.start()
+
+    async def close(self):
+        await self.provider.close()
+
+
+def create_provider(name: Optional[str] = None) -> LLMProvider:
+    """The provider named by LLM_PROVIDER: "openai" (any OpenAI-compatible URL), local or fake"""
+    name = name or os.getenv("LLM_PROVIDER", "openai")
+    model = os.getenv("LLM_MODEL", DEFAULT_MODEL)
+    if name == "local":
+        # Imported here: it imports this module
+        from services.local_llm import LocalProvider
+        return LocalProvider()
+    if name == "fake":
+        return FakeProvider(latency=float(os.getenv("LLM_FAKE_LATENCY_SECONDS", "0.05")))
+    if name != "openai":
+        raise ValueError(f"Unknown LLM provider: {name}")
+    api_url = os.getenv("GROQ_API_URL", DEFAULT_API_URL)
+    api_key = os.getenv("GROQ_API_KEY") or None
+    # Local stand-ins (the stub server, vLLM) may not need a key; Groq does
+    if api_key is None and urlsplit(api_url).hostname == urlsplit(DEFAULT_API_URL).hostname:
+        logger.warning("GROQ_API_KEY is not set: LLM calls (insights, /process) will fail until it is")
+        return UnconfiguredProvider(model, "GROQ_API_KEY is not set")
+    return OpenAICompatibleProvider(
+        api_url=api_url,
+        api_key=api_key,
+        model=model,
+        timeout=float(os.getenv("LLM_TIMEOUT_SECONDS", "30")),
+        max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", os.getenv("INSIGHTS_MAX_CONNECTIONS", "20")))
+    )
+
+
+async def iter_sse_content(response: httpx.Response) -> AsyncIterator[str]:
+    """Yield the content deltas of an OpenAI-style server-sent event stream"""
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        payload = line[len("data:"):].strip()
+        if payload == "[DONE]":
+            break
+        try:
+            chunk = json.loads(payload)
+        except json.JSONDecodeError:
+            continue
+        for choice in chunk.get("choices", []):
+            delta = choice.get("delta", {}).get("content")
+            if delta:
+                yield delta
+
+
+_client: Optional[LLMClient] = None
+
+
+def get_llm_client() -> LLMClient:
+    """Process-wide client, so every caller shares the limits and connections"""
+    global _client
+    if _client is None:
+        _client = LLMClient(create_provider())
+    return _client
@@ -0,0 +1,234 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import AsyncIterator, List, Optional
+from services.metrics import registry as metrics
+from services.llm_provider import ChatRequest, LLMError, LLMProvider
+
+logger = logging.getLogger(__name__)
+
+GENERATE_SECONDS = metrics.histogram(
+    "local_llm_generate_seconds", "Duration of one batched generate() call of the local model",
+    buckets=(0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32)
+)
+GENERATE_BATCH = metrics.histogram(
+    "local_llm_batch_size", "Requests per generate() call of the local model", buckets=(1, 2, 4, 8, 16, 32)
+)
+
+
+def _json_body(text: str) -> str:
+    """The JSON object in a model's answer, without prose or code fences around it"""
+    text = text.strip()
+    start, end = text.find("{"), text.rfind("}")
+    if 0 <= start < end and (start, end) != (0, len(text) - 1):
+        candidate = text[start:end + 1]
+        try:
+            json.loads(candidate)
+            return candidate
+        except json.JSONDecodeError:
+            pass
+    return text
+
+
+@dataclass
+class _Job:
+    request: ChatRequest
+    future: asyncio.Future = field(repr=False)
+
+
+class LocalProvider(LLMProvider):
+    """A small instruction-tuned model run in-process on the CPU.
+
+    LOCAL_LLM_MODEL is a directory with a transformers causal LM (e.g.
+    Qwen/Qwen2.5-0.5B-Instruct, prompted through its chat template) or a
+    seq2seq model (e.g. google/flan-t5-base, prompted with the messages
+    joined); nothing is fetched at runtime. The model is loaded once, on
+    start() or the first call, and with quantize its Linear layers are
+    dynamically quantized to int8.
+
+    Every call goes through one generation thread: requests that arrive
+    while a batch is generating (from any session, streamed or not) are
+    padded into the next generate() call, up to max_batch. Decoding is
+    greedy, so temperature and top_p are ignored and the same prompt gives
+    the same answer; a batch generates up to its largest max_tokens.
+    stream() yields the whole answer at once. The thread runs at niceness
+    nice so generation doesn't delay the decoder threads.
+    """
+
+    supports_batching = True
+
+    def __init__(
+        self,
+        model_path: Optional[str] = None,
+        quantize: Optional[bool] = None,
+        threads: Optional[int] = None,
+        max_batch: Optional[int] = None,
+        max_input_tokens: Optional[int] = None,
+        nice: Optional[int] = None
+    ):
+        self.model_path = model_path or os.getenv("LOCAL_LLM_MODEL", "")
+        if not self.model_path:
+            raise ValueError("LLM_PROVIDER=local needs LOCAL_LLM_MODEL, a local model directory")
+        super().__init__(os.path.basename(os.path.normpath(self.model_path)))
+        self.quantize = quantize if quantize is not None else os.getenv("LOCAL_LLM_QUANTIZE", "1") != "0"
+        self.threads = threads or int(os.getenv("LOCAL_LLM_THREADS", "0")) or os.cpu_count() or 1
+        self.max_batch = max_batch or int(os.getenv("LOCAL_LLM_MAX_BATCH", "8"))
+        self.max_input_tokens = max_input_tokens or int(os.getenv("LOCAL_LLM_MAX_INPUT_TOKENS", "1536"))
+        self.nice = nice if nice is not None else int(os.getenv("LOCAL_LLM_NICE", "10"))
+        self.generated = 0
+        self.batches = 0
+        self._torch = None
+        self._tokenizer = None
+        self._model = None
+        self._encoder_decoder = False
+        self._queue: List[_Job] = []
+        self._runner: Optional[asyncio.Task] = None
+        self._loaded: Optional[asyncio.Future] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _lower_priority(self):
+        try:
+            # Linux applies this to the calling thread when given its own id
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), self.nice)
+        except (AttributeError, OSError) as e:
+            logger.warning(f"Could not lower the priority of the local LLM thread: {e}")
+
+    def _load(self):
+        started = time.perf_counter()
+        import torch
+        from transformers import AutoConfig, AutoModelForCausalLM, AutoModelForSeq2SeqLM, AutoTokenizer
+
+        self._torch = torch
+        # Process-wide: also the thread count of a diarization model
+        torch.set_num_threads(self.threads)
+        config = AutoConfig.from_pretrained(self.model_path, local_files_only=True)
+        self._encoder_decoder = bool(config.is_encoder_decoder)
+        model_class = AutoModelForSeq2SeqLM if self._encoder_decoder else AutoModelForCausalLM
+        model = model_class.from_pretrained(self.model_path, local_files_only=True, torch_dtype=torch.float32)
+        model.eval()
+        if self.quantize:
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        tokenizer = AutoTokenizer.from_pretrained(self.model_path, local_files_only=True)
+        # An overlong prompt loses its start, not the instructions and answer format at its end
+        tokenizer.truncation_side = "left"
+        if not self._encoder_decoder:
+            # Generated tokens follow the prompt, so prompts are padded on the left
+            tokenizer.padding_side = "left"
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+        self._tokenizer = tokenizer
+        self._model = model
+        logger.info(
+            f"Loaded local LLM {self.model} ({'int8' if self.quantize else 'float32'}, "
+            f"{self.threads} threads) in {time.perf_counter() - started:.2f}s"
+        )
+
+    def _prompt(self, request: ChatRequest) -> str:
+        if not self._encoder_decoder and self._tokenizer.chat_template is not None:
+            return self._tokenizer.apply_chat_template(
+                request.messages, tokenize=False, add_generation_prompt=True
+            )
+        return "\n\n".join(message["content"] for message in request.messages)
+
+    def generate(self, requests: List[ChatRequest]) -> List[str]:
+        """Answers to a batch of requests from one generate() call; runs on the generation thread"""
+        started = time.perf_counter()
+        inputs = self._tokenizer(
+            [self._prompt(request) for request in requests],
+            return_tensors="pt",
+            padding=True,
+            truncation=True,
+            max_length=self.max_input_tokens
+        )
+        with self._torch.inference_mode():
+            output = self._model.generate(
+                **inputs,
+                max_new_tokens=max(request.max_tokens for request in requests),
+                do_sample=False,
+                pad_token_id=self._tokenizer.pad_token_id
+            )
+        if not self._encoder_decoder:
+            output = output[:, inputs["input_ids"].shape[1]:]
+        answers = self._tokenizer.batch_decode(output, skip_special_tokens=True)
+        GENERATE_SECONDS.observe(time.perf_counter() - started)
+        GENERATE_BATCH.observe(len(requests))
+        self.generated += len(requests)
+        self.batches += 1
+        return [_json_body(answer) for answer in answers]
+
+    async def start(self):
+        """Load the model now rather than on the first call"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="local-llm", initializer=self._lower_priority
+            )
+            self._loaded = asyncio.get_running_loop().run_in_executor(self._executor, self._load)
+        try:
+            await asyncio.shield(self._loaded)
+        except Exception as e:
+            raise LLMError(f"Could not load local LLM {self.model_path}: {e}") from e
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        try:
+            await self.start()
+            while self._queue:
+                batch, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+                # Requests whose caller gave up (timeout, cancellation) aren't generated
+                batch = [job for job in batch if not job.future.done()]
+                if not batch:
+                    continue
+                try:
+                    answers = await loop.run_in_executor(
+                        self._executor, self.generate, [job.request for job in batch]
+                    )
+                except Exception as e:
+                    logger.error(f"Local LLM generation failed: {e}")
+                    for job in batch:
+                        if not job.future.done():
+                            job.future.set_exception(LLMError(f"{type(e).__name__}: {e}"))
+                    continue
+                for job, answer in zip(batch, answers):
+                    if not job.future.done():
+                        job.future.set_result(answer)
+        except LLMError as e:
+            jobs, self._queue = self._queue, []
+            for job in jobs:
+                if not job.future.done():
+                    job.future.set_exception(e)
+        finally:
+            self._runner = None
+
+    async def complete_batch(self, requests: List[ChatRequest]) -> List[str]:
+        loop = asyncio.get_running_loop()
+        jobs = [_Job(request, loop.create_future()) for request in requests]
+        self._queue.extend(jobs)
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._run())
+        try:
+            return list(await asyncio.gather(*(job.future for job in jobs)))
+        finally:
+            for job in jobs:
+                job.future.cancel()
+
+    async def complete(self, request: ChatRequest) -> str:
+        return (await self.complete_batch([request]))[0]
+
+    async def stream(self, request: ChatRequest) -> AsyncIterator[str]:
+        yield await self.complete(request)
+
+    async def close(self):
+        if self._runner is not None:
+            self._runner.cancel()
+            self._runner = None
+        for job in self._queue:
+            job.future.cancel()
+        self._queue = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,191 @@
+import os
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Dict, Optional, Tuple
+from vosk import Model, KaldiRecognizer
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+
+# Older setups extracted the model without the version suffix
+DEFAULT_MODEL_PATHS = ("vosk-model-small-en-us", "vosk-model-small-en-us-0.15")
+DEFAULT_LANGUAGE = "en-us"
+
+# (model path, words enabled)
+PoolKey = Tuple[str, bool]
+
+
+def parse_model_map(value: str) -> Dict[str, str]:
+    """Parse "en-us=vosk-model-small-en-us,de=vosk-model-small-de-0.15" """
+    models = {}
+    for entry in value.split(","):
+        if not entry.strip():
+            continue
+        language, _, path = entry.partition("=")
+        if not path:
+            raise ValueError(f"Invalid VOSK_MODELS entry: {entry!r}")
+        models[language.strip().lower()] = path.strip()
+    return models
+
+
+class ModelRegistry:
+    """Process-wide Vosk models and warm recognizers.
+
+    Each model is loaded once, on first use, and shared by every session
+    that selects its language. Per model a few recognizers are kept ready:
+    building a KaldiRecognizer allocates the decoder graph state, so new
+    sessions take one from the pool and finished sessions hand theirs back
+    after Reset() instead of dropping it.
+    """
+
+    def __init__(
+        self,
+        models: Optional[Dict[str, str]] = None,
+        default_language: Optional[str] = None,
+        pool_size: Optional[int] = None,
+        sample_rate: int = SAMPLE_RATE
+    ):
+        if models is None:
+            models = parse_model_map(os.getenv("VOSK_MODELS", ""))
+        if not models:
+            default_path = next(
+                (path for path in DEFAULT_MODEL_PATHS if os.path.exists(path)),
+                DEFAULT_MODEL_PATHS[0]
+            )
+            models = {DEFAULT_LANGUAGE: default_path}
+        self.models = {language.lower(): path for language, path in models.items()}
+        self.default_language = (
+            default_language or os.getenv("VOSK_DEFAULT_LANGUAGE") or next(iter(self.models))
+        ).lower()
+        if self.default_language not in self.models:
+            raise ValueError(f"No model configured for default language {self.default_language}")
+        self.pool_size = pool_size if pool_size is not None else int(
+            os.getenv("VOSK_WARM_RECOGNIZERS", "4")
+        )
+        self.sample_rate = sample_rate
+        self.load_seconds: Dict[str, float] = {}
+        self._loaded: Dict[str, Model] = {}
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._pools: Dict[PoolKey, Deque[KaldiRecognizer]] = {}
+        self._refilling: set = set()
+        self._lock = threading.Lock()
+        self._warmer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vosk-warmup")
+
+    def model_path(self, language: Optional[str] = None) -> str:
+        """Model path for a session language (the default when not given)"""
+        language = (language or self.default_language).lower()
+        if language in self.models:
+            return self.models[language]
+        # "en-US" from a browser locale also matches an "en" model
+        base = language.split("-")[0]
+        if base in self.models:
+            return self.models[base]
+        raise ValueError(f"Unsupported language: {language}")
+
+    def get_model(self, path: str) -> Model:
+        """Load a model once; concurrent callers wait for the same load"""
+        model = self._loaded.get(path)
+        if model is not None:
+            return model
+        with self._lock:
+            load_lock = self._load_locks.setdefault(path, threading.Lock())
+        with load_lock:
+            model = self._loaded.get(path)
+            if model is None:
+                started = time.perf_counter()
+                model = Model(path)
+                self.load_seconds[path] = time.perf_counter() - started
+                self._loaded[path] = model
+                logger.info(f"Loaded Vosk model {path} in {self.load_seconds[path]:.2f}s")
+        return model
+
+    def _new_recognizer(self, path: str, words: bool) -> KaldiRecognizer:
+        recognizer = KaldiRecognizer(self.get_model(path), self.sample_rate)
+        if words:
+            recognizer.SetWords(True)
+        return recognizer
+
+    def acquire(self, path: str, words: bool = False) -> KaldiRecognizer:
+        """A reset recognizer for the model, from the warm pool if possible"""
+        key = (path, words)
+        with self._lock:
+            pool = self._pools.setdefault(key, deque())
+            recognizer = pool.popleft() if pool else None
+        if recognizer is None:
+            recognizer = self._new_recognizer(path, words)
+        self._schedule_refill(key)
+        return recognizer
+
+    def release(self, path: str, recognizer: KaldiRecognizer, words: bool = False):
+        """Reset a recognizer the caller is done with and keep it if the pool has room"""
+        recognizer.Reset()
+        with self._lock:
+            pool = self._pools.setdefault((path, words), deque())
+            if len(pool) < self.pool_size:
+                pool.append(recognizer)
+
+    def _schedule_refill(self, key: PoolKey):
+        with self._lock:
+            if key in self._refilling or len(self._pools[key]) >= self.pool_size:
+                return
+            self._refilling.add(key)
+        self._warmer.submit(self._refill, key)
+
+    def _refill(self, key: PoolKey):
+        """Runs on the warm-up thread"""
+        try:
+            while True:
+                with self._lock:
+                    if len(self._pools[key]) >= self.pool_size:
+                        return
+                recognizer = self._new_recognizer(*key)
+                with self._lock:
+                    if len(self._pools[key]) < self.pool_size:
+                        self._pools[key].append(recognizer)
+        except Exception as e:
+            logger.error(f"Error warming recognizers for {key[0]}: {e}")
+        finally:
+            with self._lock:
+                self._refilling.discard(key)
+
+    def warm(self, language: Optional[str] = None, words: bool = False):
+        """Load a language's model and fill its recognizer pool (blocking)"""
+        key = (self.model_path(language), words)
+        with self._lock:
+            self._pools.setdefault(key, deque())
+        self._refill(key)
+
+    async def prewarm(self, language: Optional[str] = None, words: bool = False):
+        await asyncio.to_thread(self.warm, language, words)
+
+    def stats(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {
+                "loaded_models": list(self._loaded),
+                "load_seconds": dict(self.load_seconds),
+                "warm_recognizers": {
+                    f"{path}{' (words)' if words else ''}": len(pool)
+                    for (path, words), pool in self._pools.items()
+                }
+            }
+
+    def shutdown(self):
+        self._warmer.shutdown(wait=False, cancel_futures=True)
+
+
+_registry: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ModelRegistry:
+    """The registry shared by everything in this process"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry()
+        return _registry
@@ -0,0 +1,520 @@
+import os
+import time
+import importlib.util
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Deque, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from services.metrics import registry as metrics
+from services.model_registry import SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+# Where the README's download command puts the x-vector model
+DEFAULT_MODEL_PATH = "models/wavlm-base-plus-sv"
+
+# Called on the event loop with (segment seq, speaker label or None, embedding)
+LabelCallback = Callable[[int, Optional[str], np.ndarray], Awaitable[None]]
+# Called with a session's packed background once it is frozen
+BackgroundCallback = Callable[[bytes], Awaitable[None]]
+
+EMBED_SECONDS = metrics.histogram(
+    "diarization_embed_seconds", "Time to compute the speaker embeddings of one batch of utterances"
+)
+LABEL_LATENCY = metrics.histogram(
+    "diarization_label_latency_seconds",
+    "Time from a final result to its speaker label, queueing included",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+SKIPPED = metrics.counter(
+    "diarization_skipped_utterances_total",
+    "Utterances left without a speaker label because the backlog was full",
+)
+
+
+def pack_embedding(embedding: np.ndarray) -> bytes:
+    """float16 for storage; cosine similarities don't need more"""
+    return embedding.astype("<f2").tobytes()
+
+
+def unpack_embedding(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype="<f2").astype(np.float32)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-9)
+
+
+def mel_filterbank(n_mels: int, n_fft: int, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """(n_mels, n_fft // 2 + 1) triangular filters, evenly spaced in mel"""
+    def to_mel(hz):
+        return 2595 * np.log10(1 + hz / 700)
+
+    edges = 700 * (10 ** (np.linspace(0, to_mel(sample_rate / 2), n_mels + 2) / 2595) - 1)
+    bins = np.fft.rfftfreq(n_fft, 1 / sample_rate)
+    lower, center, upper = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+    rising = (bins - lower) / (center - lower)
+    falling = (upper - bins) / (upper - center)
+    return np.maximum(0, np.minimum(rising, falling)).astype(np.float32)
+
+
+class SpectralEmbedder:
+    """Mean and spread of an utterance's cepstrum (MFCCs), as a voice signature.
+
+    No model to load and a few milliseconds per utterance, but a coarse
+    signature: it tells apart voices of clearly different timbre (pitch
+    range, vocal tract length) and confuses similar ones. All speech shares
+    most of its cepstrum, so signatures are compared relative to a
+    background: the running mean of every signature this embedder has
+    computed, across sessions, which settles after the first
+    settle_utterances. embed() returns the raw signatures, which is what is
+    stored, and center() puts them relative to a background when they are
+    compared. Each session freezes a snapshot() of the background once it
+    has settled and uses that from then on, also after a resume on another
+    worker, so its stored and new signatures are always measured against
+    the same one. The fallback when no x-vector model is available.
+    """
+
+    name = "spectral"
+    default_threshold = 0.5
+
+    def __init__(
+        self,
+        n_mels: int = 40,
+        n_ceps: int = 20,
+        frame_ms: int = 25,
+        hop_ms: int = 10,
+        background_utterances: int = 1000,
+        settle_utterances: int = 50
+    ):
+        self.frame = SAMPLE_RATE * frame_ms // 1000
+        self.hop = SAMPLE_RATE * hop_ms // 1000
+        self.n_fft = 1 << (self.frame - 1).bit_length()
+        self.window = np.hanning(self.frame).astype(np.float32)
+        self.filters = mel_filterbank(n_mels, self.n_fft)
+        # DCT-II rows 1..n_ceps-1: c0 is loudness, not voice
+        k = np.arange(1, n_ceps)[:, None]
+        self.dct = np.cos(np.pi / n_mels * (np.arange(n_mels) + 0.5) * k).astype(np.float32)
+        # The background follows the last ~background_utterances signatures
+        self.background_utterances = background_utterances
+        self.settle_utterances = settle_utterances
+        self._background: Optional[np.ndarray] = None
+        self._seen = 0
+        self._lock = threading.Lock()
+
+    def embed(self, utterances: Sequence[np.ndarray]) -> np.ndarray:
+        signatures = np.stack([self.signature(samples) for samples in utterances])
+        with self._lock:
+            for signature in signatures:
+                self._seen += 1
+                if self._background is None:
+                    self._background = signature.copy()
+                else:
+                    rate = max(1 / self._seen, 1 / self.background_utterances)
+                    self._background += rate * (signature - self._background)
+        return signatures
+
+    def snapshot(self) -> Optional[np.ndarray]:
+        """The background for a session to freeze, once it has settled"""
+        with self._lock:
+            if self._seen < self.settle_utterances:
+                return None
+            return self._background.copy()
+
+    def center(self, vectors: np.ndarray, background: Optional[np.ndarray] = None) -> np.ndarray:
+        """Unit vectors of signatures (or speaker means) relative to background, or the running one"""
+        if background is None:
+            with self._lock:
+                background = self._background
+        if background is None:
+            return _normalize(vectors)
+        return _normalize(vectors - background)
+
+    def signature(self, samples: np.ndarray) -> np.ndarray:
+        if len(samples) < self.frame:
+            samples = np.pad(samples, (0, self.frame - len(samples)))
+        # Pre-emphasis, as usual for MFCCs
+        samples = np.append(samples[:1], samples[1:] - 0.97 * samples[:-1])
+        frames = np.lib.stride_tricks.sliding_window_view(samples, self.frame)[::self.hop]
+        power = np.abs(np.fft.rfft(frames * self.window, self.n_fft)) ** 2
+        log_mel = np.log(power @ self.filters.T + 1e-8)
+        energy = log_mel.mean(axis=1)
+        # Cepstra of the louder frames only: pauses and breath say little about the voice
+        ceps = log_mel[energy >= np.percentile(energy, 30)] @ self.dct.T
+        return np.concatenate((ceps.mean(axis=0), ceps.std(axis=0)))
+
+
+class XVectorEmbedder:
+    """Speaker embeddings from a local transformers x-vector model on the CPU.
+
+    DIARIZATION_MODEL is a directory with a model that has an audio
+    x-vector head, e.g. microsoft/wavlm-base-plus-sv saved with
+    save_pretrained or `huggingface-cli download --local-dir`; nothing is
+    fetched at runtime. A batch of utterances is padded and embedded in one
+    forward pass. torch and transformers are only imported when the model
+    is loaded, so servers without diarization don't pay for them.
+    """
+
+    name = "xvector"
+    default_threshold = 0.86
+
+    def __init__(self, model_path: str, threads: int = 1):
+        import torch
+        from transformers import AutoFeatureExtractor, AutoModelForAudioXVector
+
+        self._torch = torch
+        # Intra-op work then stays on the (lower priority) calling thread
+        torch.set_num_threads(threads)
+        self.extractor = AutoFeatureExtractor.from_pretrained(model_path, local_files_only=True)
+        self.model = AutoModelForAudioXVector.from_pretrained(model_path, local_files_only=True)
+        self.model.eval()
+
+    @staticmethod
+    def snapshot() -> Optional[np.ndarray]:
+        # Model embeddings need no background
+        return None
+
+    @staticmethod
+    def center(vectors: np.ndarray, background: Optional[np.ndarray] = None) -> np.ndarray:
+        return _normalize(vectors)
+
+    def embed(self, utterances: Sequence[np.ndarray]) -> np.ndarray:
+        inputs = self.extractor(
+            list(utterances),
+            sampling_rate=SAMPLE_RATE,
+            padding=True,
+            return_attention_mask=True,
+            return_tensors="pt"
+        )
+        with self._torch.inference_mode():
+            embeddings = self.model(**inputs).embeddings
+        return _normalize(embeddings.numpy())
+
+
+class SpeakerClusterer:
+    """Online clustering of one session's utterance embeddings into speakers.
+
+    Each speaker is the mean of its embeddings, kept as they were stored
+    and passed through center() (the embedder's) whenever they are
+    compared, together with the utterance. An utterance joins
+    the most similar speaker when the cosine similarity reaches threshold,
+    and starts a new one otherwise, up to max_speakers (after which it
+    joins the most similar anyway). Short utterances make noisy embeddings,
+    so they are only matched against existing speakers (update=False) and
+    neither move a centroid nor start a speaker. Labels are S1, S2, ... in
+    order of appearance.
+    """
+
+    def __init__(
+        self,
+        threshold: float,
+        max_speakers: int,
+        center: Callable[[np.ndarray], np.ndarray] = _normalize
+    ):
+        self.threshold = threshold
+        self.max_speakers = max_speakers
+        self.center = center
+        self.labels: List[str] = []
+        # Per speaker, the sum and count of its embeddings
+        self._sums: Optional[np.ndarray] = None
+        self._counts: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def assign(self, embedding: np.ndarray, update: bool = True) -> Optional[str]:
+        if self._sums is not None and self._sums.shape[1] != len(embedding):
+            # Restored from embeddings of another model: start over
+            self.labels, self._sums, self._counts = [], None, []
+        if self._sums is None:
+            return self._add(embedding) if update else None
+        means = self._sums / np.array(self._counts, dtype=np.float32)[:, None]
+        similarities = self.center(means) @ self.center(embedding[None, :])[0]
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            if not update:
+                return None
+            if len(self.labels) < self.max_speakers:
+                return self._add(embedding)
+        if update:
+            self._sums[best] += embedding
+            self._counts[best] += 1
+        return self.labels[best]
+
+    def _add(self, embedding: np.ndarray, label: Optional[str] = None) -> str:
+        label = label or f"S{len(self.labels) + 1}"
+        row = embedding[None, :].astype(np.float32)
+        self._sums = row if self._sums is None else np.vstack((self._sums, row))
+        self._counts.append(1)
+        self.labels.append(label)
+        return label
+
+    def restore(self, labelled: Iterable[Tuple[str, np.ndarray]]):
+        """Rebuild the speakers from stored (label, embedding) pairs, in order"""
+        for label, embedding in labelled:
+            if self._sums is not None and len(self._sums[0]) != len(embedding):
+                continue
+            if label in self.labels:
+                index = self.labels.index(label)
+                self._sums[index] += embedding
+                self._counts[index] += 1
+            else:
+                self._add(embedding, label)
+
+
+class DiarizationSession:
+    def __init__(
+        self,
+        session_id: str,
+        clusterer: SpeakerClusterer,
+        on_label: LabelCallback,
+        background: Optional[np.ndarray] = None,
+        on_background: Optional[BackgroundCallback] = None
+    ):
+        self.session_id = session_id
+        self.clusterer = clusterer
+        self.on_label = on_label
+        # The frozen spectral background; None follows the embedder's running one
+        self.background = background
+        self.on_background = on_background
+        self.closed = False
+
+
+@dataclass
+class _Job:
+    session: DiarizationSession
+    seq: int
+    samples: np.ndarray
+    submitted_at: float
+
+
+class SpeakerDiarizer:
+    """Labels final segments with speakers, off the realtime decoding path.
+
+    A final result's utterance audio (what the VAD passed to the
+    recognizer) is queued here after the segment has been stored and sent.
+    `workers` dispatchers take up to max_batch queued utterances, across
+    sessions, and embed them on their own thread pool in one call; the
+    threads run at a lower CPU priority (nice DIARIZATION_NICE) so the
+    decoder threads always win the CPU, and the backlog is capped at
+    max_pending utterances, beyond which the oldest go unlabeled rather
+    than let labels fall ever further behind. Clustering runs on the event
+    loop, per session (see SpeakerClusterer), and each label is handed to
+    the session's callback together with the embedding, which is stored
+    with the segment: a session resumed later, here or on another worker,
+    rebuilds its speakers from those instead of recomputing them.
+    """
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        model_path: Optional[str] = None,
+        workers: Optional[int] = None,
+        threshold: Optional[float] = None,
+        max_speakers: Optional[int] = None,
+        min_seconds: Optional[float] = None,
+        max_seconds: Optional[float] = None,
+        max_pending: Optional[int] = None,
+        max_batch: Optional[int] = None,
+        nice: Optional[int] = None
+    ):
+        self.enabled = enabled if enabled is not None else os.getenv("DIARIZATION_ENABLED", "0") == "1"
+        self.model_path = model_path if model_path is not None else os.getenv(
+            "DIARIZATION_MODEL", DEFAULT_MODEL_PATH
+        )
+        self.workers = workers or int(os.getenv("DIARIZATION_WORKERS", "1"))
+        self.max_speakers = max_speakers or int(os.getenv("DIARIZATION_MAX_SPEAKERS", "8"))
+        self.min_seconds = min_seconds if min_seconds is not None else float(
+            os.getenv("DIARIZATION_MIN_SECONDS", "1.0")
+        )
+        # Longer utterances are embedded from their first max_seconds
+        self.max_seconds = max_seconds or float(os.getenv("DIARIZATION_MAX_SECONDS", "10"))
+        self.max_pending = max_pending or int(os.getenv("DIARIZATION_MAX_PENDING", "64"))
+        self.max_batch = max_batch or int(os.getenv("DIARIZATION_MAX_BATCH", "8"))
+        self.nice = nice if nice is not None else int(os.getenv("DIARIZATION_NICE", "10"))
+        embedder = XVectorEmbedder if self._model_available() else SpectralEmbedder
+        self.threshold = threshold if threshold is not None else float(
+            os.getenv("DIARIZATION_THRESHOLD", str(embedder.default_threshold))
+        )
+        self.embedder_name = embedder.name
+        self.embedded = 0
+        self._embedder = None
+        self._load_lock = threading.Lock()
+        self._pending: Deque[_Job] = deque()
+        self._in_flight = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatchers: List[asyncio.Task] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _model_available(self) -> bool:
+        """Whether the x-vector model can be used; explains the fallback when not"""
+        if not self.model_path:
+            return False
+        if not os.path.isdir(self.model_path):
+            missing = f"no model at {self.model_path}"
+        elif importlib.util.find_spec("torch") is None or importlib.util.find_spec("transformers") is None:
+            missing = "torch and transformers are not installed"
+        else:
+            return True
+        if self.enabled:
+            logger.warning(f"Speaker diarization falls back to spectral embeddings: {missing}")
+        return False
+
+    @property
+    def pending(self) -> int:
+        """Utterances queued or being embedded"""
+        return len(self._pending) + self._in_flight
+
+    def open_session(
+        self,
+        session_id: str,
+        on_label: LabelCallback,
+        history: Iterable[Tuple[str, bytes]] = (),
+        background: Optional[bytes] = None,
+        on_background: Optional[BackgroundCallback] = None
+    ) -> DiarizationSession:
+        """Start labeling a session.
+
+        history is its stored (speaker, embedding) pairs and background the
+        background it froze, both from before a resume; on_background is
+        called to store the background when the session freezes one.
+        """
+        clusterer = SpeakerClusterer(self.threshold, self.max_speakers)
+        session = DiarizationSession(
+            session_id, clusterer, on_label,
+            unpack_embedding(background) if background else None, on_background
+        )
+        clusterer.center = lambda vectors: self._load().center(vectors, session.background)
+        clusterer.restore((label, unpack_embedding(blob)) for label, blob in history)
+        return session
+
+    def close_session(self, session: DiarizationSession):
+        # Queued utterances of the session are skipped when their turn comes
+        session.closed = True
+
+    def submit(self, session: DiarizationSession, seq: int, audio: bytes):
+        """Queue a stored segment's utterance audio (16 kHz mono int16) for a label"""
+        if not audio or session.closed:
+            return
+        if self._executor is None:
+            self._start()
+        if len(self._pending) >= self.max_pending:
+            self._pending.popleft()
+            SKIPPED.inc()
+        samples = np.frombuffer(audio, dtype="<i2", count=min(
+            len(audio) // 2, int(self.max_seconds * SAMPLE_RATE)
+        )).astype(np.float32) / 32768.0
+        self._pending.append(_Job(session, seq, samples, time.perf_counter()))
+        self._wakeup.set()
+
+    def _start(self):
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers,
+            thread_name_prefix="diarization",
+            initializer=self._lower_priority
+        )
+        self._wakeup = asyncio.Event()
+        self._dispatchers = [asyncio.create_task(self._dispatch()) for _ in range(self.workers)]
+        logger.info(
+            f"Speaker diarization started with {self.workers} workers, "
+            f"{self.embedder_name} embeddings, threshold {self.threshold}"
+        )
+
+    def _lower_priority(self):
+        try:
+            # Linux applies this to the calling thread when given its own id
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), self.nice)
+        except (AttributeError, OSError) as e:
+            logger.warning(f"Could not lower the priority of a diarization thread: {e}")
+
+    def _load(self):
+        with self._load_lock:
+            if self._embedder is None:
+                started = time.perf_counter()
+                if self.embedder_name == XVectorEmbedder.name:
+                    self._embedder = XVectorEmbedder(self.model_path)
+                else:
+                    self._embedder = SpectralEmbedder()
+                logger.info(
+                    f"Loaded {self.embedder_name} speaker embedder in "
+                    f"{time.perf_counter() - started:.2f}s"
+                )
+        return self._embedder
+
+    def embed(self, utterances: Sequence[np.ndarray]) -> np.ndarray:
+        """Embeddings of a batch of float32 utterances; runs on a worker thread"""
+        embedder = self._load()
+        started = time.perf_counter()
+        embeddings = embedder.embed(utterances)
+        EMBED_SECONDS.observe(time.perf_counter() - started)
+        self.embedded += len(utterances)
+        return embeddings
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            batch = [
+                self._pending.popleft()
+                for _ in range(min(self.max_batch, len(self._pending)))
+            ]
+            batch = [job for job in batch if not job.session.closed]
+            self._in_flight += len(batch)
+            try:
+                await self._label(loop, batch)
+            finally:
+                self._in_flight -= len(batch)
+
+    async def _label(self, loop: asyncio.AbstractEventLoop, batch: List[_Job]):
+        if not batch:
+            return
+        try:
+            embeddings = await loop.run_in_executor(
+                self._executor, self.embed, [job.samples for job in batch]
+            )
+        except Exception as e:
+            logger.error(f"Error computing speaker embeddings: {e}")
+            return
+        for job, embedding in zip(batch, embeddings):
+            if job.session.closed:
+                continue
+            if job.session.background is None:
+                await self._freeze(job.session)
+            speaker = job.session.clusterer.assign(
+                embedding, update=len(job.samples) >= self.min_seconds * SAMPLE_RATE
+            )
+            LABEL_LATENCY.observe(time.perf_counter() - job.submitted_at)
+            try:
+                await job.session.on_label(job.seq, speaker, embedding)
+            except Exception as e:
+                logger.error(f"Error labeling segment {job.seq} of session {job.session.session_id}: {e}")
+
+    async def _freeze(self, session: DiarizationSession):
+        background = self._load().snapshot()
+        if background is None:
+            return
+        packed = pack_embedding(background)
+        # As stored, so a resumed session compares against exactly this
+        session.background = unpack_embedding(packed)
+        if session.on_background is not None:
+            try:
+                await session.on_background(packed)
+            except Exception as e:
+                logger.error(f"Error saving the speaker background of session {session.session_id}: {e}")
+
+    async def close(self):
+        for task in self._dispatchers:
+            task.cancel()
+        self._dispatchers = []
+        self._pending.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
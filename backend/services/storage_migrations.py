@@ -0,0 +1,225 @@
+import sqlite3
+import logging
+from typing import Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def create_session_tables(cursor: sqlite3.Cursor):
+    """Session and segment tables"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY,
+            started_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            ended_at DATETIME
+        )
+    """)
+    # UNIQUE (session_id, seq) doubles as the index for per-session reads
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS segments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+            seq INTEGER NOT NULL,
+            text_offset INTEGER NOT NULL,
+            start_time REAL,
+            end_time REAL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            text TEXT NOT NULL,
+            ai_insights TEXT,
+            ai_questions TEXT,
+            UNIQUE (session_id, seq)
+        )
+    """)
+
+
+def _continues(previous: Optional[str], text: str) -> bool:
+    """Whether text extends previous by whole words ("I can" is not continued by "I cannot")"""
+    if previous is None or not text.startswith(previous):
+        return False
+    return text == previous or previous[-1:].isspace() or text[len(previous):len(previous) + 1].isspace()
+
+
+def migrate_legacy_transcriptions(cursor: sqlite3.Cursor):
+    """Convert the old one-row-per-update `transcriptions` table.
+
+    Each legacy row holds the whole transcript so far, so consecutive
+    rows that extend the previous text become segments of one session
+    and a row that doesn't starts a new session.
+    """
+    cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'transcriptions'"
+    )
+    if not cursor.fetchone():
+        return
+
+    rows = cursor.execute(
+        """
+        SELECT id, timestamp, transcription_text, ai_insights, ai_questions
+        FROM transcriptions ORDER BY id
+        """
+    ).fetchall()
+    previous = None
+    session_id = None
+    seq = offset = 0
+    for row_id, timestamp, text, insights, questions in rows:
+        if _continues(previous, text):
+            segment = text[len(previous):].strip()
+        else:
+            session_id = f"legacy-{row_id}"
+            seq = offset = 0
+            segment = text.strip()
+            cursor.execute(
+                "INSERT INTO sessions (id, started_at, ended_at) VALUES (?, ?, ?)",
+                (session_id, timestamp, timestamp)
+            )
+        previous = text
+        if not segment:
+            continue
+        cursor.execute(
+            """
+            INSERT INTO segments
+            (session_id, seq, text_offset, created_at, text, ai_insights, ai_questions)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (session_id, seq, offset, timestamp, segment, insights, questions)
+        )
+        cursor.execute(
+            "UPDATE sessions SET ended_at = ? WHERE id = ?",
+            (timestamp, session_id)
+        )
+        seq += 1
+        offset += len(segment) + 1
+
+    # Only dropped once its rows are copied, in the same transaction
+    cursor.execute("DROP TABLE transcriptions")
+    logger.info(f"Migrated {len(rows)} legacy transcription rows to sessions/segments")
+
+
+def create_search_index(cursor: sqlite3.Cursor):
+    """FTS5 index over segment text, kept in sync by triggers"""
+    cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'segments_fts'"
+    )
+    if cursor.fetchone():
+        return
+    cursor.execute("""
+        CREATE VIRTUAL TABLE segments_fts USING fts5(
+            text,
+            content='segments',
+            content_rowid='id',
+            prefix='2 3'
+        )
+    """)
+    cursor.execute("""
+        CREATE TRIGGER segments_fts_insert AFTER INSERT ON segments BEGIN
+            INSERT INTO segments_fts (rowid, text) VALUES (new.id, new.text);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER segments_fts_delete AFTER DELETE ON segments BEGIN
+            INSERT INTO segments_fts (segments_fts, rowid, text) VALUES ('delete', old.id, old.text);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER segments_fts_update AFTER UPDATE OF text ON segments BEGIN
+            INSERT INTO segments_fts (segments_fts, rowid, text) VALUES ('delete', old.id, old.text);
+            INSERT INTO segments_fts (rowid, text) VALUES (new.id, new.text);
+        END
+    """)
+    # Index segments stored before the index existed
+    cursor.execute("INSERT INTO segments_fts (segments_fts) VALUES ('rebuild')")
+
+
+def create_read_indexes(cursor: sqlite3.Cursor):
+    """Indexes for the listing endpoints (most recent sessions/segments first)"""
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_sessions_started_at ON sessions (started_at)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_segments_created_at ON segments (created_at)"
+    )
+
+
+def add_session_ownership(cursor: sqlite3.Cursor):
+    """Owning worker and insight state per session, so another worker can resume it"""
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(sessions)")}
+    for name, kind in (("worker", "TEXT"), ("insight_summary", "TEXT"), ("last_full_analysis", "REAL")):
+        if name not in columns:
+            cursor.execute(f"ALTER TABLE sessions ADD COLUMN {name} {kind}")
+
+
+def add_word_timings(cursor: sqlite3.Cursor):
+    """Packed word timings per segment, and an index for time-range reads"""
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(segments)")}
+    if "words" not in columns:
+        cursor.execute("ALTER TABLE segments ADD COLUMN words BLOB")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_segments_session_end_time ON segments (session_id, end_time)"
+    )
+
+
+def add_speaker_labels(cursor: sqlite3.Cursor):
+    """Speaker label of each segment, and the embedding it was clustered from"""
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(segments)")}
+    if "speaker" not in columns:
+        cursor.execute("ALTER TABLE segments ADD COLUMN speaker TEXT")
+    if "speaker_embedding" not in columns:
+        cursor.execute("ALTER TABLE segments ADD COLUMN speaker_embedding BLOB")
+
+
+def add_speaker_background(cursor: sqlite3.Cursor):
+    """Background the session's spectral speaker embeddings are compared against"""
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(sessions)")}
+    if "speaker_background" not in columns:
+        cursor.execute("ALTER TABLE sessions ADD COLUMN speaker_background BLOB")
+
+
+# Append only: MIGRATIONS[n] upgrades a database from user_version n to n + 1.
+# Steps must tolerate databases created before versioning (user_version 0
+# with some of the tables already present), hence IF NOT EXISTS everywhere.
+MIGRATIONS: List[Callable[[sqlite3.Cursor], None]] = [
+    create_session_tables,
+    migrate_legacy_transcriptions,
+    create_search_index,
+    create_read_indexes,
+    add_session_ownership,
+    add_word_timings,
+    add_speaker_labels,
+    add_speaker_background,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> Tuple[int, int]:
+    """Upgrade the schema in place; returns (version before, version after).
+
+    An up-to-date database costs one PRAGMA read. Each step commits together
+    with its version bump, so an interrupted upgrade resumes where it stopped,
+    and BEGIN IMMEDIATE makes concurrent processes apply each step once.
+    The connection must be in autocommit mode (isolation_level=None).
+    """
+    initial = version = schema_version(conn)
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(
+            f"Database schema version {version} is newer than this code supports "
+            f"({SCHEMA_VERSION})"
+        )
+    while version < SCHEMA_VERSION:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have upgraded while we waited for the lock
+            version = schema_version(conn)
+            if version < SCHEMA_VERSION:
+                MIGRATIONS[version](conn.cursor())
+                version += 1
+                conn.execute(f"PRAGMA user_version = {version}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        logger.info(f"Database schema at version {version}")
+    return initial, version
@@ -1,111 +1,562 @@
 import os
+import re
+import sys
 import json
-from datetime import datetime
+import base64
+import time
+import socket
+import asyncio
+from contextlib import asynccontextmanager, closing
 import sqlite3
 from pathlib import Path
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Sequence, Tuple, AsyncIterator
 import aiosqlite
 import logging
+from services.storage_migrations import migrate
+from services.metrics import registry as metrics
+from services.word_timeline import Word, WordTimeline, pack_words, unpack_words
 
 logger = logging.getLogger(__name__)
 
+COMMIT_SECONDS = metrics.histogram(
+    "storage_commit_seconds", "Time to execute and commit one group of writes"
+)
+WRITE_SECONDS = metrics.histogram(
+    "storage_write_seconds", "Time from queueing a write to its commit, by outcome (ok, error)",
+    ["outcome"]
+)
+COMMIT_ROWS = metrics.histogram(
+    "storage_commit_rows", "Writes per group commit", buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500)
+)
+
+# How long a write waits: "batched" returns once queued (group committed
+# within the commit interval), "commit" waits for the group commit and
+# "full" additionally fsyncs every commit (synchronous=FULL)
+DURABILITY_MODES = ("batched", "commit", "full")
+
+
 class StorageService:
-    def __init__(self):
+    """Session/segment transcript storage.
+
+    Every final result is appended as one row of `segments`; the full
+    transcript of a session is reconstructed on read by joining its
+    segments in order.
+
+    The database is opened once in WAL mode: one writer connection drains a
+    write-behind queue and group-commits it every commit_interval_ms or
+    commit_rows writes, and a small pool of read-only connections serves
+    queries concurrently with the writer.
+
+    Several worker processes may share the database. Each session records
+    the worker that owns it (worker_id) and its insight state, so a
+    reconnect that lands on another worker can claim it and continue.
+    """
+
+    def __init__(
+        self,
+        base_dir: str = "transcriptions",
+        durability: Optional[str] = None,
+        commit_interval_ms: Optional[float] = None,
+        commit_rows: Optional[int] = None,
+        readers: Optional[int] = None,
+        worker_id: Optional[str] = None,
+        handoff_timeout: Optional[float] = None
+    ):
         # Create necessary directories
-        self.base_dir = Path("transcriptions")
+        self.base_dir = Path(base_dir)
         self.base_dir.mkdir(exist_ok=True)
-        
+
         # Database setup
         self.db_path = self.base_dir / "transcriptions.db"
-        self._init_database()
-
-    def _init_database(self):
-        """Initialize SQLite database with necessary tables"""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                # Drop existing table if exists
-                cursor.execute("DROP TABLE IF EXISTS transcriptions")
-                
-                # Create new table with updated schema
-                cursor.execute("""
-                    CREATE TABLE transcriptions (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                        transcription_text TEXT NOT NULL,
-                        ai_insights TEXT,
-                        ai_questions TEXT
+        self.durability = durability or os.getenv("STORAGE_DURABILITY", "batched")
+        if self.durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown storage durability: {self.durability}")
+        self.commit_interval = (commit_interval_ms or float(
+            os.getenv("STORAGE_COMMIT_INTERVAL_MS", "50")
+        )) / 1000
+        self.commit_rows = commit_rows or int(os.getenv("STORAGE_COMMIT_ROWS", "200"))
+        self.reader_count = readers or int(os.getenv("STORAGE_READERS", "4"))
+        self.worker_id = worker_id or os.getenv("WORKER_ID") or f"{socket.gethostname()}:{os.getpid()}"
+        # How long a claim waits for the previous owner to end the session
+        self.handoff_timeout = handoff_timeout if handoff_timeout is not None else float(
+            os.getenv("SESSION_HANDOFF_SECONDS", "10")
+        )
+        # Next (seq, text offset) per session, so appends need no aggregate query
+        self._cursors: Dict[str, Tuple[int, int]] = {}
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._readers: Optional[asyncio.Queue] = None
+        self._writes: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._start_lock = asyncio.Lock()
+        self.startup_seconds: Optional[float] = None
+
+    def migrate(self) -> Tuple[int, int]:
+        """Bring the database schema up to date in place (blocking)"""
+        try:
+            # closing() because the sqlite3 context manager only commits, and a
+            # lingering handle blocks journal mode changes by other connections
+            with closing(sqlite3.connect(self.db_path, timeout=30, isolation_level=None)) as conn:
+                # WAL is persistent, so this only does work the first time
+                conn.execute("PRAGMA journal_mode=WAL")
+                before, after = migrate(conn)
+            if before != after:
+                logger.info(f"Database schema upgraded from version {before} to {after}")
+            return before, after
+        except Exception as e:
+            logger.error(f"Error migrating database: {e}")
+            raise
+
+    async def _connect(self, readonly: bool = False) -> aiosqlite.Connection:
+        db = await aiosqlite.connect(self.db_path, isolation_level=None)
+        synchronous = "FULL" if self.durability == "full" else "NORMAL"
+        await db.execute(f"PRAGMA synchronous={synchronous}")
+        await db.execute("PRAGMA busy_timeout=5000")
+        await db.execute("PRAGMA temp_store=MEMORY")
+        await db.execute("PRAGMA cache_size=-16000")  # 16 MB page cache
+        await db.execute("PRAGMA mmap_size=268435456")
+        if readonly:
+            await db.execute("PRAGMA query_only=1")
+        return db
+
+    async def start(self):
+        """Open the long-lived connections and start the writer task"""
+        if self._writer is not None:
+            return
+        async with self._start_lock:
+            if self._writer is not None:
+                return
+            started = time.perf_counter()
+            # Off the event loop: a first-time upgrade of a large database
+            # (legacy conversion, FTS rebuild) can take a while
+            await asyncio.to_thread(self.migrate)
+            self._writer = await self._connect()
+            self._readers = asyncio.Queue()
+            for _ in range(self.reader_count):
+                self._readers.put_nowait(await self._connect(readonly=True))
+            self._writes = asyncio.Queue()
+            self._writer_task = asyncio.create_task(self._write_loop())
+            self.startup_seconds = time.perf_counter() - started
+            logger.info(
+                f"Storage started in {self.startup_seconds * 1000:.0f} ms "
+                f"({self.durability} durability, {self.reader_count} readers)"
+            )
+
+    @property
+    def write_queue_depth(self) -> int:
+        """Writes queued for the next group commit"""
+        return self._writes.qsize() if self._writes is not None else 0
+
+    async def close(self):
+        """Flush pending writes and close all connections"""
+        if self._writer is None:
+            return
+        await self.flush()
+        self._writer_task.cancel()
+        try:
+            await self._writer_task
+        except asyncio.CancelledError:
+            pass
+        await self._writer.close()
+        while not self._readers.empty():
+            await self._readers.get_nowait().close()
+        self._writer = None
+
+    @asynccontextmanager
+    async def _reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        await self.start()
+        db = await self._readers.get()
+        try:
+            yield db
+        finally:
+            self._readers.put_nowait(db)
+
+    async def _write(self, sql: str, params: tuple = (), wait: Optional[bool] = None):
+        """Queue a write for the next group commit.
+
+        Returns the row id once committed when waiting (durability other than
+        "batched", or wait=True); otherwise returns as soon as it is queued.
+        """
+        await self.start()
+        if wait is None:
+            wait = self.durability != "batched"
+        future = asyncio.get_running_loop().create_future()
+        self._writes.put_nowait((sql, params, future, wait, time.perf_counter()))
+        if wait:
+            return await future
+        return None
+
+    async def flush(self):
+        """Wait until every write queued so far is committed"""
+        if self._writer is None:
+            return
+        await self._write("SELECT 1", wait=True)
+
+    async def _write_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._writes.get()]
+            deadline = loop.time() + self.commit_interval
+            while len(batch) < self.commit_rows:
+                # Someone is waiting for this commit: take what is already
+                # queued and go, rather than holding them for the interval
+                if any(wait for _, _, _, wait, _ in batch):
+                    if self._writes.empty():
+                        break
+                    batch.append(self._writes.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._writes.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._commit(batch)
+
+    async def _commit(self, batch):
+        results = []
+        started = time.perf_counter()
+        try:
+            # IMMEDIATE takes the write lock up front; a deferred transaction
+            # that started with a read can't wait for another process's lock
+            await self._writer.execute("BEGIN IMMEDIATE")
+            for sql, params, _, _, _ in batch:
+                # Each write in its own savepoint: one that fails (say a
+                # duplicate segment after a takeover) is undone alone, not
+                # with the other sessions' writes in the group
+                await self._writer.execute("SAVEPOINT write")
+                try:
+                    cursor = await self._writer.execute(sql, params)
+                    results.append(cursor.lastrowid)
+                except sqlite3.Error as e:
+                    await self._writer.execute("ROLLBACK TO write")
+                    results.append(e)
+                await self._writer.execute("RELEASE write")
+            await self._writer.execute("COMMIT")
+        except Exception as e:
+            logger.error(f"Error committing {len(batch)} writes: {e}")
+            try:
+                await self._writer.execute("ROLLBACK")
+            except Exception:
+                pass
+            self._observe(batch, started, ["error"] * len(batch))
+            for _, _, future, _, _ in batch:
+                self._fail(future, e)
+            return
+        failed = [result for result in results if isinstance(result, Exception)]
+        if failed:
+            logger.error(f"{len(failed)} of {len(batch)} writes failed: {failed[0]}")
+        self._observe(batch, started, [
+            "error" if isinstance(result, Exception) else "ok" for result in results
+        ])
+        for (_, _, future, _, _), result in zip(batch, results):
+            if isinstance(result, Exception):
+                self._fail(future, result)
+            elif not future.done():
+                future.set_result(result)
+
+    @staticmethod
+    def _fail(future: asyncio.Future, error: Exception):
+        if not future.done():
+            future.set_exception(error)
+            # Nobody may be waiting on batched writes
+            future.exception()
+
+    @staticmethod
+    def _observe(batch, started: float, outcomes: List[str]):
+        now = time.perf_counter()
+        COMMIT_SECONDS.observe(now - started)
+        COMMIT_ROWS.observe(len(batch))
+        for (_, _, _, _, queued_at), outcome in zip(batch, outcomes):
+            WRITE_SECONDS.observe(now - queued_at, outcome=outcome)
+
+    async def create_session(self, session_id: str) -> str:
+        """Register a new transcription session"""
+        try:
+            await self._write(
+                "INSERT OR IGNORE INTO sessions (id, worker) VALUES (?, ?)",
+                (session_id, self.worker_id)
+            )
+            return session_id
+        except Exception as e:
+            logger.error(f"Error creating session: {e}")
+            raise
+
+    async def end_session(self, session_id: str):
+        """Mark a session as finished and flush its pending writes"""
+        try:
+            # Unless another worker has claimed it in the meantime
+            await self._write(
+                """
+                UPDATE sessions SET ended_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND (worker IS NULL OR worker = ?)
+                """,
+                (session_id, self.worker_id),
+                wait=True
+            )
+            self._cursors.pop(session_id, None)
+        except Exception as e:
+            logger.error(f"Error ending session: {e}")
+            raise
+
+    async def claim_session(self, session_id: str, tail: int = 200) -> Optional[Dict[str, Any]]:
+        """Make this worker the owner of an existing session, to resume it.
+
+        While another worker still has the session open, waits up to
+        handoff_timeout for it to end (its last results are still being
+        stored); after that the other worker is presumed gone. Returns the
+        last `tail` segments with the offset of the first, the segment
+        count, the insight state and the speaker background, or None for an
+        unknown session. Older segments stay in the database (see
+        get_transcript_range).
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.handoff_timeout
+        try:
+            while True:
+                async with self._reader() as db:
+                    cursor = await db.execute(
+                        "SELECT worker, ended_at FROM sessions WHERE id = ?",
+                        (session_id,)
                     )
-                """)
-                conn.commit()
-                logger.info("Database initialized successfully")
+                    row = await cursor.fetchone()
+                if row is None:
+                    return None
+                owner, ended_at = row
+                if ended_at is not None or owner in (None, self.worker_id) or loop.time() >= deadline:
+                    break
+                await asyncio.sleep(0.1)
+            if ended_at is None and owner not in (None, self.worker_id):
+                logger.warning(f"Taking over session {session_id} from unresponsive worker {owner}")
+
+            await self._write(
+                "UPDATE sessions SET worker = ?, ended_at = NULL WHERE id = ?",
+                (self.worker_id, session_id),
+                wait=True
+            )
+            # The previous owner appended segments this process hasn't seen
+            self._cursors.pop(session_id, None)
+            async with self._reader() as db:
+                cursor = await db.execute(
+                    "SELECT insight_summary, last_full_analysis, speaker_background FROM sessions WHERE id = ?",
+                    (session_id,)
+                )
+                summary, last_full_analysis, speaker_background = await cursor.fetchone()
+                cursor = await db.execute(
+                    """
+                    SELECT seq, text_offset, text, end_time FROM segments
+                    WHERE session_id = ? ORDER BY seq DESC LIMIT ?
+                    """,
+                    (session_id, tail)
+                )
+                segments = list(reversed(await cursor.fetchall()))
+            return {
+                "id": session_id,
+                "previous_worker": owner,
+                "segments": [text for _, _, text, _ in segments],
+                "segment_count": segments[-1][0] + 1 if segments else 0,
+                "base": segments[0][1] if segments else 0,
+                "audio_end": next((end for _, _, _, end in reversed(segments) if end is not None), None),
+                "insight_summary": summary or "",
+                "last_full_analysis": last_full_analysis,
+                "speaker_background": speaker_background
+            }
         except Exception as e:
-            logger.error(f"Error initializing database: {e}")
+            logger.error(f"Error claiming session: {e}")
             raise
 
-    async def save_transcription(
-        self,
-        transcription_text: str,
-        ai_insights: Optional[List[str]] = None,
-        ai_questions: Optional[List[str]] = None
-    ) -> int:
-        """Save transcription with AI insights to database"""
+    async def get_transcript_range(self, session_id: str, start: int, end: int) -> Tuple[int, List[str]]:
+        """Segments start..end-1 of a session and the offset where the text after segment start-1 begins"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                cursor = await db.cursor()
-                await cursor.execute(
+            # Segments spilled from memory may still be in the write queue
+            await self.flush()
+            async with self._reader() as db:
+                cursor = await db.execute(
                     """
-                    INSERT INTO transcriptions 
-                    (transcription_text, ai_insights, ai_questions)
-                    VALUES (?, ?, ?)
+                    SELECT text_offset, text FROM segments
+                    WHERE session_id = ? AND seq >= ? AND seq < ? ORDER BY seq
                     """,
-                    (
-                        transcription_text,
-                        json.dumps(ai_insights) if ai_insights else None,
-                        json.dumps(ai_questions) if ai_questions else None
-                    )
+                    (session_id, start, end)
                 )
-                await db.commit()
-                return cursor.lastrowid
+                rows = await cursor.fetchall()
+            # The offset is before the space that separates the segments
+            offset = rows[0][0] - 1 if rows and start > 0 else 0
+            return offset, [text for _, text in rows]
         except Exception as e:
-            logger.error(f"Error saving transcription: {e}")
+            logger.error(f"Error retrieving transcript range: {e}")
             raise
 
-    async def get_transcription(self, transcription_id: int) -> Dict[str, Any]:
-        """Retrieve a specific transcription by ID"""
+    async def save_insight_state(self, session_id: str, summary: str, last_full_analysis: float):
+        """Keep the session's rolling summary where a resuming worker finds it"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            await self._write(
+                "UPDATE sessions SET insight_summary = ?, last_full_analysis = ? WHERE id = ?",
+                (summary, last_full_analysis, session_id)
+            )
+        except Exception as e:
+            logger.error(f"Error saving insight state: {e}")
+            raise
+
+    async def _next_position(self, session_id: str) -> Tuple[int, int]:
+        if session_id not in self._cursors:
+            # Only needed once per session (e.g. after a restart)
+            await self.flush()
+            async with self._reader() as db:
                 cursor = await db.execute(
-                    "SELECT * FROM transcriptions WHERE id = ?",
-                    (transcription_id,)
+                    """
+                    SELECT seq + 1, text_offset + LENGTH(text) + 1 FROM segments
+                    WHERE session_id = ? ORDER BY seq DESC LIMIT 1
+                    """,
+                    (session_id,)
                 )
                 row = await cursor.fetchone()
-                if row:
-                    id, timestamp, text, insights, questions = row
-                    return {
-                        "id": id,
-                        "timestamp": timestamp,
-                        "transcription_text": text,
-                        "ai_insights": json.loads(insights) if insights else [],
-                        "ai_questions": json.loads(questions) if questions else []
-                    }
-                return None
+            self._cursors[session_id] = tuple(row) if row else (0, 0)
+        return self._cursors[session_id]
+
+    async def append_segment(
+        self,
+        session_id: str,
+        text: str,
+        start_time: Optional[float] = None,
+        end_time: Optional[float] = None,
+        ai_insights: Optional[List[str]] = None,
+        ai_questions: Optional[List[str]] = None,
+        words: Optional[Sequence[Word]] = None
+    ) -> int:
+        """Append one final result to a session's transcript.
+
+        Returns the segment's sequence number within the session, which is
+        known before the write is committed. Word timings, if any, are
+        stored packed (see word_timeline.pack_words).
+        """
+        try:
+            seq, offset = await self._next_position(session_id)
+            self._cursors[session_id] = (seq + 1, offset + len(text) + 1)
+            await self._write(
+                """
+                INSERT INTO segments
+                (session_id, seq, text_offset, start_time, end_time, text, ai_insights, ai_questions, words)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    session_id,
+                    seq,
+                    offset,
+                    start_time,
+                    end_time,
+                    text,
+                    json.dumps(ai_insights) if ai_insights else None,
+                    json.dumps(ai_questions) if ai_questions else None,
+                    pack_words(words)
+                )
+            )
+            return seq
         except Exception as e:
-            logger.error(f"Error retrieving transcription: {e}")
+            logger.error(f"Error saving segment: {e}")
             raise
 
-    async def get_all_transcriptions(
+    async def set_segment_insights(
+        self,
+        session_id: str,
+        seq: int,
+        ai_insights: Optional[List[str]] = None,
+        ai_questions: Optional[List[str]] = None
+    ):
+        """Attach AI insights to an already stored segment"""
+        try:
+            await self._write(
+                """
+                UPDATE segments SET ai_insights = ?, ai_questions = ?
+                WHERE session_id = ? AND seq = ?
+                """,
+                (
+                    json.dumps(ai_insights) if ai_insights else None,
+                    json.dumps(ai_questions) if ai_questions else None,
+                    session_id,
+                    seq
+                )
+            )
+        except Exception as e:
+            logger.error(f"Error saving segment insights: {e}")
+            raise
+
+    async def set_segment_speaker(
+        self,
+        session_id: str,
+        seq: int,
+        speaker: Optional[str],
+        embedding: Optional[bytes] = None
+    ):
+        """Attach a speaker label, and the embedding behind it, to a stored segment"""
+        try:
+            await self._write(
+                "UPDATE segments SET speaker = ?, speaker_embedding = ? WHERE session_id = ? AND seq = ?",
+                (speaker, embedding, session_id, seq)
+            )
+        except Exception as e:
+            logger.error(f"Error saving segment speaker: {e}")
+            raise
+
+    async def save_speaker_background(self, session_id: str, background: bytes):
+        """Keep the background the session's speakers are compared against, for a resuming worker"""
+        try:
+            await self._write(
+                "UPDATE sessions SET speaker_background = ? WHERE id = ?",
+                (background, session_id)
+            )
+        except Exception as e:
+            logger.error(f"Error saving speaker background: {e}")
+            raise
+
+    async def get_speaker_embeddings(self, session_id: str, limit: int = 1000) -> List[Tuple[str, bytes]]:
+        """The last `limit` labeled segments' (speaker, embedding), oldest first"""
+        try:
+            await self.flush()
+            async with self._reader() as db:
+                cursor = await db.execute(
+                    """
+                    SELECT speaker, speaker_embedding FROM segments
+                    WHERE session_id = ? AND speaker IS NOT NULL AND speaker_embedding IS NOT NULL
+                    ORDER BY seq DESC LIMIT ?
+                    """,
+                    (session_id, limit)
+                )
+                return list(reversed(await cursor.fetchall()))
+        except Exception as e:
+            logger.error(f"Error retrieving speaker embeddings: {e}")
+            raise
+
+    @staticmethod
+    def _segment_row(row) -> Dict[str, Any]:
+        id, session_id, seq, text_offset, start_time, end_time, created_at, text, insights, questions, speaker = row
+        return {
+            "id": id,
+            "session_id": session_id,
+            "seq": seq,
+            "text_offset": text_offset,
+            "start_time": start_time,
+            "end_time": end_time,
+            "created_at": created_at,
+            "text": text,
+            "ai_insights": json.loads(insights) if insights else [],
+            "ai_questions": json.loads(questions) if questions else [],
+            "speaker": speaker
+        }
+
+    async def get_sessions(
         self,
         limit: int = 100,
         offset: int = 0
     ) -> List[Dict[str, Any]]:
-        """Retrieve all transcriptions with pagination"""
+        """List sessions, most recent first"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._reader() as db:
                 cursor = await db.execute(
                     """
-                    SELECT * FROM transcriptions 
-                    ORDER BY timestamp DESC 
+                    SELECT s.id, s.started_at, s.ended_at,
+                        (SELECT COUNT(*) FROM segments g WHERE g.session_id = s.id)
+                    FROM sessions s
+                    ORDER BY s.started_at DESC
                     LIMIT ? OFFSET ?
                     """,
                     (limit, offset)
@@ -114,60 +565,281 @@ class StorageService:
                 return [
                     {
                         "id": row[0],
-                        "timestamp": row[1],
-                        "transcription_text": row[2],
-                        "ai_insights": json.loads(row[3]) if row[3] else [],
-                        "ai_questions": json.loads(row[4]) if row[4] else []
+                        "started_at": row[1],
+                        "ended_at": row[2],
+                        "segment_count": row[3]
                     }
                     for row in rows
                 ]
         except Exception as e:
-            logger.error(f"Error retrieving transcriptions: {e}")
+            logger.error(f"Error retrieving sessions: {e}")
             raise
 
-    async def delete_transcription(self, transcription_id: int) -> bool:
-        """Delete a specific transcription by ID"""
+    async def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Retrieve a session with its transcript reconstructed from segments"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute(
-                    "DELETE FROM transcriptions WHERE id = ?",
-                    (transcription_id,)
+            async with self._reader() as db:
+                cursor = await db.execute(
+                    "SELECT id, started_at, ended_at FROM sessions WHERE id = ?",
+                    (session_id,)
                 )
-                await db.commit()
-                return True
+                session = await cursor.fetchone()
+                if not session:
+                    return None
+                cursor = await db.execute(
+                    """
+                    SELECT text, ai_insights, ai_questions FROM segments
+                    WHERE session_id = ? ORDER BY seq
+                    """,
+                    (session_id,)
+                )
+                rows = await cursor.fetchall()
+                # The latest segment with insights carries the current ones
+                insights = questions = None
+                for _, segment_insights, segment_questions in rows:
+                    if segment_insights or segment_questions:
+                        insights, questions = segment_insights, segment_questions
+                return {
+                    "id": session[0],
+                    "started_at": session[1],
+                    "ended_at": session[2],
+                    "segment_count": len(rows),
+                    "transcription_text": " ".join(row[0] for row in rows),
+                    "ai_insights": json.loads(insights) if insights else [],
+                    "ai_questions": json.loads(questions) if questions else []
+                }
         except Exception as e:
-            logger.error(f"Error deleting transcription: {e}")
+            logger.error(f"Error retrieving session: {e}")
             raise
 
-    async def search_transcriptions(
+    async def get_segments(
         self,
-        query: str,
+        session_id: str,
         limit: int = 100,
         offset: int = 0
     ) -> List[Dict[str, Any]]:
-        """Search transcriptions by text content"""
+        """Retrieve a session's segments in transcript order"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._reader() as db:
                 cursor = await db.execute(
                     """
-                    SELECT * FROM transcriptions 
-                    WHERE transcription_text LIKE ? 
-                    ORDER BY timestamp DESC 
+                    SELECT id, session_id, seq, text_offset, start_time, end_time,
+                           created_at, text, ai_insights, ai_questions, speaker
+                    FROM segments WHERE session_id = ?
+                    ORDER BY seq
                     LIMIT ? OFFSET ?
                     """,
-                    (f"%{query}%", limit, offset)
+                    (session_id, limit, offset)
                 )
                 rows = await cursor.fetchall()
-                return [
-                    {
-                        "id": row[0],
-                        "timestamp": row[1],
-                        "transcription_text": row[2],
-                        "ai_insights": json.loads(row[3]) if row[3] else [],
-                        "ai_questions": json.loads(row[4]) if row[4] else []
-                    }
-                    for row in rows
-                ]
+                return [self._segment_row(row) for row in rows]
+        except Exception as e:
+            logger.error(f"Error retrieving segments: {e}")
+            raise
+
+    async def get_words(self, session_id: str, start: float, end: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Words of a session overlapping [start, end) seconds, from the stored segments"""
+        try:
+            await self.flush()
+            async with self._reader() as db:
+                cursor = await db.execute(
+                    """
+                    SELECT seq, text, words FROM segments
+                    WHERE session_id = ? AND end_time > ? AND start_time < ? AND words IS NOT NULL
+                    ORDER BY seq
+                    """,
+                    (session_id, start, end if end is not None else float("inf"))
+                )
+                rows = await cursor.fetchall()
+            timeline = WordTimeline(max_words=sys.maxsize)
+            for seq, text, words in rows:
+                timeline.append(seq, unpack_words(text, words))
+            return timeline.range(start, end)
+        except Exception as e:
+            logger.error(f"Error retrieving words: {e}")
+            raise
+
+    async def session_exists(self, session_id: str) -> bool:
+        async with self._reader() as db:
+            cursor = await db.execute("SELECT 1 FROM sessions WHERE id = ?", (session_id,))
+            return await cursor.fetchone() is not None
+
+    async def iter_segments(
+        self,
+        session_id: Optional[str] = None,
+        batch_size: int = 1000
+    ) -> AsyncIterator[List[Tuple]]:
+        """Stored segments in transcript order, a batch of rows at a time, for exports.
+
+        One query over the (session_id, seq) index read with fetchmany, so
+        memory stays at one batch however large the history is, and WAL
+        gives the whole export one consistent snapshot. It runs on its own
+        connection rather than a pooled reader, which a long export would
+        keep from the other requests. Rows are (session_id, seq, start_time,
+        end_time, text, ai_insights, ai_questions, speaker), insights as
+        stored JSON.
+        """
+        await self.start()
+        await self.flush()
+        db = await self._connect(readonly=True)
+        try:
+            where = "WHERE session_id = ?" if session_id is not None else ""
+            cursor = await db.execute(
+                f"""
+                SELECT session_id, seq, start_time, end_time, text, ai_insights, ai_questions, speaker
+                FROM segments {where}
+                ORDER BY session_id, seq
+                """,
+                (session_id,) if session_id is not None else ()
+            )
+            while True:
+                rows = await cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            await db.close()
+
+    async def delete_session(self, session_id: str) -> bool:
+        """Delete a session and its segments"""
+        try:
+            await self._write("DELETE FROM segments WHERE session_id = ?", (session_id,))
+            await self._write("DELETE FROM sessions WHERE id = ?", (session_id,), wait=True)
+            self._cursors.pop(session_id, None)
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting session: {e}")
+            raise
+
+    async def get_all_transcriptions(
+        self,
+        limit: int = 100,
+        offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        """Retrieve session transcripts in the legacy transcription shape.
+
+        One query for the whole page: the page of sessions joined with their
+        segments, read in transcript order.
+        """
+        try:
+            transcriptions: Dict[str, Dict[str, Any]] = {}
+            async with self._reader() as db:
+                cursor = await db.execute(
+                    """
+                    SELECT s.id, s.started_at, g.text, g.ai_insights, g.ai_questions
+                    FROM (
+                        SELECT id, started_at FROM sessions
+                        ORDER BY started_at DESC
+                        LIMIT ? OFFSET ?
+                    ) s
+                    LEFT JOIN segments g ON g.session_id = s.id
+                    ORDER BY s.started_at DESC, s.id, g.seq
+                    """,
+                    (limit, offset)
+                )
+                async for session_id, started_at, text, insights, questions in cursor:
+                    transcription = transcriptions.get(session_id)
+                    if transcription is None:
+                        transcription = transcriptions[session_id] = {
+                            "id": session_id,
+                            "timestamp": started_at,
+                            "transcription_text": [],
+                            "ai_insights": None,
+                            "ai_questions": None
+                        }
+                    if text is not None:
+                        transcription["transcription_text"].append(text)
+                    # The latest segment with insights carries the current ones
+                    if insights or questions:
+                        transcription["ai_insights"], transcription["ai_questions"] = insights, questions
+            for transcription in transcriptions.values():
+                transcription["transcription_text"] = " ".join(transcription["transcription_text"])
+                for key in ("ai_insights", "ai_questions"):
+                    transcription[key] = json.loads(transcription[key]) if transcription[key] else []
+            return list(transcriptions.values())
+        except Exception as e:
+            logger.error(f"Error retrieving transcriptions: {e}")
+            raise
+
+    async def search_transcriptions(
+        self,
+        query: str,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        session_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Full-text search over segments, best matches first.
+
+        Results are ranked by bm25 and carry a highlighted snippet. Pages are
+        fetched with the opaque `next_cursor` of the previous page (keyset on
+        rank and id) instead of an offset.
+        """
+        match = build_match_query(query)
+        if not match:
+            return {"results": [], "next_cursor": None}
+        after_rank, after_id = decode_search_cursor(cursor) if cursor else (float("-inf"), 0)
+        sql = """
+            SELECT s.id, s.session_id, s.seq, s.text_offset, s.start_time, s.end_time,
+                   s.created_at, s.text, s.ai_insights, s.ai_questions, s.speaker,
+                   snippet(segments_fts, 0, '<mark>', '</mark>', '…', 16),
+                   segments_fts.rank
+            FROM segments_fts JOIN segments s ON s.id = segments_fts.rowid
+            WHERE segments_fts MATCH ?
+              AND (segments_fts.rank > ? OR (segments_fts.rank = ? AND s.id > ?))
+        """
+        params = [match, after_rank, after_rank, after_id]
+        if session_id is not None:
+            sql += " AND s.session_id = ?"
+            params.append(session_id)
+        sql += " ORDER BY segments_fts.rank, s.id LIMIT ?"
+        params.append(limit)
+        try:
+            async with self._reader() as db:
+                rows = await (await db.execute(sql, params)).fetchall()
         except Exception as e:
             logger.error(f"Error searching transcriptions: {e}")
             raise
+        results = []
+        for row in rows:
+            result = self._segment_row(row[:11])
+            result["snippet"] = row[11]
+            result["score"] = -row[12]  # bm25 is lower-is-better; expose higher-is-better
+            results.append(result)
+        next_cursor = None
+        if len(rows) == limit:
+            next_cursor = encode_search_cursor(rows[-1][12], rows[-1][0])
+        return {"results": results, "next_cursor": next_cursor}
+
+
+_QUERY_TOKEN = re.compile(r'"([^"]*)"?|(\S+)')
+_WORD = re.compile(r"\w+")
+
+
+def build_match_query(query: str) -> str:
+    """Turn a user query into an FTS5 MATCH expression.
+
+    "quoted words" match as a phrase, a trailing * makes a prefix query and
+    every other word must appear. FTS5 operators and punctuation in the
+    input are treated as plain text, so user input can't cause syntax errors.
+    """
+    terms = []
+    for phrase, word in _QUERY_TOKEN.findall(query):
+        prefix = word.endswith("*")
+        tokens = _WORD.findall(phrase or word)
+        if not tokens:
+            continue
+        term = '"' + " ".join(tokens) + '"'
+        terms.append(term + "*" if prefix else term)
+    return " ".join(terms)
+
+
+def encode_search_cursor(rank: float, segment_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{rank!r}:{segment_id}".encode()).decode()
+
+
+def decode_search_cursor(cursor: str) -> Tuple[float, int]:
+    try:
+        rank, segment_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+        return float(rank), int(segment_id)
+    except Exception:
+        raise ValueError("Invalid search cursor")
@@ -0,0 +1,101 @@
+import json
+from typing import AsyncIterator, Iterable, Optional, Tuple
+
+# session_id, seq, start_time, end_time, text, ai_insights, ai_questions,
+# speaker; insights stay the JSON text they are stored as
+ExportRow = Tuple[
+    str, int, Optional[float], Optional[float], str, Optional[str], Optional[str], Optional[str]
+]
+
+# Format -> media type
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "srt": "application/x-subrip",
+    "vtt": "text/vtt",
+    "txt": "text/plain; charset=utf-8",
+}
+# Cue times restart with every session, so subtitles are per session
+SUBTITLE_FORMATS = ("srt", "vtt")
+
+
+def format_timestamp(seconds: float, separator: str = ",") -> str:
+    """HH:MM:SS,mmm (SRT) or HH:MM:SS.mmm (WebVTT)"""
+    millis = max(0, round(seconds * 1000))
+    hours, millis = divmod(millis, 3_600_000)
+    minutes, millis = divmod(millis, 60_000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{millis:03d}"
+
+
+def _ndjson(rows: Iterable[ExportRow]) -> str:
+    # Stored insights are already JSON; they are spliced in, not re-encoded
+    return "".join(
+        f'{{"session_id":{json.dumps(session_id)},"seq":{seq},'
+        f'"start_time":{json.dumps(start)},"end_time":{json.dumps(end)},'
+        f'"text":{json.dumps(text)},"ai_insights":{insights or "[]"},'
+        f'"ai_questions":{questions or "[]"},"speaker":{json.dumps(speaker)}}}\n'
+        for session_id, seq, start, end, text, insights, questions, speaker in rows
+    )
+
+
+class TranscriptExporter:
+    """Renders stored segments as NDJSON, SRT, WebVTT or plain text.
+
+    Fed one batch of rows at a time from a storage cursor, so a response
+    of any size holds only a batch in memory. Subtitle cues come from the
+    segment timings; segments stored without them (converted legacy
+    transcripts) have no cue; WebVTT cues of diarized segments name their
+    speaker in a voice tag. Plain text is a line per segment, with a blank
+    line between sessions.
+    """
+
+    def __init__(self, export_format: str):
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {export_format} (one of {', '.join(EXPORT_FORMATS)})")
+        self.format = export_format
+        self.media_type = EXPORT_FORMATS[export_format]
+        self._cues = 0
+        self._session: Optional[str] = None
+
+    def header(self) -> str:
+        return "WEBVTT\n\n" if self.format == "vtt" else ""
+
+    def render(self, rows: Iterable[ExportRow]) -> str:
+        if self.format == "ndjson":
+            return _ndjson(rows)
+        if self.format == "txt":
+            return self._text(rows)
+        return self._subtitles(rows)
+
+    def _text(self, rows: Iterable[ExportRow]) -> str:
+        lines = []
+        for session_id, _seq, _start, _end, text, _insights, _questions, _speaker in rows:
+            if session_id != self._session:
+                if self._session is not None:
+                    lines.append("")
+                self._session = session_id
+            lines.append(text)
+        return "".join(line + "\n" for line in lines)
+
+    def _subtitles(self, rows: Iterable[ExportRow]) -> str:
+        separator = "," if self.format == "srt" else "."
+        cues = []
+        for _session_id, _seq, start, end, text, _insights, _questions, speaker in rows:
+            if start is None or end is None:
+                continue
+            self._cues += 1
+            timing = f"{format_timestamp(start, separator)} --> {format_timestamp(end, separator)}"
+            if speaker and self.format == "vtt":
+                text = f"<v {speaker}>{text}"
+            cues.append(f"{self._cues}\n{timing}\n{text}\n\n")
+        return "".join(cues)
+
+    async def stream(self, batches: AsyncIterator[Iterable[ExportRow]]) -> AsyncIterator[bytes]:
+        """The response body: one chunk per batch of rows"""
+        header = self.header()
+        if header:
+            yield header.encode()
+        async for rows in batches:
+            chunk = self.render(rows)
+            if chunk:
+                yield chunk.encode()
@@ -0,0 +1,262 @@
+import os
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+
+def common_prefix_length(a: str, b: str, start: int = 0) -> int:
+    """Length of the common prefix of a and b, known to be at least start"""
+    end = min(len(a), len(b))
+    if a[start:end] == b[start:end]:
+        return end
+    # Binary search on slice equality keeps the comparisons in C
+    low, high = start, end
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[low:mid] == b[low:mid]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+class TranscriptStream:
+    """What a client has been sent of a session's transcript.
+
+    The client shows the committed (final) text followed by the current
+    partial. Each change is sent either as the whole text (legacy clients)
+    or, once negotiated, as a numbered delta that replaces everything from
+    a character offset on:
+
+        {"type": "delta", "seq": 12, "offset": 1834, "text": "...", "final": false, "audio_end": 73.2}
+
+    Partials that didn't change are dropped, and changed partials are sent
+    at most every min_partial_interval seconds; the latest one is held and
+    flushed when the interval is up. Finals always go out immediately.
+    A client that misses a sequence number asks for a snapshot. Offsets
+    count characters; recognizer output stays within the BMP, where that
+    matches JavaScript string indices. audio_end is how many seconds of
+    the session's audio the text accounts for, so clients can measure
+    end-to-end latency.
+
+    Changes only mark the stream dirty; message() builds the message when
+    it is actually sent, so any number of changes queued behind a slow
+    client collapse into one delta. Times are passed in (loop.time()) so
+    the class has no clock of its own.
+
+    With deltas only the last max_segments final segments are kept; older
+    ones, already stored, are spilled once they have been sent. committed
+    and sent then hold the text from character `base` on, and offsets in
+    messages stay absolute. Final deltas and snapshots carry the number of
+    segments they include, which a client passes back to resync or resume
+    from there. Full-text clients keep everything, since every update
+    repeats it.
+    """
+
+    def __init__(
+        self,
+        min_partial_interval: Optional[float] = None,
+        deltas: bool = False,
+        max_segments: Optional[int] = None
+    ):
+        self.min_partial_interval = min_partial_interval if min_partial_interval is not None else float(
+            os.getenv("PARTIAL_MIN_INTERVAL_MS", "200")
+        ) / 1000
+        self.deltas = deltas
+        self.max_segments = max_segments or int(os.getenv("TRANSCRIPT_MEMORY_SEGMENTS", "200"))
+        self.committed = ""
+        self.partial = ""
+        self.seq = 0
+        # The text the client has after applying everything sent so far
+        self.sent = ""
+        # Characters and segments spilled from the front of committed/sent
+        self.base = 0
+        self.segment_count = 0
+        # Lengths of the segments still in committed
+        self._lengths: Deque[int] = deque()
+        # Snapshots waiting for stored text; spilling waits for them
+        self._pinned = 0
+        self.partials_dropped = 0
+        self.audio_end: Optional[float] = None
+        self._pending = False
+        self._last_partial_at = float("-inf")
+        # Length of the text known unchanged since the last message, or
+        # None when there is nothing to send
+        self._stable: Optional[int] = None
+        self._final = False
+
+    @property
+    def text(self) -> str:
+        if not self.partial:
+            return self.committed
+        return f"{self.committed} {self.partial}" if self.committed else self.partial
+
+    @property
+    def spilled(self) -> int:
+        """Segments no longer held in memory"""
+        return self.segment_count - len(self._lengths)
+
+    def restore(self, segments: List[str], count: int, base: int, audio_end: Optional[float] = None):
+        """Continue a stored session from its last segments (count in all, the first at offset base)"""
+        self.committed = self.sent = " ".join(segments)
+        self._lengths = deque(len(text) for text in segments)
+        self.segment_count = count
+        self.base = base
+        self._advance(audio_end)
+
+    def unspill(self, segments: List[str]):
+        """Take back the spilled segments (from storage), for a full-text client"""
+        if not segments:
+            return
+        prefix = " ".join(segments) + " "
+        self.committed = prefix + self.committed
+        self.sent = prefix + self.sent
+        self._lengths.extendleft(len(text) for text in reversed(segments))
+        self.base = 0
+
+    def commit(self, text: str, audio_end: Optional[float] = None) -> bool:
+        """A final result: append it and drop the partial it replaces"""
+        self._advance(audio_end)
+        self._mark(len(self.committed))
+        self._final = True
+        self.committed = f"{self.committed} {text}" if self.committed else text
+        self._lengths.append(len(text))
+        self.segment_count += 1
+        self.partial = ""
+        self._pending = False
+        return True
+
+    def update_partial(self, text: str, now: float, audio_end: Optional[float] = None) -> bool:
+        """A partial result; True if a message should be sent now"""
+        self._advance(audio_end)
+        if text == self.partial:
+            self.partials_dropped += 1
+            return False
+        self.partial = text
+        if now - self._last_partial_at < self.min_partial_interval:
+            # Superseded by the next partial or released by flush()
+            self._pending = True
+            return False
+        return self._release_partial(now)
+
+    def flush_delay(self, now: float) -> Optional[float]:
+        """Seconds until a held partial is due, or None if nothing is held"""
+        if not self._pending:
+            return None
+        return max(0.0, self._last_partial_at + self.min_partial_interval - now)
+
+    def flush(self, now: float) -> bool:
+        """Release the held partial once its interval is up"""
+        if not self._pending or self.flush_delay(now) > 0:
+            return False
+        return self._release_partial(now)
+
+    def _release_partial(self, now: float) -> bool:
+        self._pending = False
+        self._last_partial_at = now
+        self._mark(len(self.committed))
+        return True
+
+    def _advance(self, audio_end: Optional[float]):
+        if audio_end is not None:
+            self.audio_end = audio_end
+
+    def _mark(self, stable: int):
+        self._stable = stable if self._stable is None else min(self._stable, stable)
+
+    def pin(self):
+        """Hold spilling until the snapshot() being prepared is built"""
+        self._pinned += 1
+
+    def unpin(self):
+        self._pinned = max(0, self._pinned - 1)
+
+    def drop_pending_snapshots(self):
+        """A new connection: snapshots queued for the old one will never be built"""
+        self._pinned = 0
+
+    def replay_offset(self, from_segment: int) -> Optional[int]:
+        """Where text after from_segment segments starts; None if they are spilled"""
+        if from_segment <= 0:
+            return 0
+        if from_segment < self.spilled:
+            return None
+        in_memory = from_segment - self.spilled
+        # Each segment is followed by a space; the offset is before it
+        return self.base + sum(self._lengths[i] + 1 for i in range(in_memory)) - 1
+
+    def snapshot(self, from_segment: int = 0, stored: Optional[Tuple[int, List[str]]] = None) -> Dict:
+        """Bring a client that has the first from_segment segments up to date.
+
+        Sent on connect, resume and resync: the client keeps its first
+        `offset` characters and replaces the rest with `text`. Spilled
+        segments it lacks come from storage as stored = (offset, segments
+        from_segment up to spilled). Call pin() first, so that nothing more
+        is spilled until it is built.
+        """
+        self.unpin()
+        text = self.text
+        if stored is not None:
+            offset, segments = stored
+            separator = " " if offset else ""
+            text = separator + " ".join(segments) + " " + text
+        else:
+            offset = self.replay_offset(min(from_segment, self.segment_count))
+            # Right after the last spilled segment, before its space
+            text = text[offset - self.base:] if offset >= self.base else " " + text
+        # The client has everything now; pending changes are included
+        self.sent = self.text
+        self._stable = None
+        self._final = False
+        self._pending = False
+        message = {
+            "type": "snapshot",
+            "seq": self.seq,
+            "offset": offset,
+            "text": text,
+            "segments": self.segment_count
+        }
+        self._spill()
+        return message
+
+    def _spill(self):
+        """Drop sent segments beyond max_segments from the front"""
+        if not self.deltas or self._pinned:
+            return
+        while len(self._lengths) > self.max_segments:
+            length = self._lengths.popleft() + 1
+            self.committed = self.committed[length:]
+            self.sent = self.sent[length:]
+            self.base += length
+
+    def message(self) -> Optional[Dict]:
+        """Everything that changed since the last message, as one message"""
+        if self._stable is None:
+            return None
+        text = self.text
+        stable = min(self._stable, len(self.sent), len(text))
+        kind = "update" if self._final else "partial"
+        self._stable = None
+        self._final = False
+        # A held partial goes out with this message
+        self._pending = False
+        offset = common_prefix_length(self.sent, text, stable)
+        if offset == len(self.sent) == len(text):
+            return None
+        self.sent = text
+        self.seq += 1
+        if not self.deltas:
+            message = {"type": kind, "text": text}
+        else:
+            message = {
+                "type": "delta",
+                "seq": self.seq,
+                "offset": self.base + offset,
+                "text": text[offset:],
+                "final": kind == "update"
+            }
+            if kind == "update":
+                message["segments"] = self.segment_count
+        if self.audio_end is not None:
+            message["audio_end"] = round(self.audio_end, 3)
+        self._spill()
+        return message
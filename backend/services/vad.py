@@ -0,0 +1,171 @@
+import os
+import logging
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Optional, Union
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class VadResult:
+    # Audio to decode (pre-roll + speech + hangover), empty when all silence;
+    # a view of the input when that is one contiguous run of it
+    audio: Union[bytes, memoryview]
+    # A pause reached endpoint_ms: the open utterance should be finalized
+    endpoint: bool = False
+
+
+class VoiceActivityDetector:
+    """Energy / zero-crossing gate in front of the recognizer.
+
+    Audio is split into frame_ms frames and classified in one vectorized
+    pass: a frame is speech when its energy clears the threshold (the
+    higher of threshold_db and the adaptive noise floor + margin_db), or
+    when it is only slightly quieter but has the high zero-crossing rate of
+    unvoiced consonants. Speech frames are passed through together with
+    hangover_ms of audio after them and preroll_ms before them, so word
+    edges reach the recognizer intact. Once a pause reaches endpoint_ms the
+    result says so, since the recognizer never sees that silence itself.
+
+    Not thread-safe; one detector per session, fed in order.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        frame_ms: int = 20,
+        threshold_db: Optional[float] = None,
+        margin_db: Optional[float] = None,
+        hangover_ms: Optional[int] = None,
+        preroll_ms: Optional[int] = None,
+        endpoint_ms: Optional[int] = None
+    ):
+        self.sample_rate = sample_rate
+        self.frame_samples = sample_rate * frame_ms // 1000
+        self.threshold_db = threshold_db if threshold_db is not None else float(
+            os.getenv("VAD_THRESHOLD_DB", "-50")
+        )
+        self.margin_db = margin_db if margin_db is not None else float(
+            os.getenv("VAD_MARGIN_DB", "10")
+        )
+        self.hangover_frames = (hangover_ms if hangover_ms is not None else int(
+            os.getenv("VAD_HANGOVER_MS", "300")
+        )) // frame_ms
+        preroll_frames = (preroll_ms if preroll_ms is not None else int(
+            os.getenv("VAD_PREROLL_MS", "300")
+        )) // frame_ms
+        self.endpoint_frames = (endpoint_ms if endpoint_ms is not None else int(
+            os.getenv("VAD_ENDPOINT_MS", "700")
+        )) // frame_ms
+        # Unvoiced speech: within fricative_db of the threshold, many zero crossings
+        self.fricative_db = 10.0
+        self.zcr_threshold = 0.25
+
+        self.noise_floor_db = self.threshold_db - self.margin_db
+        self.total_samples = 0
+        self.skipped_samples = 0
+        self._remainder = b""
+        self._remainder_sent = 0
+        self._frame_index = 0
+        # Frame index of the last speech frame (far in the past initially)
+        self._last_speech = -(1 << 30)
+        self._utterance_open = False
+        self._preroll: Deque[bytes] = deque(maxlen=preroll_frames)
+
+    @property
+    def skipped_ratio(self) -> float:
+        return self.skipped_samples / self.total_samples if self.total_samples else 0.0
+
+    def classify(self, frames: np.ndarray) -> np.ndarray:
+        """Speech mask for a (frames, samples) int16 array"""
+        samples = frames.astype(np.float32) / 32768.0
+        energy_db = 10 * np.log10(np.mean(samples * samples, axis=1) + 1e-10)
+        signs = np.signbit(samples)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (samples.shape[1] - 1)
+
+        threshold = max(self.threshold_db, self.noise_floor_db + self.margin_db)
+        speech = (energy_db > threshold) | (
+            (energy_db > threshold - self.fricative_db) & (zcr > self.zcr_threshold)
+        )
+        # Track the noise floor from frames judged silent, slowly
+        quiet = energy_db[~speech]
+        if quiet.size:
+            self.noise_floor_db += 0.05 * (float(np.median(quiet)) - self.noise_floor_db)
+        return speech
+
+    def process(self, audio: Union[bytes, memoryview]) -> VadResult:
+        """Gate one chunk of 16-bit mono PCM"""
+        carried = len(self._remainder)
+        data = self._remainder + bytes(audio) if carried else audio
+        frame_bytes = self.frame_samples * 2
+        count = len(data) // frame_bytes
+        # Bytes of data before this are already passed on (a speech run
+        # that reached the end of the previous chunk took its partial frame)
+        sent = self._remainder_sent
+        self._remainder = bytes(data[count * frame_bytes:])
+        self._remainder_sent = 0
+        self.total_samples += count * self.frame_samples
+        if not count:
+            self._remainder_sent = sent
+            return VadResult(b"")
+
+        pcm = np.frombuffer(data, dtype=np.int16, count=count * self.frame_samples)
+        speech = self.classify(pcm.reshape(count, self.frame_samples))
+
+        # Frames within hangover of the most recent speech frame pass
+        index = np.arange(self._frame_index, self._frame_index + count)
+        last_speech = np.maximum.accumulate(np.where(speech, index, self._last_speech))
+        active = index - last_speech <= self.hangover_frames
+        self._frame_index += count
+        self._last_speech = int(last_speech[-1])
+
+        def piece(begin: int, end: int) -> Union[bytes, memoryview]:
+            begin = max(begin, sent)
+            if begin >= carried:
+                # Sliced from the caller's buffer: a view of a view is no copy
+                return audio[begin - carried:end - carried]
+            return data[begin:end]
+
+        # Runs of passing frames are sliced out whole, so a chunk that is
+        # all speech goes on as the caller's buffer itself, not a copy
+        out = []
+        run_start = None
+        for i in range(count):
+            if active[i]:
+                if run_start is None:
+                    run_start = i
+                    out.extend(self._preroll)
+                    self._preroll.clear()
+                continue
+            if run_start is not None:
+                out.append(piece(run_start * frame_bytes, i * frame_bytes))
+                run_start = None
+            if len(self._preroll) == self._preroll.maxlen:
+                self.skipped_samples += self.frame_samples
+            self._preroll.append(bytes(piece(i * frame_bytes, (i + 1) * frame_bytes)))
+        if run_start is not None:
+            # The run's partial frame at the end goes along too (at worst a
+            # few ms more hangover), keeping the next chunk's run contiguous
+            out.append(piece(run_start * frame_bytes, len(data)))
+            self._remainder_sent = len(self._remainder)
+        out = [chunk for chunk in out if len(chunk)]
+        # Pre-roll still buffered at the end of the chunk is released (or
+        # counted as skipped) by later chunks
+
+        endpoint = False
+        if out:
+            self._utterance_open = True
+        if self._utterance_open and self._frame_index - 1 - self._last_speech >= self.endpoint_frames:
+            endpoint = True
+            self._utterance_open = False
+        return VadResult(out[0] if len(out) == 1 else b"".join(out), endpoint)
+
+    def flush(self) -> VadResult:
+        """End of stream: finalize whatever utterance is still open"""
+        endpoint = self._utterance_open
+        self._utterance_open = False
+        self.skipped_samples += len(self._preroll) * self.frame_samples
+        self._preroll.clear()
+        return VadResult(b"", endpoint)
@@ -0,0 +1,180 @@
+import os
+import re
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# (word, start, end, confidence) as it comes out of a recognizer result
+Word = Tuple[str, float, float, float]
+
+_TIMESTAMP = re.compile(r"^(?:(\d+):)?(\d+):(\d+(?:\.\d+)?)$")
+
+
+def parse_time(value: str) -> float:
+    """Seconds from "723.5", "12:03" or "1:12:03"; ValueError otherwise"""
+    value = value.strip()
+    match = _TIMESTAMP.match(value)
+    if match is None:
+        seconds = float(value)
+    else:
+        hours, minutes, rest = match.groups()
+        seconds = int(hours or 0) * 3600 + int(minutes) * 60 + float(rest)
+    if seconds < 0:
+        raise ValueError(f"Negative time: {value}")
+    return seconds
+
+
+class Vocabulary:
+    """Process-wide word <-> id map, so timelines store 4-byte ids.
+
+    It only grows with distinct words, which the recognizer's lexicon
+    bounds, not with the amount of audio.
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._words: List[str] = []
+        self._lock = threading.Lock()
+
+    def id(self, word: str) -> int:
+        word_id = self._ids.get(word)
+        if word_id is None:
+            with self._lock:
+                word_id = self._ids.setdefault(word, len(self._words))
+                if word_id == len(self._words):
+                    self._words.append(word)
+        return word_id
+
+    def word(self, word_id: int) -> str:
+        return self._words[word_id]
+
+    def __len__(self) -> int:
+        return len(self._words)
+
+
+vocabulary = Vocabulary()
+
+
+def pack_words(words: Sequence[Word]) -> Optional[bytes]:
+    """Timings and confidences of a segment's words for storage.
+
+    float32 starts, float32 ends, then one byte of confidence (0-255) per
+    word, in native (little-endian) byte order; the words themselves are
+    the segment text. None for a segment without word timings.
+    """
+    if not words:
+        return None
+    starts = array("f", (word[1] for word in words))
+    ends = array("f", (word[2] for word in words))
+    confs = array("B", (_quantize(word[3]) for word in words))
+    return starts.tobytes() + ends.tobytes() + confs.tobytes()
+
+
+def unpack_words(text: str, blob: Optional[bytes]) -> List[Word]:
+    if not blob:
+        return []
+    count = len(blob) // 9
+    starts, ends, confs = array("f"), array("f"), array("B")
+    starts.frombytes(blob[:4 * count])
+    ends.frombytes(blob[4 * count:8 * count])
+    confs.frombytes(blob[8 * count:])
+    return [
+        (word, starts[i], ends[i], confs[i] / 255)
+        for i, word in enumerate(text.split()[:count])
+    ]
+
+
+def _quantize(conf: float) -> int:
+    return max(0, min(255, round(conf * 255)))
+
+
+class WordTimeline:
+    """Word timings and confidences of one session, for time-range queries.
+
+    Parallel arrays instead of a record per word: a vocabulary id (4
+    bytes), start and end in seconds of session audio (float32, 4 bytes
+    each) and a quantized confidence (1 byte), about 13 bytes a word, or
+    ~120 kB per hour of continuous speech. Starts and ends are kept non-
+    decreasing, so a range is found with two bisects. Beyond max_words the
+    oldest words are dropped (in blocks of a tenth) and `since` moves up;
+    queries from before it go to storage, where the timings are kept per
+    segment.
+    """
+
+    def __init__(self, since: float = 0.0, max_words: Optional[int] = None):
+        self.max_words = max_words or int(os.getenv("WORD_TIMELINE_MAX_WORDS", "100000"))
+        # Complete from this time on (a resumed session starts at its audio_end)
+        self.since = since
+        self._words = array("I")
+        self._starts = array("f")
+        self._ends = array("f")
+        self._confs = array("B")
+        # Segment seq and index of the first word, per segment with words
+        self._segment_seqs = array("I")
+        self._segment_firsts = array("I")
+        self._dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._words)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(
+            len(values) * values.itemsize
+            for values in (
+                self._words, self._starts, self._ends, self._confs,
+                self._segment_seqs, self._segment_firsts
+            )
+        )
+
+    def append(self, segment_seq: int, words: Sequence[Word]):
+        if not words:
+            return
+        self._segment_seqs.append(segment_seq)
+        self._segment_firsts.append(self._dropped + len(self._words))
+        last_start = self._starts[-1] if self._starts else 0.0
+        last_end = self._ends[-1] if self._ends else 0.0
+        for word, start, end, conf in words:
+            last_start = max(start, last_start)
+            last_end = max(end, last_start, last_end)
+            self._words.append(vocabulary.id(word))
+            self._starts.append(last_start)
+            self._ends.append(last_end)
+            self._confs.append(_quantize(conf))
+        if len(self._words) > self.max_words:
+            self._trim(len(self._words) - self.max_words + self.max_words // 10)
+
+    def _trim(self, count: int):
+        self.since = float(self._ends[count - 1])
+        for values in (self._words, self._starts, self._ends, self._confs):
+            del values[:count]
+        self._dropped += count
+        segments = bisect_right(self._segment_firsts, self._dropped) - 1
+        if segments > 0:
+            del self._segment_seqs[:segments]
+            del self._segment_firsts[:segments]
+
+    def covers(self, start: float) -> bool:
+        return start >= self.since
+
+    def span(self, start: float, end: Optional[float] = None) -> Tuple[int, int]:
+        """Indexes [first, last) of the words overlapping [start, end) seconds"""
+        first = bisect_right(self._ends, start)
+        last = len(self._starts) if end is None else bisect_left(self._starts, end)
+        return first, max(first, last)
+
+    def range(self, start: float, end: Optional[float] = None) -> List[Dict]:
+        """Words overlapping [start, end) seconds, in order"""
+        first, last = self.span(start, end)
+        return [self._word(i) for i in range(first, last)]
+
+    def _word(self, i: int) -> Dict:
+        segment = bisect_right(self._segment_firsts, self._dropped + i) - 1
+        return {
+            "word": vocabulary.word(self._words[i]),
+            "start": round(self._starts[i], 3),
+            "end": round(self._ends[i], 3),
+            "conf": round(self._confs[i] / 255, 3),
+            "segment": self._segment_seqs[segment] if segment >= 0 else None
+        }
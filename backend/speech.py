@@ -2,8 +2,8 @@ import os
 import json
 import base64
 import numpy as np
-from vosk import Model, KaldiRecognizer
 import sounddevice as sd
+from services.model_registry import get_registry
 
 class SpeechRecognizer:
     def __init__(self, model_path: str = "vosk-model-small-en-us"):
@@ -14,8 +14,10 @@ class SpeechRecognizer:
                 f"and extract it to {model_path}"
             )
         
-        self.model = Model(model_path)
-        self.sample_rate = 16000
+        self.model_path = model_path
+        self.registry = get_registry()
+        self.model = self.registry.get_model(model_path)
+        self.sample_rate = self.registry.sample_rate
 
     async def transcribe(self, audio_data: str, language: str = "en-US") -> str:
         """
@@ -26,12 +28,13 @@ class SpeechRecognizer:
             audio_bytes = base64.b64decode(audio_data)
             audio_array = np.frombuffer(audio_bytes, dtype=np.int16)
             
-            # Create recognizer
-            recognizer = KaldiRecognizer(self.model, self.sample_rate)
-            recognizer.AcceptWaveform(audio_array.tobytes())
-            
-            # Get result
-            result = json.loads(recognizer.FinalResult())
+            # Borrow a warm recognizer; it is reset when handed back
+            recognizer = self.registry.acquire(self.model_path)
+            try:
+                recognizer.AcceptWaveform(audio_array.tobytes())
+                result = json.loads(recognizer.FinalResult())
+            finally:
+                self.registry.release(self.model_path, recognizer)
             return result.get("text", "")
             
         except Exception as e:
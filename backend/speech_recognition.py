@@ -1,15 +1,17 @@
-from vosk import Model, KaldiRecognizer
+from vosk import KaldiRecognizer
 import json
 import wave
 import os
 from typing import Optional
 import logging
+from services.model_registry import get_registry
 
 class SpeechRecognizer:
     def __init__(self, model_path: str = "vosk-model-small-en-us-0.15"):
         self.model_path = model_path
+        self.registry = get_registry()
         self._load_model()
-        self.sample_rate = 16000  # Vosk works best with 16kHz audio
+        self.sample_rate = self.registry.sample_rate  # Vosk works best with 16kHz audio
 
     def _load_model(self):
         """Load the Vosk model from the specified path."""
@@ -17,12 +19,17 @@ class SpeechRecognizer:
             raise FileNotFoundError(
                 f"Vosk model not found at {self.model_path}. Please download it from https://alphacephei.com/vosk/models"
             )
-        self.model = Model(self.model_path)
+        # Shared with every other user of the same model in this process
+        self.model = self.registry.get_model(self.model_path)
         logging.info(f"Loaded Vosk model from {self.model_path}")
 
     def create_recognizer(self) -> KaldiRecognizer:
-        """Create a new KaldiRecognizer instance."""
-        return KaldiRecognizer(self.model, self.sample_rate)
+        """Get a reset KaldiRecognizer from the warm pool."""
+        return self.registry.acquire(self.model_path)
+
+    def release_recognizer(self, recognizer: KaldiRecognizer):
+        """Hand a recognizer back to the warm pool once done with it."""
+        self.registry.release(self.model_path, recognizer)
 
     def process_audio_chunk(self, recognizer: KaldiRecognizer, audio_chunk: bytes) -> Optional[str]:
         """Process a chunk of audio data and return transcribed text if available."""
@@ -37,3 +44,23 @@ class SpeechRecognizer:
     def reset_recognizer(self, recognizer: KaldiRecognizer):
         """Reset the recognizer state."""
         recognizer.Reset()
+
+    def transcribe_file(self, path: str, chunk_seconds: float = 0.5) -> str:
+        """Transcribe a mono 16-bit WAV file, streamed in fixed-size chunks.
+
+        For long recordings prefer services.batch_transcriber, which splits
+        the file at pauses and decodes the pieces in parallel.
+        """
+        with wave.open(path, "rb") as wav:
+            if wav.getnchannels() != 1 or wav.getsampwidth() != 2:
+                raise ValueError("Audio must be a mono 16-bit PCM WAV file")
+            recognizer = KaldiRecognizer(self.model, wav.getframerate())
+            texts = []
+            while True:
+                data = wav.readframes(int(chunk_seconds * wav.getframerate()))
+                if not data:
+                    break
+                if recognizer.AcceptWaveform(data):
+                    texts.append(json.loads(recognizer.Result()).get("text", ""))
+            texts.append(json.loads(recognizer.FinalResult()).get("text", ""))
+        return " ".join(text for text in texts if text)
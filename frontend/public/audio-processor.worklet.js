@@ -7,7 +7,7 @@ class AudioProcessor extends AudioWorkletProcessor {
   }
 
   _initBuffer() {
-    this._bytesWritten = 0;
+    this._samplesWritten = 0;
   }
 
   process(inputs, outputs, parameters) {
@@ -18,28 +18,22 @@ class AudioProcessor extends AudioWorkletProcessor {
     
     // Accumulate audio data
     for (let i = 0; i < channel.length; i++) {
-      if (this._bytesWritten < this._bufferSize) {
-        this._buffer[this._bytesWritten] = channel[i];
-        this._bytesWritten += 1;
+      if (this._samplesWritten < this._bufferSize) {
+        this._buffer[this._samplesWritten] = channel[i];
+        this._samplesWritten += 1;
       }
     }
 
     // If we have enough data, send it to the main thread
-    if (this._bytesWritten >= this._bufferSize) {
-      const audioData = this._buffer.slice(0, this._bytesWritten);
+    if (this._samplesWritten >= this._bufferSize) {
+      // Float32 at the context's native rate; the server converts it to
+      // what the recognizer takes
+      const audioData = this._buffer.slice(0, this._samplesWritten);
       
-      // Convert to 16-bit PCM
-      const pcmData = new Int16Array(audioData.length);
-      for (let i = 0; i < audioData.length; i++) {
-        const s = Math.max(-1, Math.min(1, audioData[i]));
-        pcmData[i] = s < 0 ? s * 0x8000 : s * 0x7FFF;
-      }
-      
-      // Send the PCM data to the main thread
       this.port.postMessage({
         type: 'audio',
-        data: pcmData.buffer
-      }, [pcmData.buffer]);
+        data: audioData.buffer
+      }, [audioData.buffer]);
 
       this._initBuffer();
     }
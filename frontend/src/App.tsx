@@ -1,27 +1,104 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import TranscriptionOverlay from './components/TranscriptionOverlay';
 import { InsightsDisplay } from './components/InsightsDisplay';
-import { useWebSocket } from './hooks/useWebSocket';
-import { useAudioRecorder } from './hooks/useAudioRecorder';
+import { useWebSocket, encodeAudioFrame } from './hooks/useWebSocket';
+import { useAudioRecorder, AudioFormat } from './hooks/useAudioRecorder';
 import './App.css';
 
 function App() {
   const [transcriptionText, setTranscriptionText] = useState('');
   const [insights, setInsights] = useState<string[]>([]);
   const [questions, setQuestions] = useState<string[]>([]);
-  
-  const { sendMessage, lastMessage, readyState } = useWebSocket('ws://localhost:8000/ws');
+  const [speaker, setSpeaker] = useState<string | undefined>();
+  // Latest labeled segment; labels may arrive out of order
+  const speakerSegment = useRef(-1);
+  const binaryAudio = useRef(false);
+  const audioSequence = useRef(0);
+  // Transcript as rebuilt from the server's deltas
+  const transcript = useRef('');
+  const transcriptSeq = useRef(0);
+  // Final segments in transcript; resyncs and reconnects only replay the rest
+  const transcriptSegments = useRef(0);
+  const resyncRequested = useRef(false);
+  // Set while the server asks us to hold audio because its decoder is behind
+  const audioPaused = useRef(false);
+  // Format of the recorder's audio, negotiated on (re)connect
+  const audioFormat = useRef<AudioFormat | null>(null);
+
+  const { sendMessage, lastMessage, readyState } = useWebSocket('ws://localhost:8000/ws', (raw) => {
+    let data;
+    try {
+      data = JSON.parse(raw);
+    } catch (error) {
+      console.error('Error parsing WebSocket message:', error);
+      return;
+    }
+    if (data.type === 'flow') {
+      audioPaused.current = Boolean(data.paused);
+    } else if (data.type === 'speakers') {
+      // Segment seq -> speaker label, from the server's diarization
+      for (const [segment, label] of Object.entries(data.speakers as Record<string, string>)) {
+        if (Number(segment) > speakerSegment.current) {
+          speakerSegment.current = Number(segment);
+          setSpeaker(label);
+        }
+      }
+    } else if (data.type === 'snapshot') {
+      // Everything from offset on is replaced
+      transcript.current = transcript.current.slice(0, data.offset ?? 0) + (data.text || '');
+      transcriptSeq.current = data.seq;
+      transcriptSegments.current = data.segments ?? 0;
+      resyncRequested.current = false;
+      setTranscriptionText(transcript.current);
+    } else if (data.type === 'delta') {
+      if (data.seq <= transcriptSeq.current) {
+        // Already covered by a snapshot
+        return;
+      }
+      if (data.seq !== transcriptSeq.current + 1) {
+        // Missed a delta: ask for a snapshot once and ignore the rest until it arrives
+        if (!resyncRequested.current) {
+          resyncRequested.current = true;
+          sendMessage(JSON.stringify({ type: 'resync', segments: transcriptSegments.current }));
+        }
+        return;
+      }
+      transcript.current = transcript.current.slice(0, data.offset) + data.text;
+      transcriptSeq.current = data.seq;
+      if (data.segments !== undefined) {
+        transcriptSegments.current = data.segments;
+      }
+      setTranscriptionText(transcript.current);
+    }
+  }, (resuming) => ({
+    ...audioFormat.current,
+    // Segments we already have, so the server only replays the rest
+    ...(resuming ? { resume_from: transcriptSegments.current } : {})
+  }));
   const { startRecording, stopRecording, isRecording } = useAudioRecorder({
+    onFormat: (format) => {
+      audioFormat.current = format;
+      if (readyState === WebSocket.OPEN) {
+        sendMessage(JSON.stringify({ type: 'format', ...format }));
+      }
+    },
     onAudioData: (audioData) => {
-      console.log('Audio data received, sending to WebSocket...');
+      if (audioPaused.current) {
+        // Live audio can't wait; dropping it here saves the bandwidth too
+        return;
+      }
       if (readyState === WebSocket.OPEN) {
         try {
-          // Create the message object
+          if (binaryAudio.current) {
+            sendMessage(encodeAudioFrame(audioData, audioSequence.current++));
+            return;
+          }
+          // Fall back to the JSON + base64 framing
+          const data = btoa(String.fromCharCode.apply(null, Array.from(new Uint8Array(audioData))));
           const message = {
             type: 'audio',
-            data: audioData
+            data
           };
-          console.log('Sending audio data to WebSocket');
           sendMessage(JSON.stringify(message));
         } catch (error) {
           console.error('Error sending audio data:', error);
@@ -38,6 +115,19 @@ function App() {
         console.log('Received WebSocket message:', lastMessage);
         const data = JSON.parse(lastMessage);
         console.log('Parsed message data:', data);
+
+        if (data.type === 'config') {
+          binaryAudio.current = Boolean(data.binary);
+          audioSequence.current = 0;
+          return;
+        }
+        
+        if (data.type === 'insights' && data.insights) {
+          // Partial insights streamed while the LLM is still answering
+          setInsights(data.insights.insights || []);
+          setQuestions(data.insights.questions || []);
+          return;
+        }
         
         if (data.type === 'update' || data.type === 'partial') {
           console.log('Setting transcription text:', data.text);
@@ -59,6 +149,7 @@ function App() {
     <div className="min-h-screen">
       <TranscriptionOverlay
         transcriptionText={transcriptionText}
+        speaker={speaker}
       />
       
       <InsightsDisplay
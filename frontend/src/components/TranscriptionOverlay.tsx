@@ -3,6 +3,8 @@ import styled from 'styled-components';
 
 interface TranscriptionOverlayProps {
   transcriptionText: string;
+  // Speaker of the latest labeled segment, when the server diarizes
+  speaker?: string;
 }
 
 const OverlayContainer = styled.div`
@@ -53,8 +55,16 @@ const TranscriptionBox = styled.div`
   }
 `;
 
+const SpeakerLabel = styled.div`
+  font-size: 12px;
+  font-weight: 600;
+  color: #868e96;
+  margin-bottom: 8px;
+`;
+
 const TranscriptionOverlay: React.FC<TranscriptionOverlayProps> = ({
   transcriptionText,
+  speaker,
 }) => {
   const transcriptionRef = useRef<HTMLDivElement>(null);
 
@@ -67,6 +77,7 @@ const TranscriptionOverlay: React.FC<TranscriptionOverlayProps> = ({
 
   return (
     <OverlayContainer>
+      {speaker && <SpeakerLabel>Speaker {speaker}</SpeakerLabel>}
       <TranscriptionBox ref={transcriptionRef}>
         {transcriptionText || 'Waiting for speech...'}
       </TranscriptionBox>
@@ -1,7 +1,18 @@
 import { useState, useCallback, useRef } from 'react';
 
+// Mirrors the server's AudioFormat; sent so it can convert to what the recognizer takes
+export interface AudioFormat {
+  sample_rate: number;
+  channels: number;
+  encoding: 's16le' | 'f32le';
+}
+
 interface UseAudioRecorderProps {
-  onAudioData: (audioData: string) => void;
+  // Raw float32 PCM at the AudioContext's native rate, from the audio
+  // worklet or the ScriptProcessor fallback
+  onAudioData: (audioData: ArrayBuffer) => void;
+  // Called when recording starts, before any audio
+  onFormat?: (format: AudioFormat) => void;
 }
 
 interface UseAudioRecorderReturn {
@@ -10,9 +21,9 @@ interface UseAudioRecorderReturn {
   isRecording: boolean;
 }
 
-export const useAudioRecorder = ({ onAudioData }: UseAudioRecorderProps): UseAudioRecorderReturn => {
+export const useAudioRecorder = ({ onAudioData, onFormat }: UseAudioRecorderProps): UseAudioRecorderReturn => {
   const [isRecording, setIsRecording] = useState(false);
-  const mediaRecorder = useRef<MediaRecorder | null>(null);
+  const scriptProcessor = useRef<ScriptProcessorNode | null>(null);
   const audioContext = useRef<AudioContext | null>(null);
   const audioWorklet = useRef<AudioWorkletNode | null>(null);
   const stream = useRef<MediaStream | null>(null);
@@ -23,16 +34,16 @@ export const useAudioRecorder = ({ onAudioData }: UseAudioRecorderProps): UseAud
       audioWorklet.current = null;
     }
 
+    if (scriptProcessor.current) {
+      scriptProcessor.current.disconnect();
+      scriptProcessor.current = null;
+    }
+
     if (audioContext.current) {
       audioContext.current.close();
       audioContext.current = null;
     }
 
-    if (mediaRecorder.current && mediaRecorder.current.state === 'recording') {
-      mediaRecorder.current.stop();
-      mediaRecorder.current = null;
-    }
-
     if (stream.current) {
       stream.current.getTracks().forEach(track => track.stop());
       stream.current = null;
@@ -46,17 +57,21 @@ export const useAudioRecorder = ({ onAudioData }: UseAudioRecorderProps): UseAud
       stream.current = await navigator.mediaDevices.getUserMedia({ 
         audio: {
           channelCount: 1,
-          sampleRate: 16000,
-          sampleSize: 16,
           volume: 1.0
         }
       });
       
-      // Initialize AudioContext
+      // Native rate: the server resamples, which is cheaper and better
+      // than the browser's resampler for a forced 16 kHz context
       audioContext.current = new AudioContext({
-        sampleRate: 16000,
         latencyHint: 'interactive'
       });
+      onFormat?.({
+        sample_rate: audioContext.current.sampleRate,
+        channels: 1,
+        encoding: 'f32le'
+      });
+      const source = audioContext.current.createMediaStreamSource(stream.current);
       
       try {
         // Load the worklet from the public directory
@@ -79,38 +94,26 @@ export const useAudioRecorder = ({ onAudioData }: UseAudioRecorderProps): UseAud
         // Handle messages from the audio worklet
         audioWorklet.current.port.onmessage = (event) => {
           if (event.data.type === 'audio') {
-            const audioData = event.data.data;
-            const base64Data = btoa(
-              String.fromCharCode.apply(null, new Uint8Array(audioData))
-            );
-            onAudioData(base64Data);
+            onAudioData(event.data.data as ArrayBuffer);
           }
         };
 
         // Connect the audio nodes
-        const source = audioContext.current.createMediaStreamSource(stream.current);
         source.connect(audioWorklet.current);
         audioWorklet.current.connect(audioContext.current.destination);
 
         setIsRecording(true);
       } catch (error) {
-        console.warn('Audio worklet failed, falling back to MediaRecorder:', error);
-        
-        // Fallback to MediaRecorder
-        mediaRecorder.current = new MediaRecorder(stream.current);
+        console.warn('Audio worklet failed, falling back to ScriptProcessor:', error);
         
-        mediaRecorder.current.ondataavailable = (event) => {
-          const reader = new FileReader();
-          reader.onloadend = () => {
-            if (reader.result) {
-              const base64Data = (reader.result as string).split(',')[1];
-              onAudioData(base64Data);
-            }
-          };
-          reader.readAsDataURL(event.data);
+        // Same PCM from the main thread; MediaRecorder's compressed
+        // output is something the server can't decode
+        scriptProcessor.current = audioContext.current.createScriptProcessor(2048, 1, 1);
+        scriptProcessor.current.onaudioprocess = (event) => {
+          onAudioData(event.inputBuffer.getChannelData(0).slice().buffer);
         };
-
-        mediaRecorder.current.start(100);
+        source.connect(scriptProcessor.current);
+        scriptProcessor.current.connect(audioContext.current.destination);
         setIsRecording(true);
       }
     } catch (error) {
@@ -118,7 +121,7 @@ export const useAudioRecorder = ({ onAudioData }: UseAudioRecorderProps): UseAud
       stopRecording();
       throw error;
     }
-  }, [onAudioData, stopRecording]);
+  }, [onAudioData, onFormat, stopRecording]);
 
   return {
     startRecording,
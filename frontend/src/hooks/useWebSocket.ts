@@ -1,46 +1,121 @@
-import { useState, useEffect, useCallback } from 'react';
+import { useState, useEffect, useCallback, useRef } from 'react';
+
+export const AUDIO_PROTOCOL_VERSION = 1;
+const AUDIO_FRAME_TYPE = 1;
+const AUDIO_HEADER_BYTES = 8;
+const MAX_RECONNECT_DELAY_MS = 10000;
+
+// version (u8) | frame type (u8) | flags (u16) | sequence (u32), little-endian,
+// followed by PCM in the format negotiated in the config message
+export const encodeAudioFrame = (pcm: ArrayBuffer, sequence: number): ArrayBuffer => {
+  const frame = new Uint8Array(AUDIO_HEADER_BYTES + pcm.byteLength);
+  const header = new DataView(frame.buffer);
+  header.setUint8(0, AUDIO_PROTOCOL_VERSION);
+  header.setUint8(1, AUDIO_FRAME_TYPE);
+  header.setUint16(2, 0, true);
+  header.setUint32(4, sequence >>> 0, true);
+  frame.set(new Uint8Array(pcm), AUDIO_HEADER_BYTES);
+  return frame.buffer;
+};
 
 interface UseWebSocketReturn {
-  sendMessage: (message: string) => void;
+  sendMessage: (message: string | ArrayBuffer) => void;
   lastMessage: string | null;
   readyState: number;
 }
 
-export const useWebSocket = (url: string): UseWebSocketReturn => {
+export const useWebSocket = (
+  url: string,
+  onMessage?: (message: string) => void,
+  // More fields for the config message, e.g. the audio format; on a
+  // reconnect (resuming) also what the app already has of the transcript
+  extraConfig?: (resuming: boolean) => Record<string, unknown>
+): UseWebSocketReturn => {
   const [ws, setWs] = useState<WebSocket | null>(null);
   const [lastMessage, setLastMessage] = useState<string | null>(null);
   const [readyState, setReadyState] = useState<number>(WebSocket.CONNECTING);
+  // lastMessage can skip messages that arrive within one render; transcript
+  // deltas must not, so they go through this callback instead
+  const onMessageRef = useRef(onMessage);
+  onMessageRef.current = onMessage;
+  const extraConfigRef = useRef(extraConfig);
+  extraConfigRef.current = extraConfig;
 
   useEffect(() => {
-    const websocket = new WebSocket(url);
+    let websocket: WebSocket;
+    let closed = false;
+    let attempts = 0;
+    let reconnectTimer: ReturnType<typeof setTimeout> | undefined;
+    // Reconnects pass it back, so any server worker resumes the transcript
+    let sessionId: string | null = null;
 
-    websocket.onopen = () => {
-      console.log('WebSocket Connected');
-      setReadyState(WebSocket.OPEN);
-    };
+    const connect = () => {
+      // Keeps any query the url already has (e.g. ?language=)
+      const target = new URL(url, window.location.href);
+      if (sessionId) {
+        target.searchParams.set('session_id', sessionId);
+      }
+      websocket = new WebSocket(target.toString());
 
-    websocket.onmessage = (event) => {
-      setLastMessage(event.data);
-    };
+      websocket.binaryType = 'arraybuffer';
 
-    websocket.onerror = (error) => {
-      console.error('WebSocket error:', error);
-    };
+      websocket.onopen = () => {
+        console.log('WebSocket Connected');
+        attempts = 0;
+        // Ask for raw PCM framing and transcript deltas; the server answers
+        // with a config message
+        websocket.send(JSON.stringify({
+          type: 'config',
+          binary: true,
+          protocol_version: AUDIO_PROTOCOL_VERSION,
+          deltas: true,
+          ...extraConfigRef.current?.(sessionId !== null)
+        }));
+        setReadyState(WebSocket.OPEN);
+      };
+
+      websocket.onmessage = (event) => {
+        if (!sessionId && typeof event.data === 'string' && event.data.includes('"session_id"')) {
+          try {
+            const data = JSON.parse(event.data);
+            if (data.type === 'config') {
+              sessionId = data.session_id;
+            }
+          } catch {
+            // Not ours to report; the app's handler sees the same message
+          }
+        }
+        onMessageRef.current?.(event.data);
+        setLastMessage(event.data);
+      };
+
+      websocket.onerror = (error) => {
+        console.error('WebSocket error:', error);
+      };
+
+      websocket.onclose = () => {
+        console.log('WebSocket disconnected');
+        setReadyState(WebSocket.CLOSED);
+        if (!closed) {
+          const delay = Math.min(500 * 2 ** attempts++, MAX_RECONNECT_DELAY_MS);
+          reconnectTimer = setTimeout(connect, delay);
+        }
+      };
 
-    websocket.onclose = () => {
-      console.log('WebSocket disconnected');
-      setReadyState(WebSocket.CLOSED);
+      setWs(websocket);
     };
 
-    setWs(websocket);
+    connect();
 
     return () => {
+      closed = true;
+      clearTimeout(reconnectTimer);
       websocket.close();
     };
   }, [url]);
 
   const sendMessage = useCallback(
-    (message: string) => {
+    (message: string | ArrayBuffer) => {
       if (ws?.readyState === WebSocket.OPEN) {
         ws.send(message);
       } else {